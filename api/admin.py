@@ -0,0 +1,170 @@
+"""
+Административные маршруты: профилирование обработки команд и учет памяти.
+
+Доступны только с токеном ModelConfig.ADMIN_TOKEN в заголовке
+X-Admin-Token; без настроенного токена отвечают 404. В pre-fork режиме
+запрос попадает в один из воркеров, и профиль — профиль этого воркера.
+"""
+import hmac
+import os
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response
+
+from ..config.model_config import ModelConfig  # pylint: disable=relative-beyond-top-level
+from ..core.monitoring.memory import GROUP_BY, memory_report, memory_tracker  # pylint: disable=relative-beyond-top-level
+from ..core.monitoring.profiler import profiler, render_flamegraph_svg  # pylint: disable=relative-beyond-top-level
+
+admin_router = APIRouter(prefix="/admin")
+
+
+def require_admin(request: Request) -> None:
+    """
+    Проверить токен администратора.
+
+    Raises:
+        HTTPException: 404, если административные маршруты выключены,
+            403 при неверном токене
+    """
+    if not ModelConfig.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ModelConfig.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@admin_router.get("/profile")
+async def profile_status(request: Request) -> dict:
+    """
+    Состояние профилировщика: доля выборки, запросы по команде, число выборок.
+    """
+    require_admin(request)
+    return profiler.status()
+
+
+@admin_router.post("/profile")
+async def arm_profile(request: Request, requests: int = 100, torch_trace: bool = False,
+                      reset: bool = True) -> dict:
+    """
+    Профилировать следующие `requests` запросов.
+
+    Args:
+        request: HTTP запрос
+        requests: Сколько следующих запросов профилировать
+        torch_trace: Снять трассу torch.profiler прямого прохода модели
+        reset: Сбросить собранные ранее стеки
+    """
+    require_admin(request)
+    if requests < 0:
+        raise HTTPException(status_code=400, detail="requests must be non-negative")
+    if reset:
+        profiler.reset()
+    profiler.arm(requests, torch_trace=torch_trace)
+    return profiler.status()
+
+
+@admin_router.delete("/profile")
+async def reset_profile(request: Request) -> dict:
+    """Остановить профилирование по команде и сбросить собранные стеки."""
+    require_admin(request)
+    profiler.arm(0)
+    profiler.reset()
+    return profiler.status()
+
+
+@admin_router.get("/profile/flamegraph")
+async def flamegraph(request: Request, format: str = "svg") -> Response:  # pylint: disable=redefined-builtin
+    """
+    Собранный профиль: SVG флеймграф (format=svg) или collapsed stacks
+    (format=collapsed) для flamegraph.pl и speedscope.
+    """
+    require_admin(request)
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    if format != "svg":
+        raise HTTPException(status_code=400, detail="format must be svg or collapsed")
+    return Response(render_flamegraph_svg(profiler.stacks()), media_type="image/svg+xml")
+
+
+@admin_router.get("/profile/trace")
+async def forward_trace(request: Request) -> FileResponse:
+    """
+    Последняя трасса torch.profiler прямого прохода (Chrome trace JSON,
+    открывается в chrome://tracing или Perfetto).
+    """
+    require_admin(request)
+    path = profiler.last_trace
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No forward trace recorded")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
+
+
+@admin_router.get("/memory")
+def memory(request: Request, deep: bool = True) -> dict:
+    """
+    Память процесса: RSS/PSS, параметры модели, кэши, аллокаторы,
+    объекты Python и состояние tracemalloc. Отчет собирается сотни
+    миллисекунд, поэтому маршрут синхронный и выполняется в пуле потоков.
+
+    Args:
+        request: HTTP запрос
+        deep: Оценивать память кэшей и считать объекты Python (дольше)
+    """
+    require_admin(request)
+    return memory_report(request.app.state, deep=deep)
+
+
+@admin_router.post("/memory/tracemalloc")
+async def start_tracemalloc(request: Request, frames: int = 1, sample_rate: float | None = None) -> dict:
+    """
+    Включить tracemalloc.
+
+    Args:
+        request: HTTP запрос
+        frames: Глубина стека мест выделения памяти
+        sample_rate: Доля запросов, для которых записывается прирост памяти;
+            не указана — без изменений
+    """
+    require_admin(request)
+    if frames < 1:
+        raise HTTPException(status_code=400, detail="frames must be positive")
+    if sample_rate is not None:
+        if not 0 <= sample_rate <= 1:
+            raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+        memory_tracker.sample_rate = sample_rate
+    memory_tracker.start(frames)
+    return memory_tracker.status()
+
+
+@admin_router.delete("/memory/tracemalloc")
+async def stop_tracemalloc(request: Request) -> dict:
+    """Выключить tracemalloc и выборку запросов."""
+    require_admin(request)
+    memory_tracker.sample_rate = 0
+    memory_tracker.stop()
+    return memory_tracker.status()
+
+
+@admin_router.get("/memory/allocations")
+def allocations(request: Request, limit: int = 20, group_by: str = "lineno",
+                      compare: bool = False) -> dict:
+    """
+    Места выделения живой памяти Python (tracemalloc); снимок tracemalloc
+    делается в пуле потоков, как и отчет /admin/memory.
+
+    Args:
+        request: HTTP запрос
+        limit: Сколько мест вернуть
+        group_by: Группировка: lineno, filename или traceback
+        compare: По приросту с момента включения tracemalloc
+    """
+    require_admin(request)
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BY)}")
+    if not memory_tracker.tracing:
+        raise HTTPException(status_code=409, detail="tracemalloc is not tracing, POST /admin/memory/tracemalloc")
+    return {
+        "group_by": group_by,
+        "compare": compare,
+        "allocations": memory_tracker.top_allocations(limit, group_by, compare)
+    }
@@ -1,10 +1,20 @@
 """API маршруты для сервиса классификации команд."""
-from typing import Any
-from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import json
+import math
+from typing import Any, AsyncIterator
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
 
 from ..config.model_config import ModelConfig   # pylint: disable=relative-beyond-top-level
+from ..core.monitoring.metrics import PROCESSING_PATH  # pylint: disable=relative-beyond-top-level
+from ..core.monitoring.metrics import registry as metrics_registry  # pylint: disable=relative-beyond-top-level
+from ..core.command.session import SessionContext  # pylint: disable=relative-beyond-top-level
+from ..core.serving.bulk import process_stream  # pylint: disable=relative-beyond-top-level
+from ..core.utils.deadline import Deadline, DeadlineExceeded  # pylint: disable=relative-beyond-top-level
 from .schemas import (CommandRequest, CommandResponse, HealthResponse,
-                      TokenResponse)
+                      SessionMessage, TokenResponse)
 
 router = APIRouter()
 
@@ -49,6 +59,207 @@ def get_processor(request: Request):
     return processor
 
 
+def get_session_context(app, session_id: str) -> SessionContext | None:
+    """
+    Получить контекст сессии из хранилища сессий.
+
+    Args:
+        app: Приложение с хранилищем сессий в состоянии
+        session_id: Идентификатор сессии из запроса
+
+    Returns:
+        Контекст сессии (новый, если сессии еще нет) или None, если
+        session_id не передан или хранилище недоступно
+    """
+    session_store = getattr(app.state, 'session_store', None)
+    if not session_id or session_store is None:
+        return None
+    return session_store.get_or_create(session_id)
+
+
+def save_session_context(app, context: SessionContext | None) -> None:
+    session_store = getattr(app.state, 'session_store', None)
+    if context is not None and session_store is not None:
+        session_store.save(context)
+
+
+def get_request_deadline(request: Request, timeout_ms: float | None = None) -> Deadline | None:
+    """
+    Получить дедлайн запроса.
+
+    Бюджет задержки берется из поля timeout_ms запроса или заголовка
+    `X-Request-Timeout-Ms` (если заданы оба — меньший), иначе из
+    ModelConfig.REQUEST_TIMEOUT_MS.
+
+    Args:
+        request: HTTP запрос
+        timeout_ms: Значение поля timeout_ms запроса
+
+    Returns:
+        Дедлайн или None, если бюджет не задан
+    """
+    budgets = [timeout_ms] if timeout_ms else []
+    header = request.headers.get("x-request-timeout-ms")
+    if header:
+        try:
+            budgets.append(float(header))
+        except ValueError:
+            pass
+    return Deadline.from_timeout_ms(min(budgets) if budgets else ModelConfig.REQUEST_TIMEOUT_MS)
+
+
+def deadline_response(error: DeadlineExceeded) -> JSONResponse:
+    """
+    Ответ на запрос, остановленный по дедлайну (504) или отключением клиента (499).
+
+    Args:
+        error: Исключение со стадией, на которой остановлена обработка
+
+    Returns:
+        JSONResponse с CommandResponse и стадией в data.stage
+    """
+    response = CommandResponse(success=False, data={"stage": error.stage}, error=str(error))
+    return JSONResponse(status_code=499 if error.reason == "cancelled" else 504, content=response.model_dump())
+
+
+async def _wait_for_disconnect(receive) -> None:
+    # Тело запроса уже прочитано, следующее сообщение — только http.disconnect
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _run_until_disconnect(processing, receive, deadline: Deadline) -> Any:
+    task = asyncio.ensure_future(processing)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if task.done():
+        return task.result()
+    # Ожидающий в очереди запрос снимается с очереди, начатая обработка
+    # останавливается на ближайшей проверке дедлайна
+    deadline.cancel()
+    task.cancel()
+    raise DeadlineExceeded("client_disconnect", reason="cancelled")
+
+
+async def run_nlu(app, nlu_service, processor, message: str, debug: bool = False,
+                  context: SessionContext | None = None, deadline: Deadline | None = None,
+                  receive=None) -> tuple[dict[str, Any], bool]:
+    """
+    Обработать команду через очередь модели с контролем допуска.
+
+    Реплика, дозаполняющая незавершенную команду сессии, обрабатывается
+    правилами до очереди модели. Если очередь модели переполнена или
+    ожидание превышает бюджет задержки (или время до дедлайна), команда
+    обрабатывается правилами без модели (деградированный режим) с тем же
+    контекстом сессии.
+
+    Args:
+        app: Приложение с контроллером допуска в состоянии
+        nlu_service: NLU сервис
+        processor: Процессор команд
+        message: Текст команды
+        debug: Собирать отладочную информацию
+        context: Контекст сессии
+        deadline: Дедлайн запроса
+        receive: ASGI receive HTTP запроса; если передан, при отключении
+            клиента запрос снимается с очереди модели
+
+    Returns:
+        Результат обработки и флаг деградированного режима
+
+    Raises:
+        DeadlineExceeded: Если дедлайн истек или клиент отключился
+    """
+    if deadline is not None:
+        deadline.check("admission")
+    # Дешевый путь без NER не ждет в очереди модели и не влияет на оценку ее времени
+    result = nlu_service.complete_from_context(message, processor, context, debug=debug)
+    if result is not None:
+        return result, False
+
+    admission = getattr(app.state, 'admission', None)
+    if admission is None:
+        return nlu_service.process_text(message, processor, debug=debug, context=context, deadline=deadline,
+                                        complete_pending=False), False
+
+    reason = admission.admit(deadline)
+    if reason is not None:
+        print(f"Load shedding ({reason}), estimated wait {admission.estimated_wait():.3f}s")
+        PROCESSING_PATH.inc(path="degraded")
+        return processor.rule_based_processor(message, debug=debug, context=context), True
+
+    if receive is None:
+        result = await admission.run(
+            nlu_service.process_text, message, processor, debug=debug, context=context, deadline=deadline,
+            complete_pending=False
+        )
+        return result, False
+
+    # Дедлайн служит и токеном отмены при отключении клиента
+    deadline = deadline or Deadline(math.inf)
+    processing = admission.run(
+        nlu_service.process_text, message, processor, debug=debug, context=context, deadline=deadline,
+        complete_pending=False
+    )
+    return await _run_until_disconnect(processing, receive, deadline), False
+
+
+def is_debug_requested(request: Request, debug: bool) -> bool:
+    """
+    Проверить, запросил ли клиент отладочную информацию.
+
+    Отладка включается параметром запроса `?debug=true` или заголовком
+    `X-Debug: 1`.
+
+    Args:
+        request: HTTP запрос
+        debug: Значение параметра запроса debug
+
+    Returns:
+        True, если отладочная информация нужна в ответе
+    """
+    return debug or request.headers.get("x-debug", "").lower() in {"1", "true", "yes"}
+
+
+def build_command_data(result: dict[str, Any]) -> dict[str, Any]:
+    """
+    Поля ответа клиенту из результата обработки команды.
+
+    Args:
+        result: Результат NLUService.process_text
+
+    Returns:
+        Словарь с командой, параметрами и модулем
+    """
+    return {
+        "parameters": result.get("parameters", {}),
+        "command": result.get("command", "UNKNOWN"),
+        "moduleName": result.get("moduleName", ""),
+        "moduleId": result.get("moduleId", ""),
+        "moduleTitle": result.get("moduleTitle", "")
+    }
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Потоковый ответ, который отдается одновременно с чтением тела запроса.
+
+    StreamingResponse при ASGI spec_version < 2.4 (uvicorn) параллельно
+    слушает receive() в ожидании отключения клиента и забирает себе части
+    тела запроса. Здесь тело читает сам генератор ответа, а отключение клиента
+    он получает как ClientDisconnect из request.stream().
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+
 @router.get("/", response_model=dict[str, Any])
 async def root() -> dict[str, Any]:
     """
@@ -67,7 +278,10 @@ async def root() -> dict[str, Any]:
             "health/live": "/health/live",
             "process": "/api/v1/process",
             "process_old": "/api/v1/process_old",
-            "tokens": "/api/v1/tokens"
+            "process_bulk": "/api/v1/process_bulk",
+            "session": "/api/v1/ws",
+            "tokens": "/api/v1/tokens",
+            "metrics": "/metrics"
         }
     }
 
@@ -97,6 +311,23 @@ async def health_check(request: Request):
     )
 
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Метрики сервиса в текстовом формате Prometheus.
+
+    Гистограммы длительности стадий и HTTP запросов, размеры батчей
+    и счетчики путей обработки (модель или правила).
+
+    Returns:
+        PlainTextResponse с метриками
+    """
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @router.post("/api/v1/process_old", response_model=CommandResponse)
 async def process_command_old(
     request: Request,
@@ -121,22 +352,23 @@ async def process_command_old(
     try:
         nlu_service = get_nlu_service(request)
         processor = get_processor(request)
-        result = nlu_service.process_text(command_request.message, processor)
+        deadline = get_request_deadline(request, command_request.timeout_ms)
+        result, degraded = await run_nlu(
+            request.app, nlu_service, processor, command_request.message,
+            deadline=deadline, receive=request.receive
+        )
 
         return CommandResponse(
             success=True,
-            data={
-                "parameters": result.get("parameters", {}),
-                "command": result.get("command", "UNKNOWN"),
-                "moduleName": result.get("moduleName", ""),
-                "moduleId": result.get("moduleId", ""),
-                "moduleTitle": result.get("moduleTitle", "")
-            },
-            error=""
+            data=build_command_data(result),
+            error="",
+            degraded=degraded
         )
 
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        return deadline_response(e)
     except (ValueError, KeyError, AttributeError, TypeError) as e:
         return CommandResponse(
             success=False,
@@ -157,20 +389,30 @@ async def process_command_old(
 @router.post("/api/v1/process", response_model=CommandResponse)
 async def process_command(
     request: Request,
-    command_request: CommandRequest
+    command_request: CommandRequest,
+    debug: bool = False
 ):
     """
     Обработать текстовую команду и классифицировать её.
     
     Извлекает сущности из входящего текста, определяет команду
-    и возвращает структурированный результат с параметрами и отладочной информацией.
+    и возвращает структурированный результат с параметрами.
+    С непустым session_id команда дополняется контекстом сессии:
+    уточнение вроде «скважина 125» к незавершенной команде обрабатывается
+    без NER модели.
+    Отладочная информация собирается и возвращается только по запросу
+    (`?debug=true` или заголовок `X-Debug: 1`).
 
     Args:
         request: HTTP запрос
-        command_request: Запрос с текстом команды для обработки
+        command_request: Запрос с текстом команды для обработки (бюджет
+            задержки — поле timeout_ms или заголовок X-Request-Timeout-Ms)
+        debug: Вернуть отладочную информацию в поле debug_info
 
     Returns:
-        CommandResponse с результатом обработки (команда, параметры, модуль, отладка)
+        CommandResponse с результатом обработки (команда, параметры, модуль
+        и, по запросу, отладка); degraded=True, если из-за перегрузки
+        команда обработана правилами без модели
         
     Raises:
         HTTPException: Если сервис недоступен (503)
@@ -178,27 +420,34 @@ async def process_command(
     try:
         nlu_service = get_nlu_service(request)
         processor = get_processor(request)
+        include_debug = is_debug_requested(request, debug)
+        context = get_session_context(request.app, command_request.session_id)
 
-        result = nlu_service.process_text(command_request.message, processor)
+        deadline = get_request_deadline(request, command_request.timeout_ms)
 
-        if "debug_info" in result:
-            result["debug_info"]["original_text"] = command_request.message
+        result, degraded = await run_nlu(
+            request.app, nlu_service, processor, command_request.message, debug=include_debug,
+            context=context, deadline=deadline, receive=request.receive
+        )
+        save_session_context(request.app, context)
+
+        data = build_command_data(result)
+        if include_debug:
+            debug_info = result.get("debug", {})
+            debug_info["original_text"] = command_request.message
+            data["debug_info"] = debug_info
 
         return CommandResponse(
             success=True,
-            data={
-                "parameters": result.get("parameters", {}),
-                "command": result.get("command", "UNKNOWN"),
-                "moduleName": result.get("moduleName", ""),
-                "moduleId": result.get("moduleId", ""),
-                "moduleTitle": result.get("moduleTitle", ""),
-                "debug_info": result.get("debug_info", {})
-            },
-            error=""
+            data=data,
+            error="",
+            degraded=degraded
         )
 
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        return deadline_response(e)
     except (ValueError, KeyError, AttributeError, TypeError) as e:
         return CommandResponse(
             success=False,
@@ -213,6 +462,137 @@ async def process_command(
             error="Internal server error"
         )
 
+
+@router.post("/api/v1/process_bulk", response_class=NDJSONStreamingResponse)
+async def process_bulk(request: Request, debug: bool = False) -> NDJSONStreamingResponse:
+    """
+    Потоковая обработка большого числа команд в формате NDJSON.
+
+    Тело запроса — по одному сообщению на строку: JSON объект
+    `{"message": "...", "id": ...}` или JSON строка. Тело читается по частям,
+    сообщения обрабатываются батчами NER модели (ModelConfig.BULK_BATCH_SIZE,
+    не больше ModelConfig.BULK_MAX_IN_FLIGHT батчей одновременно) в общей
+    с одиночными запросами очереди модели, результаты отдаются построчно
+    в порядке входа по мере готовности.
+
+    Args:
+        request: HTTP запрос
+        debug: Вернуть отладочную информацию в поле debug_info
+
+    Returns:
+        NDJSONStreamingResponse, строка на каждое сообщение:
+        `{"line", "id", "success", "data", "error"}`
+
+    Raises:
+        HTTPException: Если сервис недоступен (503)
+    """
+    nlu_service = get_nlu_service(request)
+    processor = get_processor(request)
+    include_debug = is_debug_requested(request, debug)
+
+    async def results() -> AsyncIterator[bytes]:
+        items = process_stream(
+            request.stream(),
+            nlu_service,
+            processor,
+            batch_size=ModelConfig.BULK_BATCH_SIZE,
+            max_in_flight=ModelConfig.BULK_MAX_IN_FLIGHT,
+            max_line_bytes=ModelConfig.BULK_MAX_LINE_BYTES,
+            debug=include_debug,
+            admission=getattr(request.app.state, 'admission', None)
+        )
+        async for item in items:
+            if "error" in item:
+                record = {"line": item["line"], "id": item["id"], "success": False, "data": {}, "error": item["error"]}
+            else:
+                data = build_command_data(item["result"])
+                if include_debug:
+                    data["debug_info"] = {**item["result"].get("debug", {}), "original_text": item["message"]}
+                record = {"line": item["line"], "id": item["id"], "success": True, "data": data, "error": ""}
+            yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return NDJSONStreamingResponse(results())
+
+
+@router.websocket("/api/v1/ws")
+async def session_websocket(websocket: WebSocket, session_id: str = ""):
+    """
+    Интерактивная сессия по WebSocket.
+
+    Соединение держится открытым на всю сессию: клиент шлет реплики
+    (JSON `{"message": "...", "reset": false, "debug": false}` или просто
+    текст, текстовым или бинарным кадром в UTF-8), сервис отвечает кадром CommandResponse на каждую реплику.
+    Последние модуль, месторождение, скважина и период хранятся в контексте
+    сессии, и уточняющие реплики дополняются ими. С session_id контекст
+    берется из общего хранилища сессий и доступен также через /process.
+
+    Args:
+        websocket: WebSocket соединение
+        session_id: Идентификатор сессии
+    """
+    await websocket.accept()
+    nlu_service = getattr(websocket.app.state, 'nlu_service', None)
+    processor = getattr(websocket.app.state, 'processor', None)
+    if not nlu_service or not processor:
+        await websocket.close(code=1013, reason="NLU service not available")
+        return
+
+    # Без session_id контекст живет только в рамках соединения
+    context = get_session_context(websocket.app, session_id) or SessionContext()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Бинарный кадр принимается как текст в UTF-8
+            frame = message.get("text")
+            if frame is None:
+                try:
+                    frame = (message.get("bytes") or b"").decode("utf-8")
+                except UnicodeDecodeError:
+                    response = CommandResponse(success=False, data={}, error="Binary frame is not valid UTF-8")
+                    await websocket.send_text(response.model_dump_json())
+                    continue
+            try:
+                session_message = SessionMessage.model_validate_json(frame)
+            except ValueError:
+                session_message = SessionMessage(message=frame)
+
+            if session_message.reset:
+                context.reset()
+                if session_id:
+                    save_session_context(websocket.app, context)
+            if not session_message.message.strip():
+                response = CommandResponse(success=True, data={"context": context.to_dict()})
+                await websocket.send_text(response.model_dump_json())
+                continue
+
+            try:
+                result, degraded = await run_nlu(
+                    websocket.app, nlu_service, processor, session_message.message,
+                    debug=session_message.debug, context=context,
+                    deadline=Deadline.from_timeout_ms(session_message.timeout_ms or ModelConfig.REQUEST_TIMEOUT_MS)
+                )
+                data = build_command_data(result)
+                if session_message.debug:
+                    data["debug_info"] = {**result.get("debug", {}), "original_text": session_message.message}
+                    data["context"] = context.to_dict()
+                response = CommandResponse(success=True, data=data, error="", degraded=degraded)
+                if session_id:
+                    save_session_context(websocket.app, context)
+            except DeadlineExceeded as e:
+                response = CommandResponse(success=False, data={"stage": e.stage}, error=str(e))
+            except (ValueError, KeyError, AttributeError, TypeError) as e:
+                response = CommandResponse(success=False, data={}, error=f"Processing error: {str(e)}")
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"Unexpected error in session_websocket: {type(e).__name__}: {str(e)}")
+                response = CommandResponse(success=False, data={}, error="Internal server error")
+
+            await websocket.send_text(response.model_dump_json())
+    except WebSocketDisconnect:
+        pass
+
+
 @router.post("/api/v1/tokens", response_model=TokenResponse)
 async def get_tokens(
     request: Request,
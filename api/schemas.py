@@ -13,9 +13,25 @@ class CommandRequest(BaseModel):
     Attributes:
         message (str): Текст сообщения команды для обработки.
         session_id (str): Идентификатор сессии пользователя. По умолчанию пустая строка.
+        timeout_ms (float | None): Бюджет задержки клиента в миллисекундах.
+            Работа, не уложившаяся в него, прекращается. По умолчанию без дедлайна.
     """
     message: str
     session_id: str = ""
+    timeout_ms: float | None = None
+
+
+class SessionMessage(CommandRequest):
+    """Схема сообщения WebSocket сессии.
+    
+    Attributes:
+        reset (bool): Сбросить контекст сессии перед обработкой сообщения.
+            Сообщение может быть пустым, тогда выполняется только сброс.
+        debug (bool): Вернуть отладочную информацию в поле debug_info.
+    """
+    message: str = ""
+    reset: bool = False
+    debug: bool = False
 
 
 class CommandResponse(BaseModel):
@@ -25,10 +41,12 @@ class CommandResponse(BaseModel):
         success (bool): Флаг успешности обработки команды.
         data (dict[str, Any]): Данные результата обработки команды.
         error (str): Сообщение об ошибке, если возникла. По умолчанию пустая строка.
+        degraded (bool): Команда обработана правилами без модели из-за перегрузки.
     """
     success: bool
     data: dict[str, Any]
     error: str = ""
+    degraded: bool = False
 
 
 class TokenResponse(BaseModel):
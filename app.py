@@ -2,26 +2,50 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from typing import AsyncIterator
+from typing import Any, AsyncIterator
 
+from .api.admin import admin_router
 from .api.routes import router
 from .config.model_config import ModelConfig
 from .core.command.processor import CommandProcessor
+from .core.command.session import create_session_store
+from .core.monitoring.loop_monitor import create_loop_monitor
+from .core.monitoring.middleware import MetricsMiddleware, ServerTimingMiddleware
 from .core.nlu.services.nlu_service import NLUService
 from .core.registry.registry_service import RegistryService
+from .core.serving.admission import create_admission_controller
+from .core.serving.bulk import executor_stats as bulk_executor_stats
+from .core.serving.prefork import get_preloaded_services, run_prefork
+
+
+def build_services() -> dict[str, Any]:
+    registry_service = RegistryService()
+    processor = CommandProcessor(registry_service)
+    nlu_service = NLUService()
+    return {
+        "registry_service": registry_service,
+        "processor": processor,
+        "nlu_service": nlu_service,
+        "session_store": create_session_store(),
+        "admission": create_admission_controller()
+    }
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     try:
-        print("Initializing services...")
-        registry_service = RegistryService()
-        processor = CommandProcessor(registry_service)
-        nlu_service = NLUService()
+        services = get_preloaded_services()
+        if services is None:
+            print("Initializing services...")
+            services = build_services()
+        else:
+            print("Using services preloaded before fork")
 
-        app.state.registry_service = registry_service
-        app.state.processor = processor
-        app.state.nlu_service = nlu_service
+        app.state.registry_service = services["registry_service"]
+        app.state.processor = services["processor"]
+        app.state.nlu_service = services["nlu_service"]
+        app.state.session_store = services["session_store"]
+        app.state.admission = services["admission"]
 
         print("NLU Service started successfully")
     except Exception as e:
@@ -29,10 +53,26 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
         app.state.registry_service = None
         app.state.processor = None
         app.state.nlu_service = None
+        app.state.session_store = None
+        app.state.admission = None
+
+    app.state.loop_monitor = create_loop_monitor()
+    if app.state.loop_monitor is not None:
+        admission = app.state.admission
+        if admission is not None:
+            app.state.loop_monitor.add_executor(
+                "inference", lambda: (admission.running, admission.waiting, admission.concurrency)
+            )
+        else:
+            # Без контроля допуска пакетная обработка идет в собственный пул
+            app.state.loop_monitor.add_executor("bulk", bulk_executor_stats)
+        app.state.loop_monitor.start()
 
     yield
 
     print("Shutting down NLU Service...")
+    if app.state.loop_monitor is not None:
+        await app.state.loop_monitor.stop()
 
 
 def create_app() -> FastAPI:
@@ -50,8 +90,11 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(ServerTimingMiddleware)
+    app.add_middleware(MetricsMiddleware)
 
     app.include_router(router)
+    app.include_router(admin_router)
     return app
 
 
@@ -59,10 +102,19 @@ app = create_app()
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.app:app",
-        host=ModelConfig.HOST,
-        port=ModelConfig.PORT,
-        reload=ModelConfig.DEBUG,
-        log_level="info"
-    )
+    if ModelConfig.WORKERS > 1:
+        run_prefork(
+            app,
+            build_services,
+            host=ModelConfig.HOST,
+            port=ModelConfig.PORT,
+            workers=ModelConfig.WORKERS
+        )
+    else:
+        uvicorn.run(
+            "app.app:app",
+            host=ModelConfig.HOST,
+            port=ModelConfig.PORT,
+            reload=ModelConfig.DEBUG,
+            log_level="info"
+        )
@@ -0,0 +1,295 @@
+"""
+Офлайн пакетная обработка команд без HTTP.
+
+Входной файл JSONL (объект с полем message и необязательным id или JSON
+строка на каждой строке) или CSV (колонки message и id) читается потоком и
+делится на чанки по --chunk-size сообщений. Чанки раздаются пулу процессов:
+каждый воркер один раз создает свой NLUService и CommandProcessor и
+обрабатывает чанк батчами модели по --batch-size. Результаты пишутся в
+порядке входа в JSONL или Parquet (нужен pyarrow).
+
+После каждого записанного чанка обновляется файл контрольной точки
+`<output>.checkpoint`, и прерванный запуск продолжается с флагом --resume.
+
+Строка, которая не разбирается (не JSON, JSON не объект и не строка), не
+останавливает запуск: в результат для нее пишется запись с success=false
+и текстом ошибки, нумерация строк и контрольные точки не сдвигаются.
+
+Пример:
+    python -m app.batch --input commands.jsonl --output results.jsonl \
+        --workers 4 --batch-size 32 --resume
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Iterator
+
+from .api.routes import build_command_data
+from .core.serving.prefork import configure_torch_threads
+
+_worker_services: dict[str, Any] | None = None
+
+
+def read_messages(path: str, text_field: str = "message") -> Iterator[tuple[Any, str, str]]:
+    """
+    Читает сообщения из JSONL или CSV файла.
+
+    Yields:
+        tuple: Идентификатор сообщения (номер строки, если id нет), текст и
+        ошибка разбора строки (пустая строка, если строка разобрана).
+    """
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            for index, row in enumerate(csv.DictReader(f)):
+                yield row.get("id") or index, row.get(text_field) or "", ""
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield index, "", f"Invalid line {index + 1}: {e}"
+                continue
+            if isinstance(item, str):
+                yield index, item, ""
+            elif isinstance(item, dict):
+                yield item.get("id", index), item.get(text_field) or "", ""
+            else:
+                yield index, "", f"Invalid line {index + 1}: expected a JSON object or string"
+
+
+def _init_worker(workers: int, verbose: bool) -> None:
+    global _worker_services  # pylint: disable=global-statement
+    # pylint: disable=import-outside-toplevel
+    from .app import build_services
+
+    configure_torch_threads(workers)
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        _worker_services = build_services()
+    _worker_services["verbose"] = verbose
+
+
+def _process_chunk(chunk: list[tuple[Any, str, str]], batch_size: int) -> tuple[int, float, list[dict]]:
+    nlu_service = _worker_services["nlu_service"]
+    processor = _worker_services["processor"]
+    started = time.perf_counter()
+    records = []
+    # Сервисы печатают отладку на каждое сообщение, в офлайн режиме она не нужна
+    with contextlib.redirect_stdout(sys.stdout if _worker_services["verbose"] else io.StringIO()):
+        for i in range(0, len(chunk), batch_size):
+            batch = chunk[i:i + batch_size]
+            texts = [text for _, text, error in batch if not error]
+            try:
+                results = iter(nlu_service.process_batch(texts, processor) if texts else [])
+                batch_error = ""
+            except Exception as e:  # pylint: disable=broad-except
+                batch_error = str(e)
+            for item_id, _, error in batch:
+                error = error or batch_error
+                if error:
+                    records.append({"id": item_id, "success": False, "data": {}, "error": error})
+                else:
+                    records.append({"id": item_id, "success": True, "data": build_command_data(next(results)),
+                                    "error": ""})
+    return os.getpid(), time.perf_counter() - started, records
+
+
+class JsonlWriter:
+    """Запись результатов в JSONL с продолжением с контрольной точки."""
+
+    def __init__(self, path: str, checkpoint: dict | None):
+        self.path = path
+        self.file = open(path, "r+b" if checkpoint else "wb")  # pylint: disable=consider-using-with
+        if checkpoint:
+            # Все, что записано после контрольной точки, пишется заново
+            self.file.truncate(checkpoint["output_bytes"])
+            self.file.seek(checkpoint["output_bytes"])
+
+    def write(self, records: list[dict]) -> None:
+        self.file.write(b"".join(
+            (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records
+        ))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def state(self) -> dict:
+        return {"output_bytes": self.file.tell()}
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Запись результатов в Parquet: каталог с частями part-NNNNN.parquet.
+
+    Каждый чанк — отдельная часть, поэтому продолжение с контрольной точки
+    сводится к удалению частей, записанных после нее.
+    """
+
+    def __init__(self, path: str, checkpoint: dict | None):
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow") from e
+        self.pyarrow = pyarrow
+        self.path = path
+        self.parts = checkpoint["parts"] if checkpoint else 0
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            number = name[5:10]
+            if name.startswith("part-") and number.isdigit() and int(number) >= self.parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, records: list[dict]) -> None:
+        columns = {
+            "id": [str(record["id"]) for record in records],
+            "success": [record["success"] for record in records],
+            "command": [record["data"].get("command", "") for record in records],
+            "module_name": [record["data"].get("moduleName", "") for record in records],
+            "module_id": [record["data"].get("moduleId", "") for record in records],
+            "module_title": [record["data"].get("moduleTitle", "") for record in records],
+            "parameters": [json.dumps(record["data"].get("parameters", {}), ensure_ascii=False)
+                           for record in records],
+            "error": [record["error"] for record in records],
+        }
+        table = self.pyarrow.table(columns)
+        self.pyarrow.parquet.write_table(table, os.path.join(self.path, f"part-{self.parts:05d}.parquet"))
+        self.parts += 1
+
+    def state(self) -> dict:
+        return {"parts": self.parts}
+
+    def close(self) -> None:
+        pass
+
+
+def load_checkpoint(path: str, input_path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        raise ValueError(f"Checkpoint {path} belongs to another input: {checkpoint.get('input')}")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    # Атомарная замена: прерывание во время записи не портит контрольную точку
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _chunks(messages: Iterator[tuple[Any, str, str]], size: int) -> Iterator[list[tuple[Any, str, str]]]:
+    while True:
+        chunk = list(islice(messages, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(args: argparse.Namespace) -> dict:
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    checkpoint_path = args.output + ".checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path, args.input) if args.resume else None
+    records_done = checkpoint["records"] if checkpoint else 0
+
+    writer_class = ParquetWriter if output_format == "parquet" else JsonlWriter
+    writer = writer_class(args.output, checkpoint)
+    messages = islice(read_messages(args.input, args.text_field), records_done, None)
+
+    workers: dict[int, dict[str, float]] = {}
+    processed = 0
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.workers, initializer=_init_worker,
+                              initargs=(args.workers, args.verbose)) as pool:
+        # Не больше 2 чанков на воркер в очереди: вход не читается в память целиком
+        pending: deque = deque()
+        chunks = _chunks(messages, args.chunk_size)
+
+        def submit() -> bool:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            pending.append(pool.apply_async(_process_chunk, (chunk, args.batch_size)))
+            return True
+
+        while len(pending) < args.workers * 2 and submit():
+            pass
+        while pending:
+            pid, elapsed, records = pending.popleft().get()
+            submit()
+            writer.write(records)
+            processed += len(records)
+            save_checkpoint(checkpoint_path, {
+                "input": os.path.abspath(args.input),
+                "records": records_done + processed,
+                **writer.state()
+            })
+            stats = workers.setdefault(pid, {"records": 0, "busy_seconds": 0.0})
+            stats["records"] += len(records)
+            stats["busy_seconds"] += elapsed
+            if args.progress_every and processed % args.progress_every < len(records):
+                rate = processed / (time.perf_counter() - started)
+                print(f"Processed {records_done + processed} records, {rate:.1f} records/s", file=sys.stderr)
+    writer.close()
+    wall_time = time.perf_counter() - started
+
+    return {
+        "input": args.input,
+        "output": args.output,
+        "format": output_format,
+        "resumed_from": records_done,
+        "records": processed,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(processed / wall_time, 2) if wall_time else 0.0,
+        "workers": [
+            {
+                "pid": pid,
+                "records": int(stats["records"]),
+                "busy_seconds": round(stats["busy_seconds"], 3),
+                "throughput_rps": round(stats["records"] / stats["busy_seconds"], 2) if stats["busy_seconds"] else 0.0
+            }
+            for pid, stats in sorted(workers.items())
+        ]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline batch processing of commands")
+    parser.add_argument("--input", required=True, help="JSONL or CSV file with messages")
+    parser.add_argument("--output", required=True, help="JSONL file or Parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"],
+                        help="Output format, by default guessed from --output")
+    parser.add_argument("--text-field", default="message")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=32, help="Messages per model forward pass")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Messages per task and per checkpoint")
+    parser.add_argument("--resume", action="store_true", help="Continue from <output>.checkpoint")
+    parser.add_argument("--progress-every", type=int, default=10000)
+    parser.add_argument("--verbose", action="store_true", help="Keep per-message service output")
+    args = parser.parse_args()
+
+    if not args.resume and os.path.exists(args.output + ".checkpoint"):
+        parser.error(f"{args.output}.checkpoint exists, use --resume or remove it")
+
+    report = run(args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Генератор синтетического корпуса команд.
+
+Команды собираются из словарей `config/command_config.py` (WELL_FIELDS,
+WELL_NAMES, PERIODS, DATES, YEARS, REPORT_NAME) и синонимов модулей из
+реестра. Для каждой команды сохраняется разметка слов тегами NER_LABELS и
+ожидаемый модуль, поэтому корпус годится и для бенчмарков, и для оценки
+качества моделей.
+
+Пример:
+    python -m app.benchmarks.corpus --size 1000 --output corpus.jsonl
+"""
+import argparse
+import json
+import random
+from dataclasses import asdict, dataclass
+
+from ..config.command_config import (DATES, PERIODS, REPORT_NAME, WELL_FIELDS,
+                                     WELL_NAMES, YEARS)
+from ..core.registry.knowledge_base import KnowledgeBase
+
+VERBS = ["открой", "покажи", "выведи", "открыть", "показать", "запусти", ""]
+
+MONTHS = [
+    "январь", "февраль", "март", "апрель", "май", "июнь",
+    "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь"
+]
+
+WELL_PREFIXES = ["", "скважина", "скв", "№"]
+
+FIELD_PREFIXES = ["", "месторождение", "по"]
+
+
+@dataclass
+class CommandSample:
+    """
+    Команда синтетического корпуса.
+
+    Attributes:
+        text (str): Текст команды.
+        tags (list[str]): Теги NER для каждого слова текста.
+        module_id (str): Идентификатор модуля, который должна открыть команда.
+    """
+    text: str
+    tags: list[str]
+    module_id: str
+
+
+class _Builder:
+    def __init__(self):
+        self.words: list[str] = []
+        self.tags: list[str] = []
+
+    def add(self, phrase: str, entity: str | None = None) -> None:
+        for i, word in enumerate(phrase.split()):
+            self.words.append(word)
+            if entity is None:
+                self.tags.append("O")
+            else:
+                self.tags.append(f"{'B' if i == 0 else 'I'}-{entity}")
+
+    def build(self, module_id: str) -> CommandSample:
+        return CommandSample(" ".join(self.words), self.tags, module_id)
+
+
+def _add_period(builder: _Builder, rng: random.Random) -> None:
+    kind = rng.random()
+    builder.add("за")
+    if kind < 0.35:
+        builder.add(rng.choice(PERIODS), "PERIOD")
+    elif kind < 0.6:
+        builder.add(rng.choice(MONTHS), "MONTH")
+        year = rng.choice(YEARS).split()
+        builder.add(year[0], "YEAR")
+        if len(year) > 1:
+            builder.add(" ".join(year[1:]))
+    elif kind < 0.85:
+        builder.add(rng.choice(DATES), "DATE")
+    else:
+        builder.add(rng.choice(MONTHS), "MONTH")
+        builder.add("прошлого года", "PERIOD")
+
+
+def _module_slots(registry: dict, module_id: str) -> set[str]:
+    return set(registry.get(module_id, {}).get("slots", {}))
+
+
+def generate_corpus(size: int, seed: int = 0,
+                    knowledge_base: KnowledgeBase | None = None) -> list[CommandSample]:
+    """
+    Генерирует корпус команд.
+
+    Args:
+        size: Число команд.
+        seed: Зерно генератора случайных чисел.
+        knowledge_base: База знаний с реестром и синонимами модулей.
+
+    Returns:
+        list[CommandSample]: Команды с разметкой.
+    """
+    rng = random.Random(seed)
+    knowledge_base = knowledge_base or KnowledgeBase()
+    synonyms = [
+        (module_id, synonym)
+        for module_id, module_synonyms in knowledge_base.target_synonyms.items()
+        for synonym in module_synonyms
+    ]
+
+    samples = []
+    for _ in range(size):
+        module_id, synonym = rng.choice(synonyms)
+        slots = _module_slots(knowledge_base.registry, module_id)
+        builder = _Builder()
+
+        verb = rng.choice(VERBS)
+        if verb:
+            builder.add(verb)
+        builder.add(synonym, "TARGET")
+
+        if "REPORT_NAME" in slots:
+            builder.add(rng.choice(REPORT_NAME), "REPORT_NAME")
+
+        if "WELL_FIELD" in slots:
+            prefix = rng.choice(FIELD_PREFIXES)
+            if prefix:
+                builder.add(prefix)
+            builder.add(rng.choice(WELL_FIELDS), "WELL_FIELD")
+
+        if "WELL_NAME" in slots:
+            prefix = rng.choice(WELL_PREFIXES)
+            if prefix:
+                builder.add(prefix)
+            builder.add(rng.choice(WELL_NAMES), "WELL_NAME")
+
+        if "PERIOD" in slots and rng.random() < 0.8:
+            _add_period(builder, rng)
+
+        samples.append(builder.build(module_id))
+    return samples
+
+
+def save_corpus(samples: list[CommandSample], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for sample in samples:
+            f.write(json.dumps(asdict(sample), ensure_ascii=False) + "\n")
+
+
+def load_corpus(path: str) -> list[CommandSample]:
+    with open(path, encoding="utf-8") as f:
+        return [CommandSample(**json.loads(line)) for line in f if line.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic command corpus")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    samples = generate_corpus(args.size, args.seed)
+    save_corpus(samples, args.output)
+    print(f"Saved {len(samples)} commands to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Сквозной бенчмарк задержки и пропускной способности NLU сервиса.
+
+Режимы:
+    in_process — вызовы `NLUService.process_text` из пула потоков, с разбивкой
+                 времени по стадиям из таймингов `timed_stage`;
+    asgi       — HTTP запросы к приложению в том же процессе (httpx.ASGITransport);
+    http       — HTTP запросы к запущенному сервису по --url.
+
+В режимах asgi и http разбивка по стадиям берется из заголовка Server-Timing.
+
+Результат печатается и сохраняется в JSON. При указании --baseline результат
+сравнивается с базовым замером, и при ухудшении больше --threshold процесс
+завершается с кодом 1. Базовый замер снимается на той же машине через
+--save-baseline.
+
+Пример:
+    python -m app.benchmarks.e2e --mode in_process --requests 500 --concurrency 4 \
+        --save-baseline baseline.json
+    python -m app.benchmarks.e2e --mode in_process --requests 500 --concurrency 4 \
+        --output bench.json --baseline baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .corpus import generate_corpus, load_corpus
+from .report import (compare_to_baseline, environment_info, load_report,
+                     save_report, summarize_latencies)
+from ..core.monitoring.metrics import (get_request_timings, reset_request_timings,
+                                       start_request_timings)
+from ..core.utils.memory_utils import get_peak_rss
+
+
+def _build_services():
+    # pylint: disable=import-outside-toplevel
+    from ..app import build_services
+    return build_services()
+
+
+def _process_with_stages(nlu_service, processor, text: str) -> dict[str, float]:
+    # Стадии замеряет сам NLUService.process_text (timed_stage), как для Server-Timing
+    token = start_request_timings()
+    try:
+        started = time.perf_counter()
+        nlu_service.process_text(text, processor, debug=False)
+        finished = time.perf_counter()
+        timings = {stage: duration * 1000 for stage, duration in get_request_timings().items()}
+    finally:
+        reset_request_timings(token)
+    timings["total"] = (finished - started) * 1000
+    return timings
+
+
+def run_in_process(texts: list[str], concurrency: int, warmup: int) -> dict:
+    services = _build_services()
+    nlu_service = services["nlu_service"]
+    processor = services["processor"]
+
+    for text in texts[:warmup]:
+        _process_with_stages(nlu_service, processor, text)
+
+    latencies: list[float] = []
+    stages: dict[str, list[float]] = {}
+    errors = 0
+
+    def run_one(text: str) -> dict[str, float] | None:
+        try:
+            return _process_with_stages(nlu_service, processor, text)
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for timings in executor.map(run_one, texts):
+            if timings is None:
+                errors += 1
+                continue
+            latencies.append(timings.pop("total"))
+            for stage, duration in timings.items():
+                stages.setdefault(stage, []).append(duration)
+    wall_time = time.perf_counter() - started
+
+    return {
+        "latencies": latencies,
+        "stages": stages,
+        "errors": errors,
+        "wall_time": wall_time,
+        "model_loaded": nlu_service.ner_service.is_model_loaded()
+    }
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur" and name:
+                timings[name] = float(value)
+    return timings
+
+
+async def _run_http_requests(client, texts: list[str],
+                             concurrency: int) -> tuple[list[float], dict[str, list[float]], int, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    stages: dict[str, list[float]] = {}
+    errors = 0
+
+    async def run_one(text: str) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/process", json={"message": text})
+                ok = response.status_code == 200 and response.json().get("success", False)
+            except Exception:  # pylint: disable=broad-except
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000)
+                server_timing = parse_server_timing(response.headers.get("server-timing", ""))
+                for stage, duration in server_timing.items():
+                    if stage != "total":
+                        stages.setdefault(stage, []).append(duration)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_one(text) for text in texts))
+    return latencies, stages, errors, time.perf_counter() - started
+
+
+async def run_http(texts: list[str], concurrency: int, warmup: int, url: str | None) -> dict:
+    # pylint: disable=import-outside-toplevel
+    import httpx
+
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            await _run_http_requests(client, texts[:warmup], 1)
+            latencies, stages, errors, wall_time = await _run_http_requests(client, texts, concurrency)
+        return {"latencies": latencies, "stages": stages, "errors": errors, "wall_time": wall_time}
+
+    from ..app import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await _run_http_requests(client, texts[:warmup], 1)
+            latencies, stages, errors, wall_time = await _run_http_requests(client, texts, concurrency)
+        model_loaded = app.state.nlu_service.ner_service.is_model_loaded() if app.state.nlu_service else False
+    return {
+        "latencies": latencies,
+        "stages": stages,
+        "errors": errors,
+        "wall_time": wall_time,
+        "model_loaded": model_loaded
+    }
+
+
+def build_report(mode: str, concurrency: int, result: dict) -> dict:
+    requests = len(result["latencies"]) + result["errors"]
+    report = {
+        "benchmark": "e2e",
+        "mode": mode,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": result["errors"],
+        "wall_time_s": round(result["wall_time"], 3),
+        "throughput_rps": round(len(result["latencies"]) / result["wall_time"], 2) if result["wall_time"] else 0.0,
+        "latency_ms": summarize_latencies(result["latencies"]),
+        "stages_ms": {stage: summarize_latencies(values) for stage, values in result["stages"].items()},
+        "environment": environment_info()
+    }
+    if "model_loaded" in result:
+        report["model_loaded"] = result["model_loaded"]
+    if mode != "http":
+        report["peak_rss_mb"] = round(get_peak_rss() / (1024 * 1024), 1)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end NLU benchmark")
+    parser.add_argument("--mode", choices=["in_process", "asgi", "http"], default="in_process")
+    parser.add_argument("--url", help="Base URL of a running service for --mode http")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", help="JSONL corpus instead of a generated one")
+    parser.add_argument("--output", help="Path to save the JSON report")
+    parser.add_argument("--baseline", help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Allowed relative regression, 0.1 = 10%%")
+    parser.add_argument("--save-baseline", help="Also save the report as a new baseline")
+    args = parser.parse_args()
+
+    if args.mode == "http" and not args.url:
+        parser.error("--url is required for --mode http")
+
+    samples = load_corpus(args.corpus) if args.corpus else generate_corpus(args.requests, args.seed)
+    texts = [sample.text for sample in samples][:args.requests]
+
+    # Сервис печатает отладочный вывод на каждый запрос, в замер он не попадает
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.mode == "in_process":
+            result = run_in_process(texts, args.concurrency, args.warmup)
+        else:
+            result = asyncio.run(run_http(texts, args.concurrency, args.warmup, args.url))
+
+    report = build_report(args.mode, args.concurrency, result)
+
+    if args.baseline:
+        baseline = load_report(args.baseline)
+        if baseline.get("mode") != report["mode"]:
+            parser.error(f"Baseline mode {baseline.get('mode')!r} differs from {report['mode']!r}")
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        report["baseline"] = {
+            "path": args.baseline,
+            "threshold": args.threshold,
+            "regressions": regressions
+        }
+
+    if args.output:
+        save_report(report, args.output)
+    if args.save_baseline:
+        save_report(report, args.save_baseline)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.baseline and report["baseline"]["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
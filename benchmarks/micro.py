@@ -0,0 +1,237 @@
+"""
+Микробенчмарки парсеров и реестра.
+
+Каждый бенчмарк замеряется изолированно для сетки параметров:
+    vocab_size  — размер справочника месторождений (WELL_FIELDS дополняется
+                  синтетическими названиями) или число синонимов реестра;
+    input_words — длина входного текста в словах.
+
+BERT модель не нужна: замеряются только парсеры и база знаний.
+
+Пример:
+    python -m app.benchmarks.micro --vocab-sizes 300,3000,30000 --lengths 5,20,80 \
+        --output micro.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+from typing import Callable
+
+from .report import environment_info, percentile, save_report
+from ..config.command_config import WELL_FIELDS, WELL_NAMES
+from ..core.nlu.parsers.date_parser import DateParser
+from ..core.nlu.parsers.entity_parser import EntityParser
+from ..core.nlu.parsers.number_parser import NumberParser
+from ..core.nlu.parsers.well_field_normalizer import build_inflection_index, lookup_well_field
+from ..core.registry.knowledge_base import KnowledgeBase
+
+_SYLLABLES = ["ба", "ве", "го", "ду", "ер", "жи", "зо", "ки", "ла", "ме",
+              "но", "пу", "ро", "се", "ту", "фа", "ха", "це", "ша", "юр"]
+_FIELD_ENDINGS = ["ское", "овское", "инское", "евское", "ное"]
+
+_FILLER = ["открой", "пожалуйста", "данные", "по", "скважине", "за", "период",
+           "и", "покажи", "информацию", "на", "экране"]
+
+_NUMBER_WORDS = ["сто", "двадцать", "три", "дробь", "пять", "тысяча", "девятьсот"]
+
+_PERIOD_PHRASES = ["октябрь 2024 года", "прошлый месяц", "март прошлого года",
+                   "15 января", "текущий месяц", "декабрь"]
+
+
+def synthetic_well_fields(size: int, seed: int = 0) -> list[str]:
+    """
+    Справочник месторождений заданного размера.
+
+    Реальные названия из WELL_FIELDS дополняются синтетическими.
+    """
+    rng = random.Random(seed)
+    fields = list(WELL_FIELDS[:size])
+    seen = set(fields)
+    while len(fields) < size:
+        stem = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        name = (stem + rng.choice(_FIELD_ENDINGS)).capitalize()
+        if name not in seen:
+            seen.add(name)
+            fields.append(name)
+    return fields
+
+
+def synthetic_synonyms(size: int, base: dict[str, list], seed: int = 0) -> dict[str, list]:
+    """Синонимы реестра, дополненные синтетическими модулями до `size` синонимов."""
+    rng = random.Random(seed)
+    synonyms = {module_id: list(values) for module_id, values in base.items()}
+    count = sum(len(values) for values in synonyms.values())
+    index = 0
+    while count < size:
+        module_synonyms = [
+            " ".join("".join(rng.choice(_SYLLABLES) for _ in range(3)) for _ in range(rng.randint(1, 3)))
+            for _ in range(4)
+        ]
+        synonyms[f"synthetic_{index}"] = module_synonyms
+        count += len(module_synonyms)
+        index += 1
+    return synonyms
+
+
+def _text(words: int, rng: random.Random, tail: list[str]) -> str:
+    body = [rng.choice(_FILLER) for _ in range(max(0, words - len(tail)))]
+    return " ".join(body + tail)
+
+
+def _bench_numbers(vocab_size: int, words: int, rng: random.Random) -> Callable[[], object]:
+    parser = NumberParser()
+    tokens = [rng.choice(_NUMBER_WORDS + _FILLER) for _ in range(words)]
+    text = " ".join(tokens)
+    return lambda: parser.convert_text_numbers_to_digits(text)
+
+
+def _bench_period(vocab_size: int, words: int, rng: random.Random) -> Callable[[], object]:
+    parser = DateParser()
+    text = _text(words, rng, rng.choice(_PERIOD_PHRASES).split())
+    return lambda: parser.parse_period(text)
+
+
+def _bench_field_fast(vocab_size: int, words: int, rng: random.Random) -> Callable[[], object]:
+    fields = synthetic_well_fields(vocab_size)
+    parser = EntityParser(fields)
+    # Месторождение из второй половины справочника: линейный поиск проходит большую часть
+    text = _text(words, rng, [fields[len(fields) * 3 // 4].lower()])
+    return lambda: parser.find_well_field_fast(text)
+
+
+def _bench_field_context(vocab_size: int, words: int, rng: random.Random) -> Callable[[], object]:
+    fields = synthetic_well_fields(vocab_size)
+    parser = EntityParser(fields)
+    text = _text(words, rng, ["на", fields[len(fields) // 2].lower(), "месторождении"])
+    return lambda: parser.find_field_by_context(text)
+
+
+def _bench_extract_entities(vocab_size: int, words: int, rng: random.Random) -> Callable[[], object]:
+    fields = synthetic_well_fields(vocab_size)
+    parser = EntityParser(fields)
+    tagged = [("шахматку", "B-TARGET"), (rng.choice(fields), "B-WELL_FIELD"),
+              (rng.choice(WELL_NAMES), "B-WELL_NAME"), ("октябрь", "B-MONTH"), ("2024", "B-YEAR")]
+    ner_results = [{"token": rng.choice(_FILLER), "tag": "O"} for _ in range(max(0, words - len(tagged)))]
+    ner_results += [{"token": token, "tag": tag} for token, tag in tagged]
+    return lambda: parser.extract_entities(ner_results)
+
+
+def _bench_synonym(vocab_size: int, words: int, rng: random.Random) -> Callable[[], object]:
+    knowledge_base = KnowledgeBase()
+    knowledge_base.target_synonyms = synthetic_synonyms(vocab_size, knowledge_base.target_synonyms)
+    # Промах по всем синонимам: худший случай линейного поиска
+    text = _text(words, rng, ["несуществующий", "модуль"])
+    return lambda: knowledge_base.find_module_by_synonym(text)
+
+
+def _bench_lookup(vocab_size: int, words: int, rng: random.Random) -> Callable[[], object]:
+    # Индекс по синтетическому справочнику: normalize_well_field всегда ищет в WELL_FIELDS
+    fields = synthetic_well_fields(vocab_size)
+    index = build_inflection_index(fields)
+    inflected = [field[:-2] + "ом" for field in fields if field.endswith("ое")]
+    return lambda: lookup_well_field(index, rng.choice(inflected))
+
+
+BENCHMARKS: dict[str, Callable[[int, int, random.Random], Callable[[], object]]] = {
+    "NumberParser.convert_text_numbers_to_digits": _bench_numbers,
+    "DateParser.parse_period": _bench_period,
+    "EntityParser.find_well_field_fast": _bench_field_fast,
+    "EntityParser.find_field_by_context": _bench_field_context,
+    "EntityParser.extract_entities": _bench_extract_entities,
+    "KnowledgeBase.find_module_by_synonym": _bench_synonym,
+    "lookup_well_field": _bench_lookup,
+}
+
+# Бенчмарки, время которых не зависит от размера справочника
+VOCAB_INDEPENDENT = {"NumberParser.convert_text_numbers_to_digits", "DateParser.parse_period"}
+
+# Бенчмарки, которые принимают одно название, а не текст
+LENGTH_INDEPENDENT = {"lookup_well_field"}
+
+
+def measure(func: Callable[[], object], repeat: int, min_time: float = 0.02) -> dict[str, float]:
+    """
+    Замеряет время вызова функции в микросекундах.
+
+    Вызовы группируются в серии так, чтобы серия длилась не меньше `min_time`,
+    и время одного вызова считается по каждой из `repeat` серий.
+    """
+    func()
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number * 1_000_000)
+    return {
+        "calls_per_sample": number,
+        "min_us": round(min(samples), 3),
+        "median_us": round(percentile(samples, 50), 3),
+        "p95_us": round(percentile(samples, 95), 3)
+    }
+
+
+def run(names: list[str], vocab_sizes: list[int], lengths: list[int], repeat: int, seed: int) -> list[dict]:
+    results = []
+    for name in names:
+        sizes = vocab_sizes[:1] if name in VOCAB_INDEPENDENT else vocab_sizes
+        input_lengths = lengths[:1] if name in LENGTH_INDEPENDENT else lengths
+        for vocab_size in sizes:
+            for words in input_lengths:
+                rng = random.Random(seed)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    func = BENCHMARKS[name](vocab_size, words, rng)
+                    stats = measure(func, repeat)
+                results.append({
+                    "benchmark": name,
+                    "vocab_size": None if name in VOCAB_INDEPENDENT else vocab_size,
+                    "input_words": None if name in LENGTH_INDEPENDENT else words,
+                    **stats
+                })
+                print(f"{name:45} vocab={vocab_size:>6} words={words:>4} "
+                      f"median={stats['median_us']:>10.2f} us")
+    return results
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parser and registry microbenchmarks")
+    parser.add_argument("--vocab-sizes", type=_int_list, default=[len(WELL_FIELDS), 3000, 30000])
+    parser.add_argument("--lengths", type=_int_list, default=[5, 20, 80])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="Comma separated benchmark names")
+    parser.add_argument("--output", help="Path to save the JSON report")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    results = run(names, args.vocab_sizes, args.lengths, args.repeat, args.seed)
+    report = {"benchmark": "micro", "results": results, "environment": environment_info()}
+    if args.output:
+        save_report(report, args.output)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Сводка результатов бенчмарков и сравнение с сохраненным базовым замером."""
+import json
+import math
+import os
+import platform
+
+# Метрики, по которым ищется регрессия: имя -> True, если больше значит хуже
+REGRESSION_METRICS = {
+    "latency_ms.p50": True,
+    "latency_ms.p95": True,
+    "latency_ms.p99": True,
+    "throughput_rps": False,
+    "peak_rss_mb": True,
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize_latencies(values_ms: list[float]) -> dict[str, float]:
+    if not values_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": round(percentile(values_ms, 50), 3),
+        "p95": round(percentile(values_ms, 95), 3),
+        "p99": round(percentile(values_ms, 99), 3),
+        "mean": round(sum(values_ms) / len(values_ms), 3),
+        "max": round(max(values_ms), 3),
+    }
+
+
+def environment_info() -> dict[str, str | int]:
+    info: dict[str, str | int] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count() or 0,
+    }
+    try:
+        import torch  # pylint: disable=import-outside-toplevel
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def _get(report: dict, dotted: str) -> float | None:
+    value = report
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare_to_baseline(report: dict, baseline: dict,
+                        threshold: float) -> list[dict[str, float | str]]:
+    """
+    Сравнивает результат с базовым замером.
+
+    Args:
+        report: Текущий результат.
+        baseline: Базовый результат того же режима.
+        threshold: Допустимое относительное ухудшение (0.1 = 10%).
+
+    Returns:
+        list[dict]: Метрики, ухудшившиеся больше порога.
+    """
+    regressions = []
+    for metric, higher_is_worse in REGRESSION_METRICS.items():
+        current = _get(report, metric)
+        base = _get(baseline, metric)
+        if current is None or not base:
+            continue
+        change = (current - base) / base
+        if not higher_is_worse:
+            change = -change
+        if change > threshold:
+            regressions.append({
+                "metric": metric,
+                "baseline": base,
+                "current": current,
+                "change": round(change, 4)
+            })
+    return regressions
+
+
+def load_report(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_report(report: dict, path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,343 @@
+"""
+Длительный (soak) прогон NLU сервиса с записью памяти во времени.
+
+Потоки нагрузки непрерывно обрабатывают команды синтетического корпуса, а
+раз в --interval секунд записывается отчет о памяти (core/monitoring/memory.py):
+RSS/PSS, malloc glibc, память Python под tracemalloc, записи кэша токенов и
+сессий. Сессии перебираются по кругу из --sessions идентификаторов, чтобы
+хранилище сессий работало как в бою.
+
+Режимы:
+    in_process — прямые вызовы `NLUService.process_text` в этом процессе;
+    http       — запросы к запущенному сервису по --url, память — из
+                 /admin/memory (нужен --admin-token; в pre-fork режиме отчет
+                 дает тот воркер, которому достался запрос).
+
+Результат в --output-dir: samples.csv, memory.svg (графики памяти и кэшей)
+и report.json со сводкой. Наклон RSS считается по второй половине прогона,
+когда кэши уже заполнены: устойчивый положительный наклон — признак утечки.
+
+Пример:
+    python -m app.benchmarks.soak --duration 6h --interval 30 --concurrency 2 \
+        --sessions 500 --tracemalloc --output-dir soak_results
+"""
+import argparse
+import contextlib
+import csv
+import html
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from .corpus import generate_corpus, load_corpus
+from .report import environment_info, save_report
+from ..core.monitoring.memory import memory_report, memory_tracker
+
+COLUMNS = ["elapsed_s", "requests", "errors", "rss", "pss", "malloc_in_use", "malloc_free",
+           "python_traced", "token_cache", "sessions"]
+MEMORY_SERIES = ["rss", "pss", "malloc_in_use", "malloc_free", "python_traced"]
+ENTRY_SERIES = ["token_cache", "sessions"]
+COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd"]
+UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> float:
+    """Длительность в секундах: «90», «90s», «30m», «6h»."""
+    value = value.strip().lower()
+    if value[-1:] in UNITS:
+        return float(value[:-1]) * UNITS[value[-1]]
+    return float(value)
+
+
+def memory_sample(report: dict[str, Any]) -> dict[str, int]:
+    """Значения колонок памяти из отчета `memory_report`."""
+    caches = report.get("caches", {})
+    malloc = report.get("allocators", {}).get("malloc") or {}
+    return {
+        "rss": report["process"].get("rss", 0),
+        "pss": report["process"].get("pss", 0),
+        "malloc_in_use": malloc.get("in_use", 0),
+        "malloc_free": malloc.get("free", 0),
+        "python_traced": report["tracemalloc"]["traced"],
+        "token_cache": caches.get("token_cache", {}).get("entries", 0),
+        "sessions": caches.get("sessions", {}).get("entries", 0)
+    }
+
+
+class _Load:
+    """Потоки нагрузки и счетчики запросов."""
+
+    def __init__(self, texts: list[str], sessions: int, concurrency: int,
+                 process: Callable[[str, str | None], bool]):
+        self.texts = texts
+        self.sessions = sessions
+        self.requests = 0
+        self.errors = 0
+        self._process = process
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(concurrency)]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                index = self._next
+                self._next += 1
+            text = self.texts[index % len(self.texts)]
+            session_id = f"soak-{index % self.sessions}" if self.sessions else None
+            try:
+                ok = self._process(text, session_id)
+            except Exception:  # pylint: disable=broad-except
+                ok = False
+            with self._lock:
+                self.requests += 1
+                if not ok:
+                    self.errors += 1
+
+
+def in_process_target(args: argparse.Namespace) -> tuple[Callable[[str, str | None], bool],
+                                                         Callable[[], dict[str, Any]]]:
+    # pylint: disable=import-outside-toplevel
+    from ..app import build_services
+
+    state = SimpleNamespace(**build_services())
+    if args.tracemalloc:
+        memory_tracker.sample_rate = args.sample_rate
+        memory_tracker.start(args.frames)
+
+    def process(text: str, session_id: str | None) -> bool:
+        context = state.session_store.get_or_create(session_id) if session_id else None
+        result = state.nlu_service.process_text(text, state.processor, debug=False, context=context)
+        if context is not None:
+            state.session_store.save(context)
+        return result.get("success", True)
+
+    return process, lambda: memory_report(state, deep=False)
+
+
+def http_target(args: argparse.Namespace) -> tuple[Callable[[str, str | None], bool],
+                                                   Callable[[], dict[str, Any]]]:
+    # pylint: disable=import-outside-toplevel
+    import httpx
+
+    headers = {"X-Admin-Token": args.admin_token}
+    local = threading.local()
+
+    def client() -> Any:
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=args.url, timeout=60)
+        return local.client
+
+    if args.tracemalloc:
+        response = client().post("/admin/memory/tracemalloc", headers=headers,
+                                 params={"frames": args.frames, "sample_rate": args.sample_rate})
+        response.raise_for_status()
+
+    def process(text: str, session_id: str | None) -> bool:
+        payload = {"message": text, "session_id": session_id or ""}
+        response = client().post("/api/v1/process", json=payload)
+        return response.status_code == 200 and response.json().get("success", False)
+
+    def report() -> dict[str, Any]:
+        response = client().get("/admin/memory", headers=headers, params={"deep": "false"})
+        response.raise_for_status()
+        return response.json()
+
+    return process, report
+
+
+def run_soak(args: argparse.Namespace, texts: list[str]) -> list[dict[str, Any]]:
+    target = in_process_target if args.mode == "in_process" else http_target
+    process, report = target(args)
+    load = _Load(texts, args.sessions, args.concurrency, process)
+    samples = []
+    started = time.monotonic()
+
+    def sample() -> None:
+        row = {"elapsed_s": round(time.monotonic() - started, 1),
+               "requests": load.requests, "errors": load.errors}
+        row.update(memory_sample(report()))
+        samples.append(row)
+        print(f"[{row['elapsed_s']:>8.0f}s] requests={row['requests']} rss={row['rss'] / 2**20:.1f} MB "
+              f"traced={row['python_traced'] / 2**20:.1f} MB token_cache={row['token_cache']} "
+              f"sessions={row['sessions']}", file=sys.stderr)
+
+    sample()
+    load.start()
+    try:
+        deadline = started + args.duration
+        while time.monotonic() < deadline:
+            time.sleep(min(args.interval, max(deadline - time.monotonic(), 0)))
+            sample()
+    except KeyboardInterrupt:
+        print("Interrupted, writing collected samples", file=sys.stderr)
+    finally:
+        load.stop()
+    return samples
+
+
+def slope_per_hour(samples: list[dict[str, Any]], column: str) -> float:
+    """Наклон колонки (единиц в час) по методу наименьших квадратов."""
+    if len(samples) < 2:
+        return 0.0
+    xs = [sample["elapsed_s"] / 3600 for sample in samples]
+    ys = [sample[column] for sample in samples]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if not variance:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def build_report(args: argparse.Namespace, samples: list[dict[str, Any]]) -> dict[str, Any]:
+    first, last = samples[0], samples[-1]
+    second_half = [sample for sample in samples if sample["elapsed_s"] >= last["elapsed_s"] / 2]
+    mb = 1024 * 1024
+    return {
+        "benchmark": "soak",
+        "mode": args.mode,
+        "duration_s": last["elapsed_s"],
+        "concurrency": args.concurrency,
+        "sessions": args.sessions,
+        "requests": last["requests"],
+        "errors": last["errors"],
+        "throughput_rps": round(last["requests"] / last["elapsed_s"], 2) if last["elapsed_s"] else 0.0,
+        "rss_mb": {
+            "start": round(first["rss"] / mb, 1),
+            "end": round(last["rss"] / mb, 1),
+            "max": round(max(sample["rss"] for sample in samples) / mb, 1),
+            "slope_second_half_per_hour": round(slope_per_hour(second_half, "rss") / mb, 2)
+        },
+        "python_traced_mb": {
+            "end": round(last["python_traced"] / mb, 2),
+            "slope_second_half_per_hour": round(slope_per_hour(second_half, "python_traced") / mb, 2)
+        },
+        "malloc_free_mb": round(last["malloc_free"] / mb, 1),
+        "token_cache_entries": last["token_cache"],
+        "session_entries": last["sessions"],
+        "samples": len(samples),
+        "tracemalloc": args.tracemalloc,
+        "environment": environment_info()
+    }
+
+
+def render_soak_svg(samples: list[dict[str, Any]], width: int = 1000, panel_height: int = 260) -> str:
+    """
+    SVG графики прогона: память (МБ) и записи кэшей по времени.
+    """
+    hours = samples[-1]["elapsed_s"] > 2 * 3600
+    time_unit, time_scale = ("h", 3600) if hours else ("min", 60)
+    xs = [sample["elapsed_s"] / time_scale for sample in samples]
+    x_max = max(xs[-1], 1e-9)
+    left, right, top, gap = 70, 160, 30, 50
+    plot_width = width - left - right
+    height = top + 2 * panel_height + gap + 30
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'font-family="sans-serif" font-size="11">']
+
+    panels = [("Memory, MB", MEMORY_SERIES, 1024 * 1024), ("Cache entries", ENTRY_SERIES, 1)]
+    for number, (title, series, divisor) in enumerate(panels):
+        panel_top = top + number * (panel_height + gap)
+        # Пустые ряды (например, без tracemalloc) не рисуются
+        series = [name for name in series if any(sample[name] for sample in samples)]
+        y_max = max([sample[name] / divisor for sample in samples for name in series] or [1]) * 1.05 or 1
+        parts.append(f'<text x="{left}" y="{panel_top - 8}" font-weight="bold">{html.escape(title)}</text>')
+        parts.append(f'<rect x="{left}" y="{panel_top}" width="{plot_width}" height="{panel_height}" '
+                     f'fill="none" stroke="#999"/>')
+        for tick in range(5):
+            value = y_max * tick / 4
+            y = panel_top + panel_height - panel_height * tick / 4
+            parts.append(f'<line x1="{left}" y1="{y:.1f}" x2="{left + plot_width}" y2="{y:.1f}" stroke="#eee"/>')
+            parts.append(f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{value:,.1f}</text>')
+            x = left + plot_width * tick / 4
+            parts.append(f'<text x="{x:.1f}" y="{panel_top + panel_height + 14}" text-anchor="middle">'
+                         f'{x_max * tick / 4:.1f} {time_unit}</text>')
+        for index, name in enumerate(series):
+            color = COLORS[index % len(COLORS)]
+            points = " ".join(
+                f"{left + plot_width * x / x_max:.1f},"
+                f"{panel_top + panel_height - panel_height * (sample[name] / divisor) / y_max:.1f}"
+                for x, sample in zip(xs, samples)
+            )
+            parts.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+            legend_y = panel_top + 14 + index * 16
+            parts.append(f'<line x1="{left + plot_width + 12}" y1="{legend_y - 4}" '
+                         f'x2="{left + plot_width + 32}" y2="{legend_y - 4}" stroke="{color}" stroke-width="2"/>')
+            parts.append(f'<text x="{left + plot_width + 38}" y="{legend_y}">{name}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def save_samples(samples: list[dict[str, Any]], path: str) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Soak test: NLU pipeline memory over time")
+    parser.add_argument("--mode", choices=["in_process", "http"], default="in_process")
+    parser.add_argument("--url", help="Base URL of a running service for --mode http")
+    parser.add_argument("--admin-token", default=os.getenv("ADMIN_TOKEN", ""),
+                        help="Admin token for /admin/memory in --mode http")
+    parser.add_argument("--duration", type=parse_duration, default=parse_duration("1h"),
+                        help="Run time: seconds or 90s, 30m, 6h")
+    parser.add_argument("--interval", type=float, default=30, help="Seconds between memory samples")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=1000,
+                        help="Distinct session ids cycled through, 0 = no sessions")
+    parser.add_argument("--corpus-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", help="JSONL corpus instead of a generated one")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Trace Python allocations and record per-request deltas")
+    parser.add_argument("--sample-rate", type=float, default=0.1,
+                        help="Share of requests with allocation deltas under --tracemalloc")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc traceback depth")
+    parser.add_argument("--output-dir", default="soak_results")
+    args = parser.parse_args()
+
+    if args.mode == "http" and not (args.url and args.admin_token):
+        parser.error("--url and --admin-token are required for --mode http")
+
+    samples = load_corpus(args.corpus) if args.corpus else generate_corpus(args.corpus_size, args.seed)
+    texts = [sample.text for sample in samples]
+
+    # Сервис печатает отладочный вывод на каждый запрос: за часы в буфере он
+    # сам стал бы утечкой, поэтому уходит в /dev/null; ход прогона — в stderr
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        memory_samples = run_soak(args, texts)
+
+    report = build_report(args, memory_samples)
+    if args.tracemalloc and args.mode == "in_process":
+        report["allocations"] = memory_tracker.top_allocations(limit=20, compare=True)
+        report["request_allocations"] = memory_tracker.status()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    save_samples(memory_samples, os.path.join(args.output_dir, "samples.csv"))
+    with open(os.path.join(args.output_dir, "memory.svg"), "w", encoding="utf-8") as f:
+        f.write(render_soak_svg(memory_samples))
+    save_report(report, os.path.join(args.output_dir, "report.json"))
+
+    print(json.dumps({key: value for key, value in report.items() if key != "allocations"},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -24,17 +24,88 @@ class ModelConfig:
 
     MODEL_NAME = "DeepPavlov/rubert-base-cased"
     MODEL_PATH = "app/data/trained_model"
+    # Компактная модель-ученик, см. app/training/distill.py
+    STUDENT_MODEL_PATH = os.getenv("STUDENT_MODEL_PATH", "app/data/student_model")
+    # Какую модель загружает NERModel: teacher (MODEL_PATH) или student
+    NER_MODEL = os.getenv("NER_MODEL", "teacher")
+    # Загружать model.safetensors через mmap без копирования весов
+    MMAP_WEIGHTS = os.getenv("MMAP_WEIGHTS", "True").lower() == "true"
+    # Кэш WordPiece-разбиения слов: максимум слов, 0 — выключен
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "50000"))
 
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", "8080"))
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 
+    # Pre-fork режим: сервисы загружаются один раз в мастере, воркеры
+    # порождаются через fork() и разделяют веса модели (copy-on-write)
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    # Потоков torch на воркер, 0 — поровну делить ядра между воркерами
+    TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))
+    PREFORK_MEMORY_REPORT_DELAY = float(os.getenv("PREFORK_MEMORY_REPORT_DELAY", "5"))
+    # Воркер, упавший раньше PREFORK_MIN_UPTIME секунд, считается сбоем старта;
+    # после PREFORK_MAX_STARTUP_FAILURES сбоев подряд мастер завершается
+    PREFORK_MIN_UPTIME = float(os.getenv("PREFORK_MIN_UPTIME", "10"))
+    PREFORK_MAX_STARTUP_FAILURES = int(os.getenv("PREFORK_MAX_STARTUP_FAILURES", "5"))
+
     API_VERSION = "v1"
     APP_NAME = "NLU Service"
     APP_DESCRIPTION = "Natural Language Understanding Service for Oil & Gas Commands"
 
+    # Сбор метрик стадий обработки для /metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    # Заголовок Server-Timing с длительностями стадий в каждом ответе
+    SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "True").lower() == "true"
+
+    # Выборочное профилирование (core/monitoring/profiler.py): доля запросов,
+    # интервал выборки стеков и каталог трасс torch.profiler (пусто — temp)
+    PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+    PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_TRACE_DIR = os.getenv("PROFILER_TRACE_DIR", "")
+    # Учет памяти (core/monitoring/memory.py): доля запросов, для которых
+    # записывается прирост памяти Python (больше 0 — tracemalloc включается
+    # при первом запросе), и глубина стека мест выделения
+    MEMORY_SAMPLE_RATE = float(os.getenv("MEMORY_SAMPLE_RATE", "0"))
+    MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+    # Мониторинг event loop (core/monitoring/loop_monitor.py): интервал
+    # проверки и задержка, после которой в лог пишется заблокировавший маршрут
+    LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "True").lower() == "true"
+    LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50"))
+    LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+    # Токен административных маршрутов /admin (заголовок X-Admin-Token);
+    # пусто — маршруты выключены
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+    # Потоковая пакетная обработка /api/v1/process_bulk
+    BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "16"))
+    BULK_MAX_IN_FLIGHT = int(os.getenv("BULK_MAX_IN_FLIGHT", "2"))
+    BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", "65536"))
+
+    # Контекст сессий для дозаполнения слотов: хранилище, время жизни
+    # с последнего обращения (секунды) и максимум сессий в процессе
+    SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+    SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+    SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+
+    # Контроль допуска к модели: при переполнении очереди или ожидании
+    # дольше бюджета запрос обслуживается правилами (деградированный режим)
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "1"))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_LATENCY_BUDGET_MS = float(os.getenv("ADMISSION_LATENCY_BUDGET_MS", "1000"))
+
+    # Дедлайн запроса по умолчанию, если клиент не передал свой (0 — без дедлайна)
+    REQUEST_TIMEOUT_MS = float(os.getenv("REQUEST_TIMEOUT_MS", "0"))
+
     # Пути к данным
     REGISTRY_PATH = "app/data/registry.json"
+    # Правила определения модуля по ключевым словам (core/registry/keyword_rules.py)
+    MODULE_KEYWORDS_PATH = os.getenv("MODULE_KEYWORDS_PATH", "app/data/module_keywords.json")
+
+    # Снимок индексов реестра и месторождений (core/registry/snapshot.py);
+    # пересобирается автоматически при изменении исходников
+    SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "True").lower() == "true"
+    SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "app/data/index_snapshot.bin")
 
     @classmethod
     def get_model_info(cls) -> dict[str, str]:
@@ -45,12 +116,25 @@ class ModelConfig:
         """
         return {
             "model_name": cls.MODEL_NAME,
-            "model_path": cls.MODEL_PATH,
+            "model_path": cls.get_ner_model_path(),
             "api_version": cls.API_VERSION,
             "app_name": cls.APP_NAME,
             "app_description": cls.APP_DESCRIPTION
         }
 
+    @classmethod
+    def get_ner_model_path(cls) -> str:
+        """Возвращает путь к модели NER, выбранной настройкой NER_MODEL.
+
+        Returns:
+            str: MODEL_PATH для teacher, STUDENT_MODEL_PATH для student
+        """
+        if cls.NER_MODEL == "student":
+            return cls.STUDENT_MODEL_PATH
+        if cls.NER_MODEL != "teacher":
+            raise ValueError(f"Unknown NER model: {cls.NER_MODEL}")
+        return cls.MODEL_PATH
+
     @classmethod
     def get_server_config(cls) -> dict[str, str | int | bool]:
         """Возвращает конфигурацию сервера.
@@ -61,5 +145,6 @@ class ModelConfig:
         return {
             "host": cls.HOST,
             "port": cls.PORT,
-            "debug": cls.DEBUG
+            "debug": cls.DEBUG,
+            "workers": cls.WORKERS
         }
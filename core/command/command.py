@@ -20,7 +20,7 @@ class NLUCommand:
     module_name: str = ""
     module_id: str = ""
     module_title: str = ""
-    debug_info: dict[str, Any] = field(default_factory=lambda: {
+    debug_info: dict[str, Any] | None = field(default_factory=lambda: {
         "raw_tokens": [],
         "entities_found": [],
         "text_processed": "",
@@ -28,6 +28,21 @@ class NLUCommand:
         "timestamp": ""
     })
 
+    @property
+    def debug_enabled(self) -> bool:
+        return self.debug_info is not None
+
+    def add_debug(self, key: str, value: Any) -> None:
+        """
+        Добавляет поле в отладочную информацию, если отладка включена.
+
+        Args:
+            key (str): Имя поля.
+            value (Any): Значение поля.
+        """
+        if self.debug_info is not None:
+            self.debug_info[key] = value
+
     def to_dict(self) -> dict[str, Any]:
         """
         Преобразует объект команды в словарь.
@@ -40,16 +55,17 @@ class NLUCommand:
             "command": self.command,
             "moduleName": self.module_name,
             "moduleId": self.module_id,
-            "moduleTitle": self.module_title,
-            "debug": self.debug_info
+            "moduleTitle": self.module_title
         }
+        if self.debug_info is not None:
+            result["debug"] = self.debug_info
         if self.parameters is not None:
             result["parameters"] = self.parameters
         return result
 
     @classmethod
     def create_from_analysis(cls, text: str, entities: dict[str, Any],
-                             method: str = "ner") -> 'NLUCommand':
+                             method: str = "ner", debug: bool = True) -> 'NLUCommand':
         """
         Создает объект команды на основе анализа текста.
         
@@ -57,11 +73,16 @@ class NLUCommand:
             text (str): Текст для анализа.
             entities (dict[str, Any]): Найденные сущности.
             method (str, optional): Метод анализа. По умолчанию "ner".
+            debug (bool, optional): Собирать отладочную информацию. Если False,
+                debug_info не создается и не попадает в to_dict().
             
         Returns:
             NLUCommand: Объект команды.
         """
         command = cls()
+        if not debug:
+            command.debug_info = None
+            return command
         command.debug_info["text_processed"] = text
         command.debug_info["entities_found"] = entities
         command.debug_info["method"] = method
@@ -28,18 +28,39 @@ from typing import Any
 from ..nlu.parsers.entity_parser import EntityParser  # pylint: disable=relative-beyond-top-level
 from ..nlu.parsers.date_parser import date_parser  # pylint: disable=relative-beyond-top-level
 from ..nlu.parsers.well_field_normalizer import normalize_well_field
+from ..registry.keyword_rules import load_keyword_rules  # pylint: disable=relative-beyond-top-level
 from ..registry.registry_service import RegistryService  # pylint: disable=relative-beyond-top-level
 from ..command.command import NLUCommand  # pylint: disable=relative-beyond-top-level
+from ..command.session import SessionContext  # pylint: disable=relative-beyond-top-level
+from ..monitoring.metrics import StageTimer  # pylint: disable=relative-beyond-top-level
 from ...config.command_config import WELL_FIELDS
+from ...config.model_config import ModelConfig
 
 class CommandProcessor:
     def __init__(self, registry_service: RegistryService):
         self.registry_service = registry_service
         self.entity_parser = EntityParser()
+        # Правила ключевых слов для модуля, не найденного по синонимам
+        keyword_rules = load_keyword_rules(ModelConfig.MODULE_KEYWORDS_PATH)
+        self.fallback_keywords = keyword_rules["fallback"]
+        self.rule_based_keywords = keyword_rules["rule_based"]
     
-    def process_command(self, text: str, ner_results: list[dict[str, str]]) -> dict[str, Any]:
+    def _normalize_well_field(self, well_field: str) -> str:
+        """
+        Каноническое название месторождения: по индексу словоформ, затем
+        нечетким поиском (опечатки); если не найдено — исходный текст.
+        """
+        normalized = normalize_well_field(well_field)
+        if normalized is None:
+            match = self.entity_parser.find_well_field_fuzzy(well_field)
+            normalized = match.field if match else well_field
+        return normalized
+    
+    def process_command(self, text: str, ner_results: list[dict[str, str]],
+                        debug: bool = True, context: SessionContext | None = None) -> dict[str, Any]:
         print(f"Processing command with text: {text}")
         print(f"NER results: {ner_results}")
+        timer = StageTimer()
         
         entities, raw_tokens = self.entity_parser.extract_entities(ner_results)
         
@@ -62,10 +83,12 @@ class CommandProcessor:
                 print(f"Created PERIOD from MONTH + прошлого года: {entities['PERIOD']}")
         
         entities = self.entity_parser.determine_entity_order(text, entities)
+        timer.mark("entity_assembly")
         
-        command = NLUCommand.create_from_analysis(text, entities, method="ner")
-        command.debug_info["raw_tokens"] = raw_tokens
-        command.debug_info["entities_found"] = list(entities.keys())
+        command = NLUCommand.create_from_analysis(text, entities, method="ner", debug=debug)
+        if command.debug_enabled:
+            command.add_debug("raw_tokens", raw_tokens)
+            command.add_debug("entities_found", list(entities.keys()))
 
         command.parameters = {
             "wellField": "",
@@ -77,14 +100,14 @@ class CommandProcessor:
 
         if "WELL_FIELD" in entities:
             original = entities["WELL_FIELD"]
-            normalized = normalize_well_field(original)
+            normalized = self._normalize_well_field(original)
             command.parameters["wellField"] = normalized
             
             if normalized != original:
-                command.debug_info["well_field_normalized"] = {
+                command.add_debug("well_field_normalized", {
                     "original": original,
                     "normalized": normalized
-                }
+                })
 
         if "WELL_NAME" in entities:
             command.parameters["wellName"] = entities["WELL_NAME"]
@@ -115,15 +138,18 @@ class CommandProcessor:
         if command.parameters["wellName"] == "года":
             command.parameters["wellName"] = ""
             print("Removed incorrect wellName 'года'")
+        timer.mark("parameter_extraction")
         
         period_dates = self.entity_parser.parse_period_from_entities(entities)
         if period_dates["start"] and period_dates["end"]:
             command.parameters["period"] = period_dates
-            command.debug_info["period_parsed"] = {
-                "input": " ".join([entities.get(k, "") for k in ["DATE", "MONTH", "YEAR", "PERIOD"] if k in entities]),
-                "output": period_dates
-            }
+            if command.debug_enabled:
+                command.add_debug("period_parsed", {
+                    "input": " ".join([entities.get(k, "") for k in ["DATE", "MONTH", "YEAR", "PERIOD"] if k in entities]),
+                    "output": period_dates
+                })
             print(f"Period parsed: {period_dates}")
+        timer.mark("period_parsing")
         
         module_id = None
         
@@ -140,128 +166,191 @@ class CommandProcessor:
         
         if not module_id:
             module_id = self._fallback_module_detection(text.lower())
+        
+        module_from_context = False
+        if not module_id and context is not None and context.module_id:
+            module_id = context.module_id
+            module_from_context = True
+            command.add_debug("module_from_context", module_id)
+        timer.mark("registry_lookup")
+        
+        if context is not None:
+            self._fill_from_context(command, context, module_id, module_from_context)
+            context.update(module_id, command.parameters)
 
-        if module_id:
-            module_info = self.registry_service.get_module_registry(module_id)
-            command.module_name = module_id
-            command.module_id = module_id if not None and module_id.isdigit() else ''
-            command.module_title = module_info.get("moduleTitle", "")
-            command.command = module_info.get("intent", "UNKNOWN")
-            slots = module_info.get("slots", {})
+        incomplete = self._apply_module(command, module_id)
+        if context is not None:
+            context.pending = incomplete
+        timer.mark("slot_validation")
 
-            if not slots:
-                command.parameters = None
-            else:
-                command.parameters = {
-                    "wellField": command.parameters.get("wellField", ""),
-                    "wellName": command.parameters.get("wellName", ""),
-                    "period": command.parameters.get("period", {"start": "", "end": ""})
-                }
-
-                required_slots = [slot for slot, info in slots.items() if info.get("required", False)]
-                slot_to_param = {
-                    "WELL_FIELD": "wellField",
-                    "WELL_NAME": "wellName",
-                    "PERIOD": "period"
-                }
-                all_required_filled = True
-                for slot in required_slots:
-                    param_key = slot_to_param.get(slot)
-                    if param_key:
-                        if param_key == "period":
-                            if not command.parameters[param_key]["start"] or not command.parameters[param_key]["end"]:
-                                all_required_filled = False
-                                break
-                        elif not command.parameters[param_key]:
-                            all_required_filled = False
-                            break
-
-                if not all_required_filled:
-                    command.parameters = None
-        else:
+        command.add_debug("entities", entities)
+
+        return command.to_dict()
+    
+    def _fill_from_context(self, command: NLUCommand, context: SessionContext,
+                           module_id: str | None, module_from_context: bool) -> None:
+        """
+        Дополняет параметры команды значениями из контекста сессии.
+
+        Дополняется только уточняющая реплика: модуль взят из контекста или
+        совпадает с модулем незавершенной команды сессии. Новая команда,
+        сама определившая другой или завершенный модуль, не получает слоты
+        предыдущих реплик.
+        """
+        if not (module_from_context or (context.pending and module_id == context.module_id)):
+            return
+        filled = context.fill_parameters(command.parameters)
+        if filled:
+            command.add_debug("from_context", filled)
+            print(f"Parameters from session context: {filled}")
+
+    def _apply_module(self, command: NLUCommand, module_id: str | None) -> bool:
+        """
+        Заполняет модуль команды и проверяет обязательные слоты.
+
+        Returns:
+            bool: True, если модуль определен, но обязательные слоты не заполнены.
+        """
+        if not module_id:
             command.parameters = None
+            return False
 
-        command.debug_info["entities"] = entities
+        module_info = self.registry_service.get_module_registry(module_id)
+        command.module_name = module_id
+        command.module_id = module_id if not None and module_id.isdigit() else ''
+        command.module_title = module_info.get("moduleTitle", "")
+        command.command = module_info.get("intent", "UNKNOWN")
+        return self._validate_slots(command, module_id)
+
+    def _validate_slots(self, command: NLUCommand, module_id: str) -> bool:
+        """
+        Оставляет в команде параметры слотов модуля и проверяет обязательные.
+
+        Returns:
+            bool: True, если обязательные слоты не заполнены (параметры сброшены).
+        """
+        validator = self.registry_service.get_slot_validator(module_id)
+        if validator is None or not validator.has_slots:
+            command.parameters = None
+            return False
+
+        command.parameters = validator.build_parameters(command.parameters)
+        if not validator.is_complete(command.parameters):
+            command.parameters = None
+            return True
+        return False
+
+    def complete_from_context(self, text: str, context: SessionContext,
+                              debug: bool = True) -> dict[str, Any] | None:
+        """
+        Дозаполняет незавершенную команду сессии по дешевому пути без NER.
 
+        Используется, когда предыдущей команде сессии не хватило обязательного
+        слота и пользователь присылает только его («скважина 125», «за март»).
+        Слоты ищутся правилами, модуль и остальные параметры берутся из контекста.
+
+        Args:
+            text (str): Текст реплики.
+            context (SessionContext): Контекст сессии с незавершенной командой.
+            debug (bool): Собирать отладочную информацию.
+
+        Returns:
+            dict[str, Any] | None: Команда или None, если реплика похожа на новую
+            команду или в ней нет слотов — тогда нужен полный путь.
+        """
+        text_lower = text.lower()
+        if self.registry_service.find_module_in_text(text_lower) or self._fallback_module_detection(text_lower):
+            return None
+
+        entities = self.entity_parser.find_well_entities_by_rules(text)
+        parameters = {"wellField": "", "wellName": "", "period": {"start": "", "end": ""}}
+        if "WELL_FIELD" in entities:
+            parameters["wellField"] = self._normalize_well_field(entities["WELL_FIELD"])
+        if "WELL_NAME" in entities:
+            parameters["wellName"] = entities["WELL_NAME"]
+        period_dates = self._parse_period_rule_based(text_lower)
+        if period_dates["start"] and period_dates["end"]:
+            parameters["period"] = period_dates
+        if not (parameters["wellField"] or parameters["wellName"] or parameters["period"]["start"]):
+            return None
+
+        command = NLUCommand.create_from_analysis(text, entities, method="session_context", debug=debug)
+        command.parameters = parameters
+        filled = context.fill_parameters(command.parameters)
+        command.add_debug("from_context", filled)
+        context.update(context.module_id, command.parameters)
+        context.pending = self._apply_module(command, context.module_id)
+        command.add_debug("entities", entities)
         return command.to_dict()
     
-    def rule_based_processor(self, text: str) -> dict[str, Any]:
+    def rule_based_processor(self, text: str, debug: bool = True,
+                             context: SessionContext | None = None) -> dict[str, Any]:
+        """
+        Обработка команды правилами без модели (ошибка конвейера, сброс нагрузки).
+
+        С контекстом сессии модуль и параметры уточняющей реплики берутся из
+        него (см. `_fill_from_context`), а контекст обновляется так же, как на
+        пути NER.
+        """
         text_lower = text.lower()
         
-        raw_tokens = []
-        words = text.split()
-        for word in words:
-            raw_tokens.append({
-                "token": word,
-                "tag": "O"
-            })
-        
-        command = NLUCommand.create_from_analysis(text, {}, method="rule_based")
-        command.debug_info["raw_tokens"] = raw_tokens
+        command = NLUCommand.create_from_analysis(text, {}, method="rule_based", debug=debug)
+        if command.debug_enabled:
+            command.add_debug("raw_tokens", [{"token": word, "tag": "O"} for word in text.split()])
+        command.parameters = {
+            "wellField": "",
+            "wellName": "",
+            "period": {"start": "", "end": ""}
+        }
         
         entities = self.entity_parser.find_well_entities_by_rules(text)
         
         if "WELL_FIELD" in entities:
             original = entities["WELL_FIELD"]
-            normalized = normalize_well_field(original)
+            normalized = self._normalize_well_field(original)
             command.parameters["wellField"] = normalized
             
             if normalized != original:
-                command.debug_info["well_field_normalized"] = {
+                command.add_debug("well_field_normalized", {
                     "original": original,
                     "normalized": normalized
-                }
+                })
         
         if "WELL_NAME" in entities:
             command.parameters["wellName"] = entities["WELL_NAME"]
-        
+
         module_id = self._detect_module_by_keywords(text_lower)
+        module_from_context = False
+        if not module_id and context is not None and context.module_id:
+            module_id = context.module_id
+            module_from_context = True
+            command.add_debug("module_from_context", module_id)
+        if context is not None:
+            period_dates = self._parse_period_rule_based(text_lower)
+            if period_dates["start"] and period_dates["end"]:
+                command.parameters["period"] = period_dates
+            self._fill_from_context(command, context, module_id, module_from_context)
+            context.update(module_id, command.parameters)
+
+        incomplete = False
         if module_id:
             module_info = self.registry_service.get_module_registry(module_id)
             command.module_name = module_id
             command.module_id = module_id if not None and module_id.isdigit() else ''
             command.command = module_info.get("intent", "UNKNOWN")
             entities["TARGET"] = self._get_target_name_by_module(module_id)
-            slots = module_info.get("slots", {})
-
-            if not slots:
-                command.parameters = None
-            else:
-                command.parameters = {
-                    "wellField": command.parameters.get("wellField", ""),
-                    "wellName": command.parameters.get("wellName", ""),
-                    "period": command.parameters.get("period", {"start": "", "end": ""})
-                }
-
-                required_slots = [slot for slot, info in slots.items() if info.get("required", False)]
-                slot_to_param = {
-                    "WELL_FIELD": "wellField",
-                    "WELL_NAME": "wellName",
-                    "PERIOD": "period"
-                }
-                all_required_filled = True
-                for slot in required_slots:
-                    param_key = slot_to_param.get(slot)
-                    if param_key:
-                        if param_key == "period":
-                            if not command.parameters[param_key]["start"] or not command.parameters[param_key]["end"]:
-                                all_required_filled = False
-                                break
-                        elif not command.parameters[param_key]:
-                            all_required_filled = False
-                            break
-
-                if not all_required_filled:
-                    command.parameters = None
+            incomplete = self._validate_slots(command, module_id)
         else:
             command.parameters = None
+        if context is not None:
+            context.pending = incomplete
 
         period_dates = self._parse_period_rule_based(text_lower)
         if period_dates["start"] and period_dates["end"] and command.parameters is not None:
             command.parameters["period"] = period_dates
 
-        command.debug_info["entities"] = entities
-        command.debug_info["entities_found"] = list(entities.keys())
+        command.add_debug("entities", entities)
+        command.add_debug("entities_found", list(entities.keys()))
 
         return command.to_dict()
 
@@ -312,61 +401,10 @@ class CommandProcessor:
         return module_id
 
     def _fallback_module_detection(self, text: str) -> str:
-        text_lower = text.lower()
-        
-        formula_exceptions = ["формул", "формулы", "формулу", "формула", "формуле", "формулой"]
-        
-        for exception in formula_exceptions:
-            if exception in text_lower:
-                print(f"Found formula-related word: '{exception}', returning UNKNOWN")
-                return None
-        
-        if any(keyword in text_lower for keyword in ["шахмат", "шахматк"]):
-            return "Ois.Modules.chessy.ChessyModule"
-        elif any(keyword in text_lower for keyword in ["отчет", "сводк", "доклад"]):
-            return "standalone_report"
-        elif any(keyword in text_lower for keyword in ["форму", "ввод"]):
-            words = text_lower.split()
-            if "форму" in words or "форма" in words or "форме" in words:
-                return "forms_input_engine"
-            elif " форму " in f" {text_lower} " or text_lower.startswith("форму ") or text_lower.endswith(" форму"):
-                return "forms_input_engine"
-        elif any(keyword in text_lower for keyword in ["данные", "конструкц"]):
-            return "well_construction"
-        elif "режим" in text_lower:
-            return "mode_output"
-        elif "баланс" in text_lower:
-            return "volume_balance"
-        return None
+        return self.fallback_keywords.detect(text.lower())
 
     def _detect_module_by_keywords(self, text_lower: str) -> str:
-        formula_exceptions = ["формул", "формулы", "формулу", "формула", "формуле", "формулой"]
-        
-        for exception in formula_exceptions:
-            if exception in text_lower:
-                print(f"Found formula-related word: '{exception}', returning UNKNOWN")
-                return None
-        
-        if any(keyword in text_lower for keyword in ["шахмат", "шахматк"]):
-            return "Ois.Modules.chessy.ChessyModule"
-        elif any(keyword in text_lower for keyword in ["отчет", "сводк", "доклад"]):
-            return "standalone_report"
-        elif any(keyword in text_lower for keyword in ["данные", "конструкц"]):
-            return "well_construction"
-        elif any(keyword in text_lower for keyword in ["форму", "ввод"]):
-            words = text_lower.split()
-            if "форму" in words or "форма" in words or "форме" in words:
-                return "forms_input_engine"
-            elif " форму " in f" {text_lower} " or text_lower.startswith("форму ") or text_lower.endswith(" форму"):
-                return "forms_input_engine"
-        elif "режим" in text_lower:
-            return "mode_output"
-        elif "баланс" in text_lower:
-            return "volume_balance"
-        elif any(keyword in text_lower for keyword in ["отчетность", "движок отчет"]):
-            return "reporting_engine"
-        
-        return None
+        return self.rule_based_keywords.detect(text_lower)
     
     def _get_target_name_by_module(self, module_id: str) -> str:
         target_names = {
@@ -0,0 +1,209 @@
+"""
+Контекст диалоговой сессии и хранилище контекстов.
+
+Контекст хранит последние разрешенные модуль и слоты (месторождение,
+скважина, период). Уточняющая реплика («а за сентябрь», «теперь скважина
+215») дополняется недостающими значениями из контекста, и их не нужно заново
+искать в реестре и нормализовать. Если предыдущая команда осталась
+незавершенной (не хватило обязательного слота), реплика обрабатывается
+дешевым путем без NER модели, см. `CommandProcessor.complete_from_context`.
+
+Контексты хранятся в `SessionStore` по session_id. Реализация по умолчанию —
+`InMemorySessionStore` с TTL и вытеснением давно неиспользуемых сессий (LRU).
+В pre-fork режиме у каждого воркера свое хранилище; для общего хранилища
+(например, Redis) достаточно реализовать интерфейс SessionStore.
+"""
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from time import monotonic, time
+from typing import Any
+
+from ...config.model_config import ModelConfig
+from ..monitoring.metrics import ACTIVE_SESSIONS
+
+# Ограничение длины сохраняемых значений: память на сессию не зависит от входа
+MAX_VALUE_LENGTH = 256
+
+
+@dataclass
+class SessionContext:
+    """
+    Состояние сессии пользователя.
+
+    Attributes:
+        session_id (str): Идентификатор сессии.
+        module_id (str): Последний определенный модуль.
+        well_field (str): Последнее месторождение (уже нормализованное).
+        well_name (str): Последняя скважина.
+        period (dict[str, str]): Последний период {"start", "end"}.
+        pending (bool): Последняя команда определила модуль, но не заполнила
+            обязательные слоты.
+        updated_at (float): Время последнего обновления (unix time).
+    """
+    session_id: str = ""
+    module_id: str = ""
+    well_field: str = ""
+    well_name: str = ""
+    period: dict[str, str] = field(default_factory=lambda: {"start": "", "end": ""})
+    pending: bool = False
+    updated_at: float = field(default_factory=time)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.module_id or self.well_field or self.well_name or self.period["start"])
+
+    def fill_parameters(self, parameters: dict[str, Any]) -> list[str]:
+        """
+        Дополняет пустые параметры значениями из контекста.
+
+        Args:
+            parameters (dict[str, Any]): Параметры команды wellField, wellName, period.
+
+        Returns:
+            list[str]: Имена параметров, взятых из контекста.
+        """
+        filled = []
+        if not parameters.get("wellField") and self.well_field:
+            parameters["wellField"] = self.well_field
+            filled.append("wellField")
+        if not parameters.get("wellName") and self.well_name:
+            parameters["wellName"] = self.well_name
+            filled.append("wellName")
+        period = parameters.get("period") or {}
+        if not (period.get("start") and period.get("end")) and self.period["start"]:
+            parameters["period"] = dict(self.period)
+            filled.append("period")
+        return filled
+
+    def update(self, module_id: str | None, parameters: dict[str, Any]) -> None:
+        """
+        Запоминает разрешенные в реплике модуль и параметры.
+
+        Пустые значения не затирают сохраненные.
+        """
+        if module_id:
+            self.module_id = module_id[:MAX_VALUE_LENGTH]
+        if parameters.get("wellField"):
+            self.well_field = parameters["wellField"][:MAX_VALUE_LENGTH]
+        if parameters.get("wellName"):
+            self.well_name = parameters["wellName"][:MAX_VALUE_LENGTH]
+        period = parameters.get("period") or {}
+        if period.get("start") and period.get("end"):
+            self.period = {"start": str(period["start"])[:MAX_VALUE_LENGTH], "end": str(period["end"])[:MAX_VALUE_LENGTH]}
+        self.updated_at = time()
+
+    def reset(self) -> None:
+        self.module_id = ""
+        self.well_field = ""
+        self.well_name = ""
+        self.period = {"start": "", "end": ""}
+        self.pending = False
+        self.updated_at = time()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "sessionId": self.session_id,
+            "moduleName": self.module_id,
+            "wellField": self.well_field,
+            "wellName": self.well_name,
+            "period": dict(self.period),
+            "pending": self.pending
+        }
+
+
+class SessionStore(ABC):
+    """Интерфейс хранилища контекстов сессий."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> SessionContext | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, context: SessionContext) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def get_or_create(self, session_id: str) -> SessionContext:
+        return self.get(session_id) or SessionContext(session_id=session_id)
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Хранилище контекстов в памяти процесса.
+
+    Сессия живет `ttl` секунд с последнего обращения; при превышении
+    `max_sessions` вытесняется сессия, к которой дольше всего не обращались.
+    Сессии хранятся в порядке последнего обращения, поэтому и истекшие,
+    и вытесняемые сессии всегда находятся в начале словаря.
+    """
+
+    def __init__(self, ttl: float, max_sessions: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, tuple[SessionContext, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float) -> None:
+        while self._sessions:
+            _, (_, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> SessionContext | None:
+        now = monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions[session_id] = (entry[0], now + self.ttl)
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def save(self, context: SessionContext) -> None:
+        now = monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            self._sessions[context.session_id] = (context, now + self.ttl)
+            self._sessions.move_to_end(context.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired(monotonic())
+            return len(self._sessions)
+
+
+SESSION_STORES: dict[str, type[SessionStore]] = {
+    "memory": InMemorySessionStore,
+}
+
+
+def create_session_store() -> SessionStore:
+    """
+    Создает хранилище контекстов по ModelConfig.SESSION_STORE.
+
+    Returns:
+        SessionStore: Хранилище контекстов сессий.
+    """
+    store_class = SESSION_STORES.get(ModelConfig.SESSION_STORE)
+    if store_class is None:
+        raise ValueError(f"Unknown session store: {ModelConfig.SESSION_STORE}")
+    store = store_class(ttl=ModelConfig.SESSION_TTL, max_sessions=ModelConfig.SESSION_MAX_SESSIONS)
+    ACTIVE_SESSIONS.set_function(lambda: len(store))
+    return store
@@ -0,0 +1,198 @@
+"""
+Мониторинг event loop и пулов потоков воркера.
+
+Сердцебиение — задача в event loop, которая засыпает на
+ModelConfig.LOOP_MONITOR_INTERVAL_MS и замеряет, насколько позже
+запланированного она проснулась: это задержка всех корутин воркера.
+Каждое сердцебиение обновляет загрузку пулов потоков (занятые потоки,
+очередь, предел) и раз в секунду — загрузку потоков torch: процессорное
+время процесса за секунду на один поток intra-op (больше 1 — процесс
+занимает больше ядер, чем потоков torch, например при параллельном выводе).
+
+Блокировку loop (синхронный вывод модели, тяжелая работа в async маршруте)
+сердцебиение видит только после ее окончания, поэтому сторожевой поток
+проверяет его во время остановки: если сердцебиение опаздывает больше
+ModelConfig.LOOP_LAG_WARN_MS, снимается стек потока event loop
+(`sys._current_frames`) и маршрут запроса из scope в кадре
+MetricsMiddleware. Когда loop оживает, в лог пишется предупреждение с
+маршрутом и местом блокировки.
+
+Монитор запускается в lifespan приложения, в pre-fork режиме — в каждом
+воркере.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any, Callable
+
+from ...config.model_config import ModelConfig
+from .metrics import (EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG, EXECUTOR_ACTIVE,
+                      EXECUTOR_MAX_WORKERS, EXECUTOR_QUEUE_DEPTH, TORCH_THREADS,
+                      TORCH_THREAD_UTILIZATION)
+from .middleware import MetricsMiddleware
+
+_REQUEST_CODE = MetricsMiddleware.__call__.__code__
+_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# В лог попадают верхние кадры стека и кадры кода сервиса под ними
+TOP_FRAMES = 3
+STACK_DEPTH = 10
+CPU_WINDOW = 1.0
+
+# Статистика пула: (занятые потоки, очередь, предел потоков)
+ExecutorStats = Callable[[], tuple[int, int, int]]
+
+
+def _frame_location(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class LoopMonitor:
+    """
+    Задержка event loop, загрузка пулов потоков и потоков torch.
+
+    Args:
+        interval: Интервал сердцебиения, секунды.
+        threshold: Задержка, после которой блокировка пишется в лог, секунды.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._executors: dict[str, ExecutorStats] = {}
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._loop_thread = 0
+        self._beat = 0.0
+        # Стек остановки, снятый сторожевым потоком, и сердцебиение, к которому он относится
+        self._stall_beat = 0.0
+        self._stall: tuple[str, list[str]] | None = None
+
+    def add_executor(self, name: str, stats: ExecutorStats) -> None:
+        """
+        Добавляет пул потоков в мониторинг.
+
+        Args:
+            name: Имя пула в метриках.
+            stats: Функция (занятые потоки, очередь, предел потоков);
+                вызывается в потоке event loop.
+        """
+        self._executors[name] = stats
+
+    def start(self) -> None:
+        """Запускает сердцебиение в текущем event loop и сторожевой поток."""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stalls
+        }
+
+    async def _run(self) -> None:
+        # pylint: disable=import-outside-toplevel
+        import anyio.to_thread
+        import torch
+
+        # Пул starlette для синхронных маршрутов; доступен только из event loop
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        self.add_executor("threadpool", lambda: (int(limiter.borrowed_tokens),
+                                                 limiter.statistics().tasks_waiting,
+                                                 int(limiter.total_tokens)))
+        cpu_started, wall_started = time.process_time(), time.monotonic()
+        while True:
+            started = time.monotonic()
+            self._beat = started
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - started - self.interval, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                self._report_stall(lag, started)
+
+            for name, stats in self._executors.items():
+                active, queued, workers = stats()
+                EXECUTOR_ACTIVE.set(active, executor=name)
+                EXECUTOR_QUEUE_DEPTH.set(queued, executor=name)
+                EXECUTOR_MAX_WORKERS.set(workers, executor=name)
+
+            if now - wall_started >= CPU_WINDOW:
+                cpu = time.process_time()
+                threads = torch.get_num_threads()
+                TORCH_THREADS.set(threads, pool="intra_op")
+                TORCH_THREADS.set(torch.get_num_interop_threads(), pool="inter_op")
+                TORCH_THREAD_UTILIZATION.set((cpu - cpu_started) / (now - wall_started) / threads)
+                cpu_started, wall_started = cpu, now
+
+    def _report_stall(self, lag: float, beat: float) -> None:
+        route, stack = self._stall if self._stall_beat == beat and self._stall else ("unknown", [])
+        self.stalls += 1
+        EVENT_LOOP_BLOCKED.inc(route=route)
+        location = " <- ".join(stack) if stack else "stack not captured"
+        print(f"WARNING: event loop blocked for {lag * 1000:.0f} ms, route {route}: {location}")
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval >= self.threshold and self._stall_beat != beat:
+                self._stall = self._capture()
+                self._stall_beat = beat
+
+    def _capture(self) -> tuple[str, list[str]]:
+        """Маршрут и стек потока event loop, от текущей функции вниз."""
+        frame = sys._current_frames().get(self._loop_thread)
+        route = "background"
+        stack = []
+        while frame is not None:
+            if frame.f_code is _REQUEST_CODE:
+                scope = frame.f_locals.get("scope") or {}
+                route = getattr(scope.get("route"), "path", "unmatched")
+                break
+            if len(stack) < STACK_DEPTH and (len(stack) < TOP_FRAMES
+                                             or frame.f_code.co_filename.startswith(_SERVICE_DIR)):
+                stack.append(_frame_location(frame))
+            frame = frame.f_back
+        return route, stack
+
+
+def create_loop_monitor() -> LoopMonitor | None:
+    """
+    Создает монитор по настройкам ModelConfig.
+
+    Returns:
+        LoopMonitor | None: Монитор или None, если он выключен
+        (LOOP_MONITOR_ENABLED=false).
+    """
+    if not ModelConfig.LOOP_MONITOR_ENABLED:
+        return None
+    return LoopMonitor(
+        interval=ModelConfig.LOOP_MONITOR_INTERVAL_MS / 1000,
+        threshold=ModelConfig.LOOP_LAG_WARN_MS / 1000
+    )
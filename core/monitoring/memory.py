@@ -0,0 +1,397 @@
+"""
+Учет памяти процесса NLU.
+
+`memory_report` собирает по сервисам приложения:
+
+- память процесса (RSS/PSS из /proc, пиковый RSS);
+- байты параметров и буферов модели NER по типам данных (общие, например
+  связанные, веса учитываются один раз);
+- размеры кэшей: число записей и оценка занятой памяти Python
+  (`deep_size`); объект, общий для нескольких кэшей, учитывается у первого;
+- статистику аллокаторов: malloc glibc (свободная, но не возвращенная ОС
+  память — частая причина роста RSS без утечки) и CUDA, если доступна;
+- число объектов Python по типам.
+
+`memory_tracker` включает tracemalloc по команде администратора или при
+ModelConfig.MEMORY_SAMPLE_RATE > 0 и отдает места выделения памяти: самые
+крупные или выросшие с момента включения. Пока tracemalloc включен, доля
+запросов MEMORY_SAMPLE_RATE (`track_request`) записывает прирост памяти
+Python за запрос: пик выше уровня в начале запроса и остаток после него.
+Пик — общий для процесса, поэтому при параллельных запросах он включает
+выделения соседних запросов. tracemalloc замедляет каждое выделение памяти,
+выключенный учет стоит одну проверку на запрос.
+
+Пример:
+    >>> memory_tracker.start(frames=5)
+    >>> report = memory_report(app.state)
+    >>> top = memory_tracker.top_allocations(limit=20, compare=True)
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from collections import Counter, deque
+from contextlib import nullcontext
+from typing import Any, ContextManager
+
+from ...config.model_config import ModelConfig
+from ..utils.memory_utils import get_current_rss, get_peak_rss, read_process_memory
+from .metrics import PROCESS_MEMORY, REQUEST_ALLOCATION, REQUEST_RETAINED
+
+_NULL_CONTEXT = nullcontext()
+# Классы пакета сервиса, чьи атрибуты учитываются в deep_size
+_PACKAGE = __name__.split(".", 1)[0]
+_CONTAINERS = (dict, list, tuple, set, frozenset, deque)
+# Собственные выделения tracemalloc и импорта не интересны
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+GROUP_BY = ("lineno", "filename", "traceback")
+RECENT_REQUESTS = 100
+
+
+def deep_size(obj: Any, seen: set[int] | None = None) -> int:
+    """
+    Оценка памяти объекта вместе с вложенными контейнерами, строками и
+    атрибутами объектов классов сервиса. Модули, функции, тензоры и прочие
+    внешние объекты считаются по sys.getsizeof без содержимого.
+
+    Args:
+        obj: Объект.
+        seen: Уже учтенные объекты (id); общий набор для нескольких вызовов
+            не учитывает общие объекты дважды.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, _CONTAINERS):
+            stack.extend(current)
+        elif type(current).__module__.split(".", 1)[0] == _PACKAGE:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+
+def model_memory(model) -> dict[str, Any]:
+    """
+    Байты параметров и буферов модели torch по типам данных.
+
+    Тензоры с общим хранилищем (связанные веса) учитываются один раз.
+    """
+    storages = set()
+    report = {"parameters": 0, "buffers": 0, "parameter_count": 0, "by_dtype": {}}
+    for kind, tensors in (("parameters", model.parameters()), ("buffers", model.buffers())):
+        for tensor in tensors:
+            if kind == "parameters":
+                report["parameter_count"] += tensor.numel()
+            key = (tensor.data_ptr(), tensor.numel())
+            if key in storages:
+                continue
+            storages.add(key)
+            size = tensor.numel() * tensor.element_size()
+            report[kind] += size
+            dtype = str(tensor.dtype).replace("torch.", "")
+            report["by_dtype"][dtype] = report["by_dtype"].get(dtype, 0) + size
+    report["total"] = report["parameters"] + report["buffers"]
+    return report
+
+
+def _ner_model(state: Any):
+    nlu_service = getattr(state, "nlu_service", None)
+    ner_service = getattr(nlu_service, "ner_service", None)
+    return getattr(ner_service, "ner_model", None)
+
+
+def cache_report(state: Any, deep: bool = True) -> dict[str, dict[str, Any]]:
+    """
+    Записи и оценка памяти всех кэшей сервиса.
+
+    Args:
+        state: Сервисы приложения (app.state или результат build_services
+            в виде объекта с атрибутами).
+        deep: Оценивать занятую память (`deep_size`); без этого — только
+            число записей.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ..nlu.parsers.well_field_normalizer import get_inflection_index
+    from ..registry.snapshot import get_snapshot
+    from .profiler import profiler
+
+    seen: set[int] = set()
+    caches: dict[str, dict[str, Any]] = {}
+
+    def add(name: str, obj: Any, **info: Any) -> None:
+        if deep:
+            info["bytes"] = deep_size(obj, seen)
+        caches[name] = info
+
+    ner_model = _ner_model(state)
+    token_cache = getattr(ner_model, "token_cache", None)
+    if token_cache is not None:
+        add("token_cache", token_cache._pieces, entries=len(token_cache), max_entries=token_cache.max_size,
+            hits=token_cache.hits, misses=token_cache.misses, hit_rate=round(token_cache.hit_rate, 4))
+
+    session_store = getattr(state, "session_store", None)
+    if session_store is not None:
+        add("sessions", getattr(session_store, "_sessions", None), entries=len(session_store),
+            max_entries=getattr(session_store, "max_sessions", None))
+
+    registry_service = getattr(state, "registry_service", None)
+    knowledge_base = getattr(registry_service, "knowledge_base", None)
+    if knowledge_base is not None:
+        add("registry", knowledge_base.registry, entries=len(knowledge_base.registry))
+        add("module_synonyms", knowledge_base.target_synonyms,
+            entries=sum(len(variants) for variants in knowledge_base.target_synonyms.values()))
+        add("slot_validators", knowledge_base.slot_validators, entries=len(knowledge_base.slot_validators))
+
+    for owner in ("nlu_service", "processor"):
+        entity_parser = getattr(getattr(state, owner, None), "entity_parser", None)
+        if entity_parser is None:
+            continue
+        search_state = entity_parser.get_search_state()
+        fuzzy_deletes = search_state["fuzzy_deletes"]
+        add(f"{owner}.gazetteer", search_state,
+            entries={name: len(value) for name, value in search_state.items() if name != "fuzzy"},
+            fuzzy_deletes_mapped=type(fuzzy_deletes).__name__ == "MappedTable")
+
+    # Индекс берется, только если уже построен: отчет не строит его сам
+    inflection_index = get_inflection_index() if get_inflection_index.cache_info().currsize else {}
+    add("inflection_index", inflection_index, entries=len(inflection_index))
+
+    snapshot_loaded = bool(get_snapshot.cache_info().currsize)
+    snapshot_path = ModelConfig.SNAPSHOT_PATH
+    caches["index_snapshot"] = {
+        "loaded": snapshot_loaded,
+        "mapped_bytes": os.path.getsize(snapshot_path) if snapshot_loaded and os.path.exists(snapshot_path) else 0
+    }
+
+    add("profiler_stacks", profiler._stacks, entries=len(profiler._stacks))
+    return caches
+
+
+def _malloc_stats() -> dict[str, int] | None:
+    """Статистика malloc glibc (mallinfo2) или None на других libc."""
+    class MallInfo2(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_size_t) for name in
+                    ("arena", "ordblks", "smblks", "hblks", "hblkhd", "usmblks",
+                     "fsmblks", "uordblks", "fordblks", "keepcost")]
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        mallinfo2 = libc.mallinfo2
+    except (OSError, AttributeError):
+        return None
+    mallinfo2.restype = MallInfo2
+    info = mallinfo2()
+    return {
+        "arena": info.arena,
+        "mmapped": info.hblkhd,
+        "in_use": info.uordblks + info.hblkhd,
+        "free": info.fordblks,
+        "releasable": info.keepcost
+    }
+
+
+def allocator_report() -> dict[str, Any]:
+    """Статистика аллокаторов: malloc glibc, pymalloc и CUDA."""
+    report: dict[str, Any] = {
+        "malloc": _malloc_stats(),
+        "python_allocated_blocks": sys.getallocatedblocks()
+    }
+    import torch  # pylint: disable=import-outside-toplevel
+    if torch.cuda.is_available():
+        report["cuda"] = {
+            "allocated": torch.cuda.memory_allocated(),
+            "reserved": torch.cuda.memory_reserved(),
+            "max_allocated": torch.cuda.max_memory_allocated()
+        }
+    return report
+
+
+def python_objects(limit: int = 15) -> dict[str, Any]:
+    """Число объектов, отслеживаемых сборщиком мусора, и самые частые типы."""
+    types = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return {
+        "tracked_objects": sum(types.values()),
+        "gc_counts": gc.get_count(),
+        "garbage": len(gc.garbage),
+        "top_types": dict(types.most_common(limit))
+    }
+
+
+def memory_report(state: Any, deep: bool = True) -> dict[str, Any]:
+    """
+    Отчет о памяти процесса и сервисов.
+
+    Args:
+        state: Сервисы приложения (см. `cache_report`).
+        deep: Оценивать память кэшей и считать объекты Python (дольше).
+    """
+    process = read_process_memory()
+    process["peak_rss"] = get_peak_rss()
+    ner_model = _ner_model(state)
+    report = {
+        "pid": os.getpid(),
+        "process": process,
+        "model": None,
+        "caches": cache_report(state, deep=deep),
+        "allocators": allocator_report(),
+        "tracemalloc": memory_tracker.status()
+    }
+    if ner_model is not None:
+        report["model"] = dict(model_memory(ner_model.model), load_method=ner_model.load_method)
+    if deep:
+        report["python"] = python_objects()
+    return report
+
+
+class _TrackedRequest:
+    def __init__(self, tracker: 'MemoryTracker'):
+        self.tracker = tracker
+        self._start = 0
+
+    def __enter__(self) -> None:
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def __exit__(self, *exc_info) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.tracker._record(max(peak - self._start, 0), current - self._start)
+
+
+class MemoryTracker:
+    """
+    tracemalloc по команде и прирост памяти выборочных запросов.
+
+    Args:
+        sample_rate: Доля запросов, для которых записывается прирост памяти;
+            больше 0 — tracemalloc включается при первом запросе.
+        frames: Глубина стека мест выделения памяти.
+    """
+
+    def __init__(self, sample_rate: float, frames: int):
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.requests = 0
+        self.retained = 0
+        self.max_allocated = 0
+        self._recent: deque[tuple[int, int]] = deque(maxlen=RECENT_REQUESTS)
+        self._baseline: tracemalloc.Snapshot | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int | None = None) -> None:
+        """Включает tracemalloc; текущий снимок — база для сравнения."""
+        with self._lock:
+            if frames is not None:
+                self.frames = frames
+            if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != self.frames:
+                tracemalloc.stop()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+    def stop(self) -> None:
+        """Выключает tracemalloc и освобождает его трассы."""
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+
+    def track_request(self) -> ContextManager[None]:
+        """Контекст запроса: записывает прирост памяти, если запрос в выборке."""
+        if self.sample_rate <= 0:
+            return _NULL_CONTEXT
+        if not tracemalloc.is_tracing():
+            self.start()
+        if random.random() >= self.sample_rate:
+            return _NULL_CONTEXT
+        return _TrackedRequest(self)
+
+    def _record(self, allocated: int, retained: int) -> None:
+        REQUEST_ALLOCATION.observe(allocated)
+        REQUEST_RETAINED.inc(retained)
+        with self._lock:
+            self.requests += 1
+            self.retained += retained
+            self.max_allocated = max(self.max_allocated, allocated)
+            self._recent.append((allocated, retained))
+
+    def status(self) -> dict[str, Any]:
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            recent = list(self._recent)
+            return {
+                "tracing": tracemalloc.is_tracing(),
+                "frames": self.frames,
+                "traced": traced,
+                "traced_peak": peak,
+                "tracemalloc_overhead": tracemalloc.get_tracemalloc_memory(),
+                "sample_rate": self.sample_rate,
+                "sampled_requests": self.requests,
+                "retained_total": self.retained,
+                "max_allocated": self.max_allocated,
+                "recent_mean_allocated": sum(item[0] for item in recent) / len(recent) if recent else 0,
+                "recent_mean_retained": sum(item[1] for item in recent) / len(recent) if recent else 0
+            }
+
+    def top_allocations(self, limit: int = 20, group_by: str = "lineno",
+                        compare: bool = False) -> list[dict[str, Any]]:
+        """
+        Места выделения памяти, живой на момент вызова.
+
+        Args:
+            limit: Сколько мест вернуть.
+            group_by: Группировка: lineno, filename или traceback.
+            compare: Упорядочить по приросту с момента включения tracemalloc.
+
+        Raises:
+            RuntimeError: tracemalloc не включен.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        if compare and self._baseline is not None:
+            stats = snapshot.compare_to(self._baseline, group_by)[:limit]
+            return [{"site": _format_traceback(stat.traceback), "size": stat.size, "count": stat.count,
+                     "size_diff": stat.size_diff, "count_diff": stat.count_diff} for stat in stats]
+        return [{"site": _format_traceback(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in snapshot.statistics(group_by)[:limit]]
+
+
+def _format_traceback(traceback: tracemalloc.Traceback) -> list[str]:
+    # Внешний вызов первым, как в обычном traceback
+    return [f"{frame.filename}:{frame.lineno}" for frame in reversed(traceback)]
+
+
+memory_tracker = MemoryTracker(
+    sample_rate=ModelConfig.MEMORY_SAMPLE_RATE,
+    frames=max(1, ModelConfig.MEMORY_TRACE_FRAMES)
+)
+
+# PSS есть только в smaps_rollup, чтение которого занимает миллисекунды и
+# блокирует event loop на каждом сборе метрик; он — в /admin/memory
+PROCESS_MEMORY.set_function(get_current_rss, kind="rss")
+PROCESS_MEMORY.set_function(lambda: tracemalloc.get_traced_memory()[0], kind="python_traced")
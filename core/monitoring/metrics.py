@@ -0,0 +1,404 @@
+"""
+Метрики сервиса в формате Prometheus.
+
+Легковесная реализация без внешних зависимостей: запись значения — это
+захват блокировки и инкремент счетчика, рендеринг текста происходит только
+при обращении к /metrics. В pre-fork режиме у каждого воркера свой реестр.
+
+Длительности стадий также накапливаются в таймингах текущего запроса
+(contextvar), если они включены через `start_request_timings`; из них
+middleware собирает заголовок Server-Timing.
+
+Пример:
+    >>> with timed_stage("forward"):
+    ...     outputs = model(**inputs)
+    >>> BATCH_SIZE.observe(len(texts))
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Callable, Iterator
+
+from ...config.model_config import ModelConfig
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+MEMORY_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        """Значение вычисляется при чтении метрик, а не на горячем пути."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def get(self, **labels: str) -> float:
+        key = self._key(labels)
+        function = self._functions.get(key)
+        return function() if function else self._values.get(key, 0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        samples = [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                   for key, value in items]
+        for key, function in functions:
+            try:
+                value = function()
+            except Exception:  # pylint: disable=broad-except
+                continue
+            samples.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return samples
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: счетчики по бакетам (+Inf последним), сумма, количество
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get_count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def get_sum(self, **labels: str) -> float:
+        state = self._values.get(self._key(labels))
+        return state[1] if state else 0.0
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            samples.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            samples.append(f"{self.name}_count{labels} {count}")
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_LATENCY = registry.histogram(
+    "nlu_stage_duration_seconds",
+    "Duration of NLU pipeline stages",
+    ("stage",)
+)
+
+REQUEST_LATENCY = registry.histogram(
+    "nlu_http_request_duration_seconds",
+    "Duration of HTTP requests",
+    ("route", "status")
+)
+
+BATCH_SIZE = registry.histogram(
+    "nlu_inference_batch_size",
+    "Number of texts per NER model forward pass",
+    buckets=BATCH_SIZE_BUCKETS
+)
+
+PROCESSING_PATH = registry.counter(
+    "nlu_processing_path_total",
+    "Requests by processing path: ner_model, no_model, rule_based, session_context or degraded",
+    ("path",)
+)
+
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "nlu_admission_queue_depth",
+    "Requests waiting for the NER model"
+)
+
+ADMISSION_ESTIMATED_WAIT = registry.gauge(
+    "nlu_admission_estimated_wait_seconds",
+    "Estimated queue wait for a new model request"
+)
+
+LOAD_SHED = registry.counter(
+    "nlu_load_shed_total",
+    "Requests served in degraded mode by rules instead of the model, by reason",
+    ("reason",)
+)
+
+DEADLINE_EXCEEDED = registry.counter(
+    "nlu_deadline_exceeded_total",
+    "Requests dropped because their deadline passed or the client disconnected, by stage",
+    ("stage", "reason")
+)
+
+ACTIVE_SESSIONS = registry.gauge(
+    "nlu_active_sessions",
+    "Session contexts currently held in the session store"
+)
+
+TOKEN_CACHE_LOOKUPS = registry.counter(
+    "nlu_token_cache_lookups_total",
+    "Distinct words per tokenization looked up in the word piece cache, by result",
+    ("result",)
+)
+
+TOKEN_CACHE_SIZE = registry.gauge(
+    "nlu_token_cache_size",
+    "Words held in the word piece cache"
+)
+
+PROFILED_REQUESTS = registry.counter(
+    "nlu_profiled_requests_total",
+    "Requests run under the sampling profiler, by mode: sampled or on_demand",
+    ("mode",)
+)
+
+PROCESS_MEMORY = registry.gauge(
+    "nlu_process_memory_bytes",
+    "Process memory by kind: rss, python_traced (tracemalloc, 0 when not tracing)",
+    ("kind",)
+)
+
+REQUEST_ALLOCATION = registry.histogram(
+    "nlu_request_allocation_bytes",
+    "Peak traced Python allocation of sampled requests above the level at request start",
+    buckets=MEMORY_BUCKETS
+)
+
+REQUEST_RETAINED = registry.gauge(
+    "nlu_request_retained_bytes",
+    "Traced Python memory left allocated after sampled requests, cumulative"
+)
+
+EVENT_LOOP_LAG = registry.histogram(
+    "nlu_event_loop_lag_seconds",
+    "Delay of event loop heartbeats past their scheduled time"
+)
+
+EVENT_LOOP_BLOCKED = registry.counter(
+    "nlu_event_loop_blocked_total",
+    "Event loop stalls longer than the warning threshold, by route running at the time",
+    ("route",)
+)
+
+EXECUTOR_ACTIVE = registry.gauge(
+    "nlu_executor_active_workers",
+    "Busy worker threads by executor: inference, bulk, threadpool",
+    ("executor",)
+)
+
+EXECUTOR_QUEUE_DEPTH = registry.gauge(
+    "nlu_executor_queue_depth",
+    "Tasks waiting for a worker thread by executor",
+    ("executor",)
+)
+
+EXECUTOR_MAX_WORKERS = registry.gauge(
+    "nlu_executor_max_workers",
+    "Worker thread limit by executor",
+    ("executor",)
+)
+
+TORCH_THREADS = registry.gauge(
+    "nlu_torch_threads",
+    "Torch thread pool sizes by pool: intra_op, inter_op",
+    ("pool",)
+)
+
+TORCH_THREAD_UTILIZATION = registry.gauge(
+    "nlu_torch_thread_utilization",
+    "Process CPU time per wall second divided by torch intra-op threads"
+)
+
+
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> Token:
+    """Начинает сбор длительностей стадий для текущего запроса."""
+    return _request_timings.set({})
+
+
+def get_request_timings() -> dict[str, float] | None:
+    """Длительности стадий текущего запроса в секундах."""
+    return _request_timings.get()
+
+
+def reset_request_timings(token: Token) -> None:
+    _request_timings.reset(token)
+
+
+def record_stage(stage: str, duration: float) -> None:
+    if ModelConfig.METRICS_ENABLED:
+        STAGE_LATENCY.observe(duration, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + duration
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """
+    Замеряет длительность стадии и записывает ее в гистограмму стадий
+    и в тайминги текущего запроса.
+
+    Args:
+        stage: Название стадии.
+    """
+    if not ModelConfig.METRICS_ENABLED and _request_timings.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+class StageTimer:
+    """
+    Последовательный замер стадий длинной функции без вложенных блоков with.
+
+    Каждый вызов `mark` записывает время, прошедшее с предыдущей отметки.
+    """
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        record_stage(stage, now - self._last)
+        self._last = now
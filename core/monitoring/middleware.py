@@ -0,0 +1,94 @@
+"""ASGI middleware для метрик HTTP запросов и заголовка Server-Timing."""
+import time
+from typing import Any, Awaitable, Callable
+
+from ...config.model_config import ModelConfig
+from .metrics import (REQUEST_LATENCY, get_request_timings,
+                      reset_request_timings, start_request_timings)
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+
+class MetricsMiddleware:
+    """
+    Записывает длительность HTTP запросов по маршрутам и статусам.
+
+    Реализован как чистое ASGI middleware, без BaseHTTPMiddleware, чтобы не
+    добавлять лишнюю задачу и буферизацию к каждому запросу.
+    """
+
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not ModelConfig.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code)
+            )
+
+
+def format_server_timing(timings: dict[str, float], total: float) -> str:
+    """
+    Форматирует длительности стадий (в секундах) как значение Server-Timing.
+
+    Вложенные стадии (например, forward внутри ner) перечисляются отдельно.
+    """
+    entries = [f"{stage};dur={duration * 1000:.3f}" for stage, duration in timings.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Добавляет к ответу заголовок Server-Timing с длительностями стадий.
+
+    Стадии собираются из `timed_stage`/`StageTimer` в контексте запроса,
+    total — время до начала отправки ответа.
+    """
+
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not ModelConfig.SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = start_request_timings()
+        timings = get_request_timings()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                header = format_server_timing(timings, time.perf_counter() - started)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1")),
+                    (b"timing-allow-origin", b"*"),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_request_timings(token)
@@ -0,0 +1,306 @@
+"""
+Выборочное профилирование обработки команд.
+
+`NLUService.process_text` выполняется внутри `profiler.profile_request()`.
+Профилируется доля запросов ModelConfig.PROFILER_SAMPLE_RATE или,
+по команде администратора (`arm`), следующие K запросов. Для
+профилируемого запроса фоновый поток раз в ModelConfig.PROFILER_INTERVAL_MS
+снимает стек потока обработки (`sys._current_frames`) от process_text до
+текущей функции. Стеки агрегируются в формате collapsed stacks
+(«a;b;c 12»), который понимают flamegraph.pl и speedscope, и отдаются как
+есть или в виде SVG флеймграфа (`render_flamegraph_svg`).
+
+По запросу к профилю добавляется трасса torch.profiler прямого прохода
+NERModel (`forward_trace`) в формате Chrome trace. torch.profiler не
+допускает вложенных трасс, поэтому трасса пишется для одного прямого
+прохода за раз, остальные в это время проходят без трассы.
+
+Выключенный профилировщик (доля 0 и нет запросов по команде) стоит одну
+проверку атрибутов на запрос и одну ContextVar на прямой проход: поток
+выборки не запускается. В pre-fork режиме у каждого воркера свой профиль.
+
+Пример:
+    >>> profiler.arm(requests=100, torch_trace=True)
+    >>> with profiler.profile_request():
+    ...     result = process(text)
+    >>> print(profiler.collapsed())
+"""
+import html
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import nullcontext
+from contextvars import ContextVar
+from types import FrameType
+from typing import Any, ContextManager
+
+from ...config.model_config import ModelConfig
+from .metrics import PROFILED_REQUESTS
+
+# Ограничение числа различных стеков: память профиля не растет без предела
+MAX_STACKS = 20000
+TRUNCATED_STACK = "[other stacks]"
+
+_NULL_CONTEXT = nullcontext()
+_forward_trace_requested: ContextVar[bool] = ContextVar("forward_trace_requested", default=False)
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _ProfiledRequest:
+    def __init__(self, profiler: 'SamplingProfiler', entry: FrameType, torch_trace: bool):
+        self.profiler = profiler
+        self.entry = entry
+        self.torch_trace = torch_trace
+        self._token = None
+
+    def __enter__(self) -> None:
+        if self.torch_trace:
+            self._token = _forward_trace_requested.set(True)
+        self.profiler._register(threading.get_ident(), self.entry)
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler._unregister(threading.get_ident())
+        if self._token is not None:
+            _forward_trace_requested.reset(self._token)
+
+
+class SamplingProfiler:
+    """
+    Статистический профилировщик запросов.
+
+    Args:
+        sample_rate: Доля профилируемых запросов (0 — только по команде).
+        interval: Интервал выборки стеков, секунды.
+        trace_dir: Каталог для трасс torch.profiler.
+    """
+
+    def __init__(self, sample_rate: float, interval: float, trace_dir: str):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.trace_dir = trace_dir
+        self.requests = 0
+        self.samples = 0
+        self.last_trace: str | None = None
+        self._armed = 0
+        self._armed_torch_trace = False
+        self._stacks: Counter[str] = Counter()
+        self._active: dict[int, FrameType] = {}
+        self._lock = threading.Lock()
+        self._trace_lock = threading.Lock()
+        self._has_active = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def profile_request(self) -> ContextManager[None]:
+        """
+        Контекст обработки одного запроса: профилирует его, если запрос
+        попал в выборку или профиль запрошен администратором.
+        """
+        if not self._armed and self.sample_rate <= 0:
+            return _NULL_CONTEXT
+        with self._lock:
+            if self._armed:
+                self._armed -= 1
+                mode, torch_trace = "on_demand", self._armed_torch_trace
+            elif random.random() < self.sample_rate:
+                mode, torch_trace = "sampled", False
+            else:
+                return _NULL_CONTEXT
+            self.requests += 1
+        PROFILED_REQUESTS.inc(mode=mode)
+        return _ProfiledRequest(self, sys._getframe(1), torch_trace)
+
+    def arm(self, requests: int, torch_trace: bool = False) -> None:
+        """Профилировать следующие requests запросов (с трассой прямого прохода)."""
+        with self._lock:
+            self._armed = max(0, requests)
+            self._armed_torch_trace = torch_trace
+
+    def reset(self) -> None:
+        """Сбрасывает собранные стеки и счетчики."""
+        with self._lock:
+            self._stacks.clear()
+            self.requests = 0
+            self.samples = 0
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "interval_ms": self.interval * 1000,
+                "armed_requests": self._armed,
+                "armed_torch_trace": self._armed_torch_trace,
+                "profiled_requests": self.requests,
+                "samples": self.samples,
+                "distinct_stacks": len(self._stacks),
+                "active": len(self._active),
+                "last_trace": self.last_trace
+            }
+
+    def stacks(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stacks)
+
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed stacks, по убыванию числа выборок."""
+        return "".join(f"{stack} {count}\n" for stack, count in
+                       sorted(self.stacks().items(), key=lambda item: -item[1]))
+
+    def _register(self, ident: int, entry: FrameType) -> None:
+        with self._lock:
+            self._active[ident] = entry
+            self._has_active.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+
+    def _unregister(self, ident: int) -> None:
+        with self._lock:
+            self._active.pop(ident, None)
+            if not self._active:
+                self._has_active.clear()
+
+    def _run(self) -> None:
+        while True:
+            self._has_active.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            stacks = []
+            for ident, entry in active:
+                frame = frames.get(ident)
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    if frame is entry:
+                        break
+                    frame = frame.f_back
+                if names:
+                    stacks.append(";".join(reversed(names)))
+            del frames
+            with self._lock:
+                for stack in stacks:
+                    if stack not in self._stacks and len(self._stacks) >= MAX_STACKS:
+                        stack = TRUNCATED_STACK
+                    self._stacks[stack] += 1
+                self.samples += len(stacks)
+
+    def forward_trace(self) -> ContextManager[Any]:
+        """
+        Трасса torch.profiler вокруг прямого прохода модели, если текущий
+        запрос профилируется с трассой и другая трасса сейчас не пишется;
+        иначе пустой контекст.
+        """
+        if not _forward_trace_requested.get() or not self._trace_lock.acquire(blocking=False):
+            return _NULL_CONTEXT
+        return _ForwardTrace(self)
+
+
+class _ForwardTrace:
+    # Создается с захваченным profiler._trace_lock и освобождает его на выходе
+    def __init__(self, profiler: SamplingProfiler):
+        self.profiler = profiler
+        self._torch_profiler = None
+
+    def __enter__(self) -> None:
+        try:
+            import torch.profiler
+            self._torch_profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+            )
+            self._torch_profiler.__enter__()
+        except BaseException:
+            self.profiler._trace_lock.release()
+            raise
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            self._torch_profiler.__exit__(*exc_info)
+            os.makedirs(self.profiler.trace_dir, exist_ok=True)
+            path = os.path.join(self.profiler.trace_dir, f"forward_{os.getpid()}_{time.time_ns()}.json")
+            self._torch_profiler.export_chrome_trace(path)
+            previous, self.profiler.last_trace = self.profiler.last_trace, path
+            if previous and previous != path:
+                try:
+                    os.remove(previous)
+                except OSError:
+                    pass
+        finally:
+            self.profiler._trace_lock.release()
+
+
+def _frame_color(name: str) -> str:
+    value = zlib.crc32(name.encode("utf-8"))
+    return f"rgb({205 + value % 50},{80 + (value >> 8) % 120},{(value >> 16) % 60})"
+
+
+def render_flamegraph_svg(stacks: dict[str, int], title: str = "NLU flamegraph",
+                          width: int = 1200, frame_height: int = 16) -> str:
+    """
+    SVG флеймграф из collapsed stacks: ширина кадра пропорциональна числу
+    выборок, подсказка кадра — имя, выборки и доля.
+    """
+    root: dict[str, Any] = {"value": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["value"] += count
+        node = root
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"value": 0, "children": {}})
+            node["value"] += count
+
+    total = root["value"] or 1
+    scale = width / total
+    rects = []
+    depth_max = 0
+
+    def walk(node: dict[str, Any], x: float, depth: int) -> None:
+        nonlocal depth_max
+        for name, child in sorted(node["children"].items()):
+            child_width = child["value"] * scale
+            if child_width >= 0.5:
+                depth_max = max(depth_max, depth)
+                label = html.escape(name)
+                tooltip = f"{label} ({child['value']} samples, {child['value'] / total:.1%})"
+                text = label if len(name) * 7 < child_width else ""
+                rects.append((x, depth, child_width, name, tooltip, text))
+                walk(child, x, depth + 1)
+            x += child_width
+
+    walk(root, 0.0, 0)
+    top = 24
+    height = top + (depth_max + 1) * frame_height + 4
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="16">{html.escape(title)}: {root["value"]} samples</text>'
+    ]
+    for x, depth, rect_width, name, tooltip, text in rects:
+        # Корень внизу, как в flamegraph.pl
+        y = height - 4 - (depth + 1) * frame_height
+        parts.append(
+            f'<g><title>{tooltip}</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{rect_width:.2f}" height="{frame_height - 1}" '
+            f'fill="{_frame_color(name)}"/>'
+            + (f'<text x="{x + 2:.2f}" y="{y + frame_height - 4}">{text}</text>' if text else "")
+            + '</g>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+profiler = SamplingProfiler(
+    sample_rate=ModelConfig.PROFILER_SAMPLE_RATE,
+    interval=ModelConfig.PROFILER_INTERVAL_MS / 1000,
+    trace_dir=ModelConfig.PROFILER_TRACE_DIR or os.path.join(tempfile.gettempdir(), "nlu_profiles")
+)
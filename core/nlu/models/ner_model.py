@@ -1,3 +1,5 @@
+import time
+
 import torch
 from transformers import (
     AutoTokenizer,
@@ -7,39 +9,107 @@ from transformers import (
 
 from ....config.command_config import id2ner
 from ....config.model_config import ModelConfig
+from ...monitoring.metrics import BATCH_SIZE, timed_stage
+from ...monitoring.profiler import profiler
+from ...utils.deadline import Deadline
+from ...utils.memory_utils import format_bytes, read_process_memory
+from .token_cache import TokenCache
+from .weights import get_safetensors_path, load_token_classifier_mmap
 
 
 class NERModel:
     def __init__(self, model_path: str | None = None):
-        self.model_path = model_path or ModelConfig.MODEL_PATH
+        self.model_path = model_path or ModelConfig.get_ner_model_path()
+        started = time.perf_counter()
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-        self.model = AutoModelForTokenClassification.from_pretrained(
-            self.model_path,
-            num_labels=len(id2ner)
-        )
+        if ModelConfig.MMAP_WEIGHTS and get_safetensors_path(self.model_path):
+            self.model = load_token_classifier_mmap(self.model_path, num_labels=len(id2ner))
+            self.load_method = "safetensors_mmap"
+        else:
+            self.model = AutoModelForTokenClassification.from_pretrained(
+                self.model_path,
+                num_labels=len(id2ner)
+            )
+            self.load_method = "from_pretrained"
         self.model.eval()
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
         self.data_collator = DataCollatorForTokenClassification(self.tokenizer)
-        print(f"Model loaded on {self.device}")
+        self.token_cache = None
+        if ModelConfig.TOKEN_CACHE_SIZE > 0:
+            token_cache = TokenCache(self.tokenizer, ModelConfig.TOKEN_CACHE_SIZE)
+            if token_cache.enabled:
+                self.token_cache = token_cache
+        self.load_time = time.perf_counter() - started
+        rss = read_process_memory().get("rss", 0)
+        print(f"Model loaded on {self.device} via {self.load_method} "
+              f"in {self.load_time:.2f}s, RSS {format_bytes(rss)}")
 
-    def predict(self, text: str) -> list[dict[str, str]]:
+    def predict(self, text: str, deadline: Deadline | None = None) -> list[dict[str, str]]:
         words = text.split()
-        tokenized = self.tokenizer(
-            words,
-            is_split_into_words=True,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512
-        )
+        if deadline is not None:
+            deadline.check("tokenization")
+        with timed_stage("tokenization"):
+            inputs, word_ids = self._tokenize([words])
+        if deadline is not None:
+            deadline.check("forward")
+        BATCH_SIZE.observe(1)
+        with timed_stage("forward"), torch.no_grad(), profiler.forward_trace():
+            outputs = self.model(**inputs)
+        with timed_stage("decoding"):
+            predictions = torch.argmax(outputs.logits, dim=2)[0].tolist()
+            result = self._decode(words, word_ids[0], predictions)
+        return result
+
+    def predict_batch(self, texts: list[str]) -> list[list[dict[str, str]]]:
+        """
+        Предсказание тегов для нескольких текстов за один прямой проход.
+
+        Тексты дополняются паддингом до самого длинного в батче; результат
+        для каждого текста совпадает с `predict`.
+        """
+        batch_words = [text.split() for text in texts]
+        results: list[list[dict[str, str]]] = [[] for _ in texts]
+        indices = [i for i, words in enumerate(batch_words) if words]
+        if not indices:
+            return results
+        with timed_stage("tokenization"):
+            inputs, word_ids = self._tokenize([batch_words[i] for i in indices])
+        BATCH_SIZE.observe(len(indices))
+        with timed_stage("forward"), torch.no_grad():
+            outputs = self.model(**inputs)
+        with timed_stage("decoding"):
+            predictions = torch.argmax(outputs.logits, dim=2).tolist()
+            for row, i in enumerate(indices):
+                results[i] = self._decode(batch_words[i], word_ids[row], predictions[row])
+        return results
+
+    def _tokenize(self, batch_words: list[list[str]],
+                  max_length: int = 512) -> tuple[dict[str, torch.Tensor], list[list[int | None]]]:
+        # Вход модели из кэша субтокенов слов или, если кэш выключен, токенизатором
+        if self.token_cache is not None:
+            input_ids, attention_mask, word_ids = self.token_cache.encode(batch_words, max_length)
+        else:
+            tokenized = self.tokenizer(
+                batch_words,
+                is_split_into_words=True,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=max_length
+            )
+            input_ids = tokenized['input_ids']
+            attention_mask = tokenized['attention_mask']
+            word_ids = [tokenized.word_ids(row) for row in range(len(batch_words))]
         inputs = {
-            'input_ids': tokenized['input_ids'].to(self.device),
-            'attention_mask': tokenized['attention_mask'].to(self.device)
+            'input_ids': input_ids.to(self.device),
+            'attention_mask': attention_mask.to(self.device)
         }
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        predictions = torch.argmax(outputs.logits, dim=2)[0].tolist()
-        word_ids = tokenized.word_ids()
+        return inputs, word_ids
+
+    @staticmethod
+    def _decode(words: list[str], word_ids: list[int | None], predictions: list[int]) -> list[dict[str, str]]:
+        # Тег слова — предсказание для его первого субтокена
         result = []
         current_word_id = None
         for i, word_id in enumerate(word_ids):
@@ -56,6 +126,6 @@ class NERModel:
 
     def save_model(self, path: str | None = None):
         save_path = path or self.model_path
-        self.model.save_pretrained(save_path)
+        self.model.save_pretrained(save_path, safe_serialization=True)
         self.tokenizer.save_pretrained(save_path)
         print(f"Model saved to {save_path}")
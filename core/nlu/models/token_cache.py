@@ -0,0 +1,176 @@
+"""
+Кэш WordPiece-разбиения слов.
+
+Слова команд сильно повторяются (названия месторождений, «скважина»,
+месяцы), а токенизатор на каждом запросе заново разбивает каждое слово.
+BERT-токенизатор с is_split_into_words разбивает слова независимо друг от
+друга, поэтому input_ids последовательности — это [CLS], субтокены слов
+подряд и [SEP]. Кэш хранит субтокены каждого слова и собирает из них
+input_ids, attention_mask и соответствие токенов словам; токенизатор
+вызывается только для новых слов (одним батчем).
+
+Результат совпадает с вызовом токенизатора бит в бит, включая усечение до
+max_length и паддинг справа. При создании это проверяется на пробных
+текстах; если токенизатор устроен иначе (другой пост-процессор, паддинг
+слева), кэш не используется.
+
+Размер кэша ограничен, вытесняются давно не использованные слова (LRU).
+"""
+import threading
+from collections import OrderedDict
+
+import torch
+
+from ...monitoring.metrics import TOKEN_CACHE_LOOKUPS, TOKEN_CACHE_SIZE
+
+# Пробные тексты для проверки совместимости токенизатора с кэшем
+PROBE_TEXTS = [
+    "покажи шахматку по Самотлорскому месторождению скважина 215 за сентябрь 2023",
+    "открой МЭР 5/12 с 01.01.2024 по 31.03.2024",
+    "Report, export; данные №7 (новые) ёлка",
+    "а",
+]
+
+
+class TokenCache:
+    """
+    Кэш субтокенов слов с ограниченным размером.
+
+    Args:
+        tokenizer: BERT-токенизатор модели.
+        max_size: Максимум слов в кэше.
+
+    Attributes:
+        enabled (bool): Токенизатор совместим с кэшем.
+        hits (int): Слов найдено в кэше.
+        misses (int): Слов разбито токенизатором.
+    """
+
+    def __init__(self, tokenizer, max_size: int):
+        self.tokenizer = tokenizer
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._pieces: OrderedDict[str, list[int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.enabled = self._check_compatible()
+        if not self.enabled:
+            print("Token cache disabled: tokenizer output differs from cached assembly")
+        self.clear()
+        TOKEN_CACHE_SIZE.set_function(lambda: len(self))
+
+    def __len__(self) -> int:
+        return len(self._pieces)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pieces.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _check_compatible(self) -> bool:
+        if self.tokenizer.padding_side != "right" or self.tokenizer.cls_token_id is None \
+                or self.tokenizer.sep_token_id is None or self.tokenizer.pad_token_id is None:
+            return False
+        batch_words = [text.split() for text in PROBE_TEXTS]
+        for max_length in (512, 8):
+            expected = self.tokenizer(
+                batch_words,
+                is_split_into_words=True,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=max_length
+            )
+            input_ids, attention_mask, word_ids, _ = self._encode(batch_words, max_length)
+            if not (torch.equal(input_ids, expected["input_ids"])
+                    and torch.equal(attention_mask, expected["attention_mask"])
+                    and word_ids == [expected.word_ids(row) for row in range(len(batch_words))]):
+                return False
+        return True
+
+    def _lookup(self, words: set[str]) -> tuple[dict[str, list[int]], int]:
+        found = {}
+        with self._lock:
+            for word in words:
+                pieces = self._pieces.get(word)
+                if pieces is not None:
+                    self._pieces.move_to_end(word)
+                    found[word] = pieces
+        missing = [word for word in words if word not in found]
+        if missing:
+            encoded = self.tokenizer(
+                [[word] for word in missing],
+                is_split_into_words=True,
+                add_special_tokens=False
+            )["input_ids"]
+            with self._lock:
+                for word, pieces in zip(missing, encoded):
+                    found[word] = pieces
+                    self._pieces[word] = pieces
+                while len(self._pieces) > self.max_size:
+                    self._pieces.popitem(last=False)
+        return found, len(missing)
+
+    def encode(self, batch_words: list[list[str]],
+               max_length: int = 512) -> tuple[torch.Tensor, torch.Tensor, list[list[int | None]]]:
+        """
+        Собирает вход модели для батча текстов, разбитых на слова.
+
+        Попадания и промахи считаются по различным словам батча.
+
+        Args:
+            batch_words: Слова каждого текста.
+            max_length: Максимальная длина последовательности с [CLS] и [SEP].
+
+        Returns:
+            tuple: input_ids, attention_mask (паддинг справа до самого длинного
+            текста) и номера слов для каждого токена (None для служебных).
+        """
+        input_ids, attention_mask, word_ids, (hits, misses) = self._encode(batch_words, max_length)
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        if hits:
+            TOKEN_CACHE_LOOKUPS.inc(hits, result="hit")
+        if misses:
+            TOKEN_CACHE_LOOKUPS.inc(misses, result="miss")
+        return input_ids, attention_mask, word_ids
+
+    def _encode(self, batch_words: list[list[str]], max_length: int):
+        pieces, misses = self._lookup({word for words in batch_words for word in words})
+
+        cls_id = self.tokenizer.cls_token_id
+        sep_id = self.tokenizer.sep_token_id
+        budget = max_length - 2
+        rows = []
+        word_ids = []
+        for words in batch_words:
+            ids = [cls_id]
+            row_word_ids: list[int | None] = [None]
+            for index, word in enumerate(words):
+                word_pieces = pieces[word]
+                ids.extend(word_pieces)
+                row_word_ids.extend([index] * len(word_pieces))
+                if len(ids) > budget + 1:
+                    break
+            del ids[budget + 1:]
+            del row_word_ids[budget + 1:]
+            ids.append(sep_id)
+            row_word_ids.append(None)
+            rows.append(ids)
+            word_ids.append(row_word_ids)
+
+        length = max(len(ids) for ids in rows)
+        input_ids = torch.full((len(rows), length), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), length), dtype=torch.long)
+        for row, ids in enumerate(rows):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+            word_ids[row].extend([None] * (length - len(ids)))
+        return input_ids, attention_mask, word_ids, (len(pieces) - misses, misses)
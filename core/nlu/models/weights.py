@@ -0,0 +1,165 @@
+"""
+Загрузка весов NER-модели из safetensors через mmap.
+
+Тензоры создаются поверх отображенного в память файла (`torch.frombuffer`),
+без копирования и без случайной инициализации модели: страницы читаются из
+page cache по мере обращения, а несколько процессов на узле разделяют одну
+копию весов. Поведение не зависит от того, копирует ли `from_pretrained`
+веса в конкретной версии transformers (конвертация dtype, формат .bin).
+
+Конвертация существующей модели (pytorch_model.bin) в safetensors:
+
+    python -m app.core.nlu.models.weights app/data/trained_model
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+import torch
+from transformers import AutoConfig, AutoModelForTokenClassification, PreTrainedModel
+
+SAFETENSORS_NAME = "model.safetensors"
+
+_SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def get_safetensors_path(model_path: str) -> str | None:
+    path = os.path.join(model_path, SAFETENSORS_NAME)
+    return path if os.path.isfile(path) else None
+
+
+def load_safetensors_mmap(path: str) -> dict[str, torch.Tensor]:
+    """
+    Отображает файл safetensors в память и создает тензоры без копирования.
+
+    Отображение приватное (copy-on-write): запись в тензор не меняет файл,
+    а неизмененные страницы остаются общими с page cache.
+
+    Args:
+        path: Путь к файлу .safetensors.
+
+    Returns:
+        dict[str, torch.Tensor]: Тензоры по именам из заголовка файла.
+    """
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_offset = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _SAFETENSORS_DTYPES.get(info["dtype"])
+        if dtype is None:
+            raise ValueError(f"Unsupported safetensors dtype {info['dtype']} for {name}")
+        start, end = info["data_offsets"]
+        shape = info["shape"]
+        if start == end:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+        tensor = torch.frombuffer(
+            buffer,
+            dtype=dtype,
+            count=(end - start) // dtype.itemsize,
+            offset=data_offset + start
+        )
+        tensors[name] = tensor.view(shape)
+    return tensors
+
+
+def _materialize_non_persistent_buffers(model: torch.nn.Module) -> None:
+    # Непостоянные буферы (position_ids, token_type_ids) не сохраняются в
+    # файл весов и после создания модели на meta-устройстве остаются пустыми
+    for module in model.modules():
+        for name, buffer in list(module.named_buffers(recurse=False)):
+            if not buffer.is_meta:
+                continue
+            if name == "position_ids":
+                value = torch.arange(buffer.shape[-1], dtype=buffer.dtype).expand(buffer.shape)
+            elif name == "token_type_ids":
+                value = torch.zeros(buffer.shape, dtype=buffer.dtype)
+            else:
+                continue
+            module.register_buffer(
+                name,
+                value,
+                persistent=name not in module._non_persistent_buffers_set  # pylint: disable=protected-access
+            )
+
+
+def load_token_classifier_mmap(model_path: str, num_labels: int) -> PreTrainedModel:
+    """
+    Создает модель классификации токенов с весами, отображенными из safetensors.
+
+    Модель строится на meta-устройстве (без выделения памяти под веса),
+    затем параметры заменяются тензорами из `load_safetensors_mmap`.
+
+    Args:
+        model_path: Каталог модели с config.json и model.safetensors.
+        num_labels: Число меток NER.
+
+    Returns:
+        PreTrainedModel: Модель с весами в режиме только для чтения.
+
+    Raises:
+        FileNotFoundError: Если в каталоге нет model.safetensors.
+        ValueError: Если в файле не хватает весов модели.
+    """
+    weights_path = get_safetensors_path(model_path)
+    if weights_path is None:
+        raise FileNotFoundError(f"{SAFETENSORS_NAME} not found in {model_path}")
+
+    config = AutoConfig.from_pretrained(model_path, num_labels=num_labels)
+    with torch.device("meta"):
+        model = AutoModelForTokenClassification.from_config(config)
+
+    state_dict = load_safetensors_mmap(weights_path)
+    model.load_state_dict(state_dict, strict=False, assign=True)
+    _materialize_non_persistent_buffers(model)
+
+    missing = [
+        name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+        if tensor.is_meta
+    ]
+    if missing:
+        raise ValueError(f"Weights missing in {weights_path}: {', '.join(missing[:5])}")
+    return model
+
+
+def convert_to_safetensors(model_path: str, output_path: str | None = None) -> str:
+    """
+    Пересохраняет модель в формате safetensors.
+
+    Args:
+        model_path: Каталог исходной модели.
+        output_path: Каталог для результата. По умолчанию исходный каталог.
+
+    Returns:
+        str: Путь к созданному файлу весов.
+    """
+    output_path = output_path or model_path
+    model = AutoModelForTokenClassification.from_pretrained(model_path)
+    model.save_pretrained(output_path, safe_serialization=True)
+    return os.path.join(output_path, SAFETENSORS_NAME)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m app.core.nlu.models.weights <model_path> [output_path]")
+        sys.exit(1)
+    print(f"Saved {convert_to_safetensors(*sys.argv[1:3])}")
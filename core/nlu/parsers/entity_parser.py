@@ -3,11 +3,31 @@ from typing import Dict, Any, List, Tuple, Set, Optional
 from collections import defaultdict
 
 from ...nlu.parsers.date_parser import date_parser
+from ...nlu.parsers.fuzzy_gazetteer import FuzzyGazetteer, FuzzyMatch, gazetteer_key
+from ...nlu.parsers.well_field_normalizer import (build_inflection_index, get_inflection_index,
+                                                  inflected_forms, lookup_well_field)
+from ...registry.snapshot import get_snapshot
 from ....config.command_config import WELL_FIELDS, WELL_FIELDS_LOWER
+from ....config.model_config import ModelConfig
+
+# Классы слов сканера контекста месторождений
+FIELD_TOKEN_WORD = 0
+FIELD_TOKEN_PREPOSITION = 1
+FIELD_TOKEN_NOUN = 2
+FIELD_TOKEN_STOP = 3
+FIELD_TOKEN_OTHER = 4
+FIELD_TOKEN_BLOCK = 5
+# Сколько лучших непроверенных кандидатов проверять нечетким поиском
+FIELD_FUZZY_CANDIDATES = 2
+# Расстояние нечеткого поиска для слова без предлога и слова «месторождение» рядом
+FIELD_FUZZY_CONTEXT_FREE_DISTANCE = 1
+# Слова (с дефисами) и отдельные прочие символы
+FIELD_TOKEN_PATTERN = re.compile(r'[а-яё]+(?:-[а-яё]+)*|\S')
 
 
 class EntityParser:
-    def __init__(self):
+    def __init__(self, well_fields: List[str] | None = None):
+        self.well_fields = well_fields if well_fields is not None else WELL_FIELDS
         self._init_search_structures()
         
         self.well_name_stop_words = {
@@ -35,19 +55,26 @@ class EntityParser:
             "октябрь", "октября", "ноябрь", "ноября", "декабрь", "декабря"
         }
         
-        # Паттерны для определения месторождений по контексту
-        self.field_context_patterns = [
-            (r'(?:на|по|в|с|со|к|от|до|из)\s+([А-Яа-яё][а-яё]+(?:[-\s][А-Яа-яё]+)?)(?:\s+(?:месторождени[еяю]|площад[иь]))?', 1),
-            (r'(?:месторождени[еяю]|площад[иь])\s+([А-Яа-яё][а-яё]+(?:[-\s][А-Яа-яё]+)?)', 1),
-            (r'([А-Яа-яё][а-яё]+(?:[-\s][А-Яа-яё]+)?)\s+(?:месторождени[еяю]|площад[иь])', 1),
-            (r'([А-Яа-яё][а-яё]*(?:овск|евск|инск|енск|уртск)[а-яё]*)(?:\s+(?:месторождени[еяю]|площад[иь]))?', 1),
-        ]
+        # Контексты месторождения для find_field_by_context: предлог перед
+        # словом, «месторождение»/«площадь» до или после, суффикс названия
+        self.field_prepositions = {"на", "по", "в", "с", "со", "к", "от", "до", "из"}
+        self.field_nouns = {
+            "месторождение", "месторождения", "месторождению", "месторождении", "месторождением",
+            "площадь", "площади", "площадью"
+        }
+        self.field_suffix_pattern = re.compile(r'овск|евск|инск|енск|уртск')
+        # Рядом с этими словами прилагательное — не месторождение («кустовая площадка»)
+        self.field_blocking_nouns = {
+            "площадка", "площадки", "площадке", "площадку", "площадкой", "площадкою",
+            "площадок", "площадкам", "площадками", "площадках"
+        }
         
         self.not_field_markers = {
             "год", "года", "месяц", "январь", "февраль", "март", "апрель",
             "май", "июнь", "июль", "август", "сентябрь", "октябрь", "ноябрь",
             "декабрь", "тысячи", "двадцать", "тридцать", "сорок", "пятьдесят",
-            "скважина", "скв", "куст", "добыча", "дебит", "обводненность"
+            "скважина", "скважины", "скважине", "скважину", "скважиной", "скважин",
+            "скв", "куст", "добыча", "дебит", "обводненность", "данные", "данным", "данных"
         }
         
         self.field_stop_words = {
@@ -56,13 +83,29 @@ class EntityParser:
             "второй", "второго", "третий", "третьего", "весь", "всего",
             "целый", "целого", "новый", "нового", "старый", "старого"
         }
+        
+        # Классы слов для сканера контекста: одна проверка по словарю на слово
+        self.field_token_classes = {}
+        for word in self.field_stop_words | self.not_field_markers | self.month_words:
+            self.field_token_classes[word] = FIELD_TOKEN_STOP
+        for word in self.field_prepositions:
+            self.field_token_classes[word] = FIELD_TOKEN_PREPOSITION
+        for word in self.field_nouns:
+            self.field_token_classes[word] = FIELD_TOKEN_NOUN
+        for word in self.field_blocking_nouns:
+            self.field_token_classes[word] = FIELD_TOKEN_BLOCK
     
     def _init_search_structures(self):
+        # Индексы WELL_FIELDS берутся из снимка (core/registry/snapshot.py)
+        if self.well_fields is WELL_FIELDS and ModelConfig.SNAPSHOT_ENABLED:
+            self.set_search_state(get_snapshot()["well_fields"])
+            return
+
         self.prefix_map = defaultdict(list)
         self.exact_map = {}
         self.part_map = defaultdict(list)
         
-        for i, field in enumerate(WELL_FIELDS):
+        for field in self.well_fields:
             field_lower = field.lower()
             self.exact_map[field_lower] = field
             
@@ -74,6 +117,58 @@ class EntityParser:
             for word in words:
                 if len(word) >= 3:
                     self.part_map[word].append(field)
+        
+        self.fuzzy_index = FuzzyGazetteer(self.well_fields)
+        if self.well_fields is WELL_FIELDS:
+            self.inflection_index = get_inflection_index()
+        else:
+            self.inflection_index = build_inflection_index(self.well_fields)
+        
+        # Многословные названия («Имени В.Н.Виноградова», «Кечевский участок недр»)
+        # по первому слову: сканер контекста сверяет следующие слова текста
+        self.field_phrases = defaultdict(list)
+        for field in self.well_fields:
+            if not re.search(r'[\s.]', field):
+                continue
+            for form in {field.lower()} | set(inflected_forms(field)):
+                phrase = tuple(FIELD_TOKEN_PATTERN.findall(form))
+                self.field_phrases[phrase[0]].append((phrase, field))
+        for phrases in self.field_phrases.values():
+            phrases.sort(key=lambda item: len(item[0]), reverse=True)
+    
+    def get_search_state(self) -> Dict[str, Any]:
+        """Индексы месторождений для сохранения в снимок."""
+        return {
+            "prefix_map": self.prefix_map,
+            "exact_map": self.exact_map,
+            "part_map": self.part_map,
+            "field_phrases": self.field_phrases,
+            "fuzzy": self.fuzzy_index.to_state(),
+            "fuzzy_deletes": self.fuzzy_index.deletes,
+            "inflection_index": self.inflection_index,
+        }
+    
+    def set_search_state(self, state: Dict[str, Any]) -> None:
+        """Индексы месторождений из снимка (см. `get_search_state`)."""
+        self.prefix_map = state["prefix_map"]
+        self.exact_map = state["exact_map"]
+        self.part_map = state["part_map"]
+        self.field_phrases = state["field_phrases"]
+        self.fuzzy_index = FuzzyGazetteer.from_state(state["fuzzy"], state["fuzzy_deletes"])
+        self.inflection_index = state["inflection_index"]
+    
+    def find_well_field_fuzzy(self, candidate: str, max_distance: int = 2) -> Optional[FuzzyMatch]:
+        """
+        Месторождение по кандидату с опечатками (расстояние правки до 2).
+        
+        Args:
+            candidate: Слово или словосочетание из текста.
+            max_distance: Максимальное допустимое расстояние.
+        
+        Returns:
+            FuzzyMatch | None: Каноническое название и расстояние правки.
+        """
+        return self.fuzzy_index.lookup(candidate, max_distance)
     
     def _save_entity(self, entities: Dict[str, str], entity_type: str, tokens: List[str], well_field_tokens: List[str] = None):
         if well_field_tokens is None:
@@ -94,7 +189,7 @@ class EntityParser:
     def find_well_field_fast(self, text: str) -> Optional[str]:
         text_lower = text.lower()
         
-        for field in WELL_FIELDS:
+        for field in self.well_fields:
             if field.lower() in text_lower:
                 pattern = r'\b' + re.escape(field.lower()) + r'\b'
                 if re.search(pattern, text_lower):
@@ -110,35 +205,122 @@ class EntityParser:
                         if candidate.lower().startswith(word):
                             return candidate
         
+        # Опечатки: слова и пары соседних слов («верхнее колвинское»). Без
+        # предлога или слова «месторождение» рядом допускается одна правка
+        best = None
+        for i, word in enumerate(words):
+            previous_word = words[i - 1] if i > 0 else ""
+            in_context = previous_word in self.field_prepositions or previous_word in self.field_nouns
+            for size in (1, 2):
+                phrase_words = words[i:i + size]
+                next_word = words[i + size] if i + size < len(words) else ""
+                phrase = ' '.join(phrase_words)
+                if phrase in self.not_field_markers or phrase in self.month_words:
+                    continue
+                if previous_word in self.field_blocking_nouns or next_word in self.field_blocking_nouns \
+                        or any(w in self.field_blocking_nouns for w in phrase_words):
+                    continue
+                max_distance = None if in_context or next_word in self.field_nouns \
+                    else FIELD_FUZZY_CONTEXT_FREE_DISTANCE
+                match = self.fuzzy_index.lookup(phrase, max_distance)
+                if match and (best is None or match.distance < best.distance):
+                    best = match
+        if best:
+            print(f"Found well field by fuzzy search: {best.field} (distance {best.distance})")
+            return best.field
+        
         return None
     
     def find_field_by_context(self, text: str) -> Optional[str]:
-        text_lower = text.lower()
+        """
+        Месторождение по контексту за один проход по словам текста.
+        
+        Кандидат — слово (или пара слов) после предлога, рядом со словом
+        «месторождение»/«площадь» или с суффиксом названия (-овск-, -инск-, ...).
+        Слово рядом с «площадка» не кандидат: «кустовая площадка» — не
+        месторождение Кустовое.
+        Приоритет контекстов в этом порядке, внутри — по позиции в тексте.
+        Кандидаты сразу проверяются по индексу словоформ и нечеткому индексу
+        месторождений: найденное в газеттире название возвращается
+        каноническим и важнее непроверенного кандидата, который возвращается
+        как есть, если газеттир ничего не нашел.
+        
+        Args:
+            text: Текст команды.
+        
+        Returns:
+            str | None: Название месторождения или None.
+        """
+        tokens = FIELD_TOKEN_PATTERN.findall(text.lower())
+        classes = [self.field_token_classes.get(token, FIELD_TOKEN_WORD if len(token) > 2 else FIELD_TOKEN_OTHER)
+                   for token in tokens]
+        
+        best = None
+        unresolved = []
+        for i, token_class in enumerate(classes):
+            if token_class != FIELD_TOKEN_WORD and tokens[i] not in self.field_phrases:
+                continue
+            previous_class = classes[i - 1] if i > 0 else FIELD_TOKEN_OTHER
+            next_class = classes[i + 1] if i + 1 < len(classes) else FIELD_TOKEN_OTHER
+            if FIELD_TOKEN_BLOCK in (previous_class, next_class):
+                continue
+            if previous_class == FIELD_TOKEN_PREPOSITION:
+                priority = 0
+            elif previous_class == FIELD_TOKEN_NOUN:
+                priority = 1
+            elif next_class == FIELD_TOKEN_NOUN:
+                priority = 2
+            elif self.field_suffix_pattern.search(tokens[i]):
+                priority = 3
+            else:
+                # Без контекста — только точная словоформа из газеттира
+                priority = 4
+            
+            field = None
+            for phrase, phrase_field in self.field_phrases.get(tokens[i], ()):
+                if tuple(tokens[i:i + len(phrase)]) == phrase:
+                    field = phrase_field
+                    break
+            candidates = [tokens[i]]
+            if next_class == FIELD_TOKEN_WORD:
+                candidates.insert(0, f"{tokens[i]} {tokens[i + 1]}")
+            for candidate in candidates:
+                if field is not None:
+                    break
+                # Токены уже в нижнем регистре: ключ нужен только для ё, дефисов и пробелов
+                field = self.inflection_index.get(candidate)
+                if field is None and ("ё" in candidate or not candidate.isalpha()):
+                    field = self.inflection_index.get(gazetteer_key(candidate))
+            if field is not None:
+                if best is None or (priority, i) < best[0]:
+                    best = ((priority, i), field)
+                if priority == 0:
+                    break
+            elif priority < 4 and token_class == FIELD_TOKEN_WORD:
+                unresolved.append(((priority, i), candidates))
         
-        for pattern, group_num in self.field_context_patterns:
-            matches = re.finditer(pattern, text_lower)
-            for match in matches:
-                candidate = match.group(group_num).strip()
-                
-                if len(candidate) < 3:
-                    continue
-                
-                if candidate in self.field_stop_words:
-                    continue
-                
-                if candidate in self.not_field_markers:
-                    continue
-                
-                if candidate.isdigit() or (candidate.replace('-', '').isdigit()):
-                    continue
-                
-                if candidate in self.month_words:
-                    continue
-                
-                print(f"Found field by context: '{candidate}'")
-                return candidate
+        # Опечатки: нечеткий поиск для лучших кандидатов, если они важнее найденного
+        unresolved.sort()
+        for rank, candidates in unresolved[:FIELD_FUZZY_CANDIDATES]:
+            if best is not None and rank > best[0]:
+                break
+            match = None
+            for candidate in candidates:
+                match = self.fuzzy_index.lookup(candidate)
+                if match:
+                    break
+            if match:
+                best = (rank, match.field)
+                break
         
-        return None
+        if best is not None:
+            field = best[1]
+        elif unresolved:
+            field = unresolved[0][1][-1]
+        else:
+            return None
+        print(f"Found field by context: '{field}'")
+        return field
     
     def determine_entity_order(self, text: str, entities: Dict[str, str]) -> Dict[str, str]:
         text_lower = text.lower()
@@ -402,6 +584,12 @@ class EntityParser:
         
         field_by_context = self.find_field_by_context(text)
         if field_by_context:
+            # Каноническое название, в том числе с опечаткой в кандидате
+            for candidate in [field_by_context] + field_by_context.split():
+                canonical = self._check_well_field_candidate(candidate)
+                if canonical:
+                    field_by_context = canonical
+                    break
             entities["WELL_FIELD"] = field_by_context
             print(f"Found well field by context: {field_by_context}")
         else:
@@ -491,17 +679,16 @@ class EntityParser:
     def _check_well_field_candidate(self, candidate: str) -> Optional[str]:
         candidate_lower = candidate.lower()
         
-        if candidate_lower in self.exact_map:
-            return self.exact_map[candidate_lower]
-        
-        suffixes = ['ое', 'ее', 'ая', 'яя']
-        for suffix in suffixes:
-            candidate_with_suffix = candidate_lower + suffix
-            if candidate_with_suffix in self.exact_map:
-                return self.exact_map[candidate_with_suffix]
+        field = lookup_well_field(self.inflection_index, candidate)
+        if field:
+            return field
         
         if candidate_lower in self.part_map:
             candidates = self.part_map[candidate_lower]
             return candidates[0] if candidates else None
         
+        match = self.fuzzy_index.lookup(candidate)
+        if match:
+            return match.field
+        
         return None
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+Нечеткий поиск по газеттиру месторождений (symmetric delete, как SymSpell).
+
+Опечатки распознавания речи и ввода («Ванкоркое», «Верхнее-Колвинское»)
+не находятся точным словарем и префиксами. Индекс строится один раз: для
+каждого ключа месторождения сохраняются все варианты с удалением до
+`max_distance` символов. Запрос порождает свои варианты удаления и находит
+кандидатов в словаре; расстояние до каждого кандидата проверяется
+Дамерау-Левенштейном (перестановка соседних букв — одна правка). Время
+поиска зависит от длины запроса, а не от размера газеттира.
+
+Ключ — название в нижнем регистре, ё заменена на е, без дефисов и пробелов:
+«Верхне-Колвинское» и «верхне колвинское» совпадают.
+
+Допустимое расстояние зависит от длины ключа (см. `allowed_distance`),
+чтобы короткие слова не совпадали с месторождениями случайно.
+
+Пример:
+    >>> gazetteer = FuzzyGazetteer(["Ванкорское"])
+    >>> gazetteer.lookup("Ванкоркое")
+    FuzzyMatch(field='Ванкорское', distance=1)
+"""
+import re
+from typing import Any, Iterable, Mapping, NamedTuple, Optional, Sequence
+
+_SEPARATORS = re.compile(r"[-\s]+")
+
+
+class FuzzyMatch(NamedTuple):
+    """
+    Результат нечеткого поиска.
+
+    Attributes:
+        field (str): Каноническое название месторождения.
+        distance (int): Расстояние правки между ключами запроса и названия.
+    """
+    field: str
+    distance: int
+
+
+def gazetteer_key(text: str) -> str:
+    """Ключ поиска: нижний регистр, ё -> е, без дефисов и пробелов."""
+    return _SEPARATORS.sub("", text.lower().replace("ё", "е"))
+
+
+def allowed_distance(key: str, max_distance: int) -> int:
+    """
+    Допустимое расстояние для ключа: 0 до 4 символов, 1 до 7, далее max_distance.
+    """
+    if len(key) < 4:
+        return 0
+    if len(key) < 8:
+        return min(1, max_distance)
+    return max_distance
+
+
+def _deletes(key: str, max_distance: int) -> set[str]:
+    variants = {key}
+    level = {key}
+    for _ in range(max_distance):
+        level = {word[:i] + word[i + 1:] for word in level if len(word) > 1 for i in range(len(word))}
+        variants |= level
+    return variants
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (optimal string alignment).
+
+    Считается только полоса шириной 2 * limit + 1 вокруг диагонали.
+
+    Returns:
+        int: Расстояние или limit + 1, если оно больше limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    width = len(b)
+    previous_previous: list[int] = []
+    previous = [j if j <= limit else over for j in range(width + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (width + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = over
+        for j in range(max(1, i - limit), min(width, i + limit) + 1):
+            value = previous[j - 1] if a[i - 1] == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and previous_previous[j - 2] + 1 < value:
+                value = previous_previous[j - 2] + 1
+            current[j] = min(value, over)
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous_previous, previous = previous, current
+    return previous[width]
+
+
+class FuzzyGazetteer:
+    """
+    Индекс месторождений для поиска с опечатками.
+
+    Варианты удаления хранятся как «вариант -> номера названий». Это может
+    быть словарь или таблица из снимка индексов (`core/registry/snapshot.py`),
+    отображенная в память, — см. `from_state`.
+
+    Args:
+        fields: Канонические названия месторождений.
+        max_distance: Максимальное расстояние правки.
+    """
+
+    def __init__(self, fields: Iterable[str], max_distance: int = 2):
+        self.max_distance = max_distance
+        self.fields: list[str] = []
+        self._keys: list[str] = []
+        self._exact: dict[str, int] = {}
+        self._deletes: Mapping[str, Sequence[int]] = {}
+        deletes: dict[str, list[int]] = {}
+        for field in fields:
+            key = gazetteer_key(field)
+            if not key or key in self._exact:
+                continue
+            self._exact[key] = len(self.fields)
+            self.fields.append(field)
+            self._keys.append(key)
+            for variant in _deletes(key, allowed_distance(key, max_distance)):
+                deletes.setdefault(variant, []).append(self._exact[key])
+        self._deletes = deletes
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any], deletes: Mapping[str, Sequence[int]]) -> 'FuzzyGazetteer':
+        """Индекс из сохраненного состояния (`to_state`) и таблицы вариантов удаления."""
+        gazetteer = cls.__new__(cls)
+        gazetteer.max_distance = state["max_distance"]
+        gazetteer.fields = state["fields"]
+        gazetteer._keys = [gazetteer_key(field) for field in gazetteer.fields]
+        gazetteer._exact = {key: index for index, key in enumerate(gazetteer._keys)}
+        gazetteer._deletes = deletes
+        return gazetteer
+
+    def to_state(self) -> dict[str, Any]:
+        """Состояние без таблицы вариантов удаления (она сохраняется отдельно, `deletes`)."""
+        return {"max_distance": self.max_distance, "fields": self.fields}
+
+    @property
+    def deletes(self) -> Mapping[str, Sequence[int]]:
+        return self._deletes
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def lookup(self, candidate: str, max_distance: int | None = None) -> Optional[FuzzyMatch]:
+        """
+        Находит ближайшее месторождение.
+
+        Args:
+            candidate: Слово или словосочетание из текста.
+            max_distance: Ограничение расстояния для вызывающего (не больше
+                расстояния индекса).
+
+        Returns:
+            FuzzyMatch | None: Ближайшее название и расстояние; при равенстве
+            расстояний — более близкое по длине и раньше стоящее в газеттире.
+        """
+        key = gazetteer_key(candidate)
+        if not key:
+            return None
+        index = self._exact.get(key)
+        if index is not None:
+            return FuzzyMatch(self.fields[index], 0)
+
+        limit = allowed_distance(key, self.max_distance if max_distance is None
+                                 else min(max_distance, self.max_distance))
+        if limit == 0:
+            return None
+        best: Optional[tuple[int, int, int]] = None
+        seen = set()
+        for variant in _deletes(key, limit):
+            for index in self._deletes.get(variant, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                field_key = self._keys[index]
+                distance = edit_distance(key, field_key, limit)
+                if distance > limit or distance > allowed_distance(field_key, self.max_distance):
+                    continue
+                rank = (distance, abs(len(field_key) - len(key)), index)
+                if best is None or rank < best:
+                    best = rank
+        if best is None:
+            return None
+        return FuzzyMatch(self.fields[best[2]], best[0])
@@ -1,38 +1,142 @@
 import re
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from itertools import product
+from typing import Mapping, Optional
+
+from ...registry.snapshot import get_snapshot
+from ....config.command_config import WELL_FIELDS
+from ....config.model_config import ModelConfig
+from .fuzzy_gazetteer import gazetteer_key
+
+# Окончания прилагательных всех родов, падежей и чисел
+HARD_ENDINGS = ("ый", "ой", "ая", "ое", "ые", "ого", "ому", "ым", "ом", "ую", "ых", "ыми", "ою")
+SOFT_ENDINGS = ("ий", "яя", "ее", "ие", "его", "ему", "им", "ем", "юю", "ей", "их", "ими", "ею")
+# Притяжательные на -ий с ь в косвенных формах: Щучье, Щучьего
+POSSESSIVE_ENDINGS = ("ий", "ья", "ье", "ьи", "ьего", "ьему", "ьим", "ьем", "ью", "ьей", "ьих", "ьими")
+# Названия в WELL_FIELDS в именительном падеже: прилагательное узнается по этим окончаниям
+NOMINATIVE_ENDINGS = ("ый", "ий", "ой", "ая", "яя", "ое", "ее", "ые", "ие", "ья", "ье", "ьи")
+NON_ADJECTIVES = {"месторождение"}
+
+# После г, к, х, ж, ш, ч, щ пишется и, а не ы; после шипящих безударное е вместо о
+VELARS = "гкх"
+SIBILANTS = "жшчщ"
+
+NOUN_FORMS = {
+    "участок": ("участок", "участка", "участку", "участком", "участке",
+                "участки", "участков", "участкам", "участками", "участках"),
+}
+
+
+def _adjective_forms(word: str) -> list[str]:
+    """Все формы прилагательного или [word], если это не прилагательное."""
+    if word in NON_ADJECTIVES:
+        return [word]
+    for ending in NOMINATIVE_ENDINGS:
+        if word.endswith(ending) and len(word) > len(ending) + 1:
+            stem = word[:-len(ending)]
+            break
+    else:
+        return [word]
+    if ending[0] == "ь":
+        endings = POSSESSIVE_ENDINGS
+    elif ending in SOFT_ENDINGS and stem[-1] not in VELARS + SIBILANTS:
+        endings = SOFT_ENDINGS
+    elif stem[-1] in VELARS:
+        endings = tuple(e.replace("ы", "и") for e in HARD_ENDINGS)
+    elif stem[-1] in SIBILANTS:
+        endings = tuple(e.replace("ы", "и") for e in HARD_ENDINGS) + ("ее", "его", "ему", "ей", "ем")
+    else:
+        endings = HARD_ENDINGS
+    return [word] + [stem + e for e in endings]
+
+
+def _word_forms(word: str) -> list[str]:
+    if word in NOUN_FORMS:
+        return list(NOUN_FORMS[word])
+    if "." in word or not word.isalpha() and "-" not in word:
+        return [word]
+    # В составных названиях склоняется последняя часть: Верхне-Колвинское
+    head, _, last = word.rpartition("-")
+    return [f"{head}-{form}" if head else form for form in _adjective_forms(last)]
+
+
+def inflected_forms(field: str) -> list[str]:
+    """
+    Падежные формы названия месторождения.
+
+    Склоняются прилагательные (все роды, падежи и числа, у составных через
+    дефис — последняя часть) и слово «участок»; остальные слова неизменны.
+    """
+    words = field.lower().split()
+    return [" ".join(forms) for forms in product(*(_word_forms(word) for word in words))]
+
+
+def build_inflection_index(fields: list[str]) -> dict[str, str]:
+    """
+    Словарь «форма -> каноническое название».
+
+    Каждая форма хранится в нижнем регистре как есть и под ключом
+    `gazetteer_key` (ё -> е, без дефисов и пробелов). Точное написание
+    важнее ключа: в WELL_FIELDS есть пары вроде «Озёрное»/«Озерное» и
+    «Верхнегрубешорское»/«Верхне-Грубешорское». При совпадении форм разных
+    месторождений приоритет у названия, затем у полной формы, затем у
+    формы одного первого слова многословного названия («Верхнеодесскому» ->
+    «Верхнеодесский участок»); внутри уровня — у стоящего раньше в списке.
+    """
+    levels = [[(field.lower(), field) for field in fields], [], []]
+    for field in fields:
+        levels[1].extend((form, field) for form in inflected_forms(field))
+        words = field.split()
+        if len(words) > 1:
+            forms = _adjective_forms(words[0].lower())
+            if len(forms) > 1:
+                levels[2].extend((form, field) for form in forms)
+
+    index: dict[str, str] = {}
+    for key_function in (str, gazetteer_key):
+        for level in levels:
+            for form, field in level:
+                index.setdefault(key_function(form), field)
+    return index
+
+
+@lru_cache(maxsize=1)
+def get_inflection_index() -> Mapping[str, str]:
+    """Индекс словоформ WELL_FIELDS: из снимка индексов или строится один раз на процесс."""
+    if ModelConfig.SNAPSHOT_ENABLED:
+        return get_snapshot()["well_fields"]["inflection_index"]
+    return build_inflection_index(WELL_FIELDS)
+
+
+def lookup_well_field(index: Mapping[str, str], text: str) -> Optional[str]:
+    """Поиск формы в индексе: сначала точное написание, затем ключ."""
+    text = text.strip().lower()
+    return index.get(text) or index.get(gazetteer_key(text))
 
 
 def normalize_well_field(well_field: Optional[str]) -> Optional[str]:
     """
-    Простой нормализатор для названия месторождения.
-    Заменяет окончания: ий, ая, ой, ому, ый на "ое".
-    
+    Каноническое название месторождения по любой его форме.
+
+    Ищется вся строка, затем каждое ее слово по отдельности
+    («ванкорском месторождении» -> «Ванкорское»).
+
     Args:
-        well_field: Название месторождения для нормализации
-        
+        well_field: Название месторождения в любом падеже
+
     Returns:
-        Нормализованное название или оригинал
+        Название из WELL_FIELDS или None, если месторождение не найдено
     """
     if not well_field or not isinstance(well_field, str):
-        return well_field
-    
-    if ' ' in well_field.strip():
-        return well_field
-    
-    word = well_field.strip()
-    word_lower = word.lower()
-    
-    endings_to_replace = ['ого', 'его', 'ому', 'ему', 'ым', 'им', 'ом', 'ем', 'ыми', 'ими', 'ой', 'ей', 'ые', 'ие', 'ых', 'их', 'ий', 'ый', 'ой', 'ая', 'яя', 'ое', 'ее', 'ии', 'ыи', 'ия', 'ья']
-    
-    for ending in endings_to_replace:
-        if word_lower.endswith(ending):
-            base = word[:-len(ending)]
-            normalized = base + 'ое'
-            
-            if word[0].isupper():
-                normalized = normalized[0].upper() + normalized[1:]
-            
-            print(f"Нормализация well_field: '{word}' -> '{normalized}'")
-            return normalized
-    
-    return word
\ No newline at end of file
+        return None
+
+    index = get_inflection_index()
+    field = lookup_well_field(index, well_field)
+    if field is None:
+        for word in re.split(r"\s+", well_field.strip()):
+            field = lookup_well_field(index, word)
+            if field is not None:
+                break
+    if field is not None and field != well_field:
+        print(f"Нормализация well_field: '{well_field}' -> '{field}'")
+    return field
@@ -1,6 +1,8 @@
 from typing import List, Dict
 from ...nlu.models.ner_model import NERModel
 from ...nlu.parsers.number_parser import NumberParser
+from ...monitoring.metrics import timed_stage
+from ...utils.deadline import Deadline
 
 
 class NERService:
@@ -12,23 +14,40 @@ class NERService:
         except Exception as e:
             print(f"Failed to load NER model: {e}")
     
-    def extract_entities(self, text: str) -> List[Dict[str, str]]:
+    def extract_entities(self, text: str, deadline: Deadline | None = None) -> List[Dict[str, str]]:
         preprocessed_text = self.number_parser.convert_text_numbers_to_digits(text)
         
         print(f"Original text: {text}")
         print(f"Preprocessed text: {preprocessed_text}")
         
         if self.ner_model:
-            predictions = self.ner_model.predict(preprocessed_text)
+            predictions = self.ner_model.predict(preprocessed_text, deadline=deadline)
             
-            predictions = self._post_process_predictions(predictions)
-            
-            predictions = self._semantic_post_processing(predictions, preprocessed_text)
+            with timed_stage("ner_post_processing"):
+                predictions = self._post_process_predictions(predictions)
+                
+                predictions = self._semantic_post_processing(predictions, preprocessed_text)
             
             return predictions
         else:
             return [{"token": word, "tag": "O"} for word in preprocessed_text.split()]
     
+    def extract_entities_batch(self, texts: List[str]) -> List[List[Dict[str, str]]]:
+        """Извлечение сущностей из нескольких текстов одним батчем модели."""
+        preprocessed_texts = [self.number_parser.convert_text_numbers_to_digits(text) for text in texts]
+        
+        if not self.ner_model:
+            return [[{"token": word, "tag": "O"} for word in text.split()] for text in preprocessed_texts]
+        
+        batch_predictions = self.ner_model.predict_batch(preprocessed_texts)
+        
+        results = []
+        with timed_stage("ner_post_processing"):
+            for predictions, preprocessed_text in zip(batch_predictions, preprocessed_texts):
+                predictions = self._post_process_predictions(predictions)
+                results.append(self._semantic_post_processing(predictions, preprocessed_text))
+        return results
+    
     def _post_process_predictions(self, predictions: List[Dict[str, str]]) -> List[Dict[str, str]]:
         result = []
         i = 0
@@ -1,9 +1,14 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from ...nlu.services.ner_service import NERService
 from ...nlu.parsers.entity_parser import EntityParser
 from ...nlu.parsers.number_parser import NumberParser
 from ...command.processor import CommandProcessor
+from ...command.session import SessionContext
+from ...monitoring.metrics import PROCESSING_PATH, timed_stage
+from ...monitoring.memory import memory_tracker
+from ...monitoring.profiler import profiler
+from ...utils.deadline import Deadline, DeadlineExceeded
 
 
 class NLUService:
@@ -13,33 +18,135 @@ class NLUService:
         self.number_parser = NumberParser()
         print(f"NLU Service initialized, NER model loaded: {self.ner_service.is_model_loaded()}")
     
-    def process_text(self, text: str, processor: CommandProcessor) -> Dict[str, Any]:
+    def process_text(self, text: str, processor: CommandProcessor, debug: bool = True,
+                     context: SessionContext | None = None,
+                     deadline: Deadline | None = None,
+                     complete_pending: bool = True) -> Dict[str, Any]:
+        """
+        Обработка текста команды: числа, NER, разбор команды.
+
+        При ошибке конвейера используется rule_based_processor. Истекший
+        дедлайн не подменяется правилами: DeadlineExceeded пробрасывается
+        вызывающему с названием стадии. Запрос может попасть в выборочный
+        профиль (core/monitoring/profiler.py) и в выборку учета памяти
+        (core/monitoring/memory.py).
+
+        complete_pending=False — вызывающий уже попробовал дозаполнить
+        незавершенную команду сессии (`complete_from_context`).
+        """
+        with profiler.profile_request(), memory_tracker.track_request():
+            return self._process_text(text, processor, debug=debug, context=context, deadline=deadline,
+                                      complete_pending=complete_pending)
+
+    def complete_from_context(self, text: str, processor: CommandProcessor,
+                              context: SessionContext | None, debug: bool = True) -> Dict[str, Any] | None:
+        """
+        Дозаполнение незавершенной команды сессии без NER.
+
+        Returns:
+            Команда или None, если у сессии нет незавершенной команды или
+            реплике нужен полный путь обработки
+        """
+        if context is None or not context.pending:
+            return None
+        with timed_stage("session_context"):
+            result = processor.complete_from_context(text, context, debug=debug)
+        if result is not None:
+            print(f"Completed pending command from session context: {context.session_id}")
+            PROCESSING_PATH.inc(path="session_context")
+        return result
+    
+    def _process_text(self, text: str, processor: CommandProcessor, debug: bool,
+                      context: SessionContext | None, deadline: Deadline | None,
+                      complete_pending: bool) -> Dict[str, Any]:
         try:
             print(f"\n=== NLU Processing ===")
             print(f"Input text: {text}")
             
-            preprocessed_text = self.number_parser.convert_text_numbers_to_digits(text)
+            if complete_pending:
+                result = self.complete_from_context(text, processor, context, debug=debug)
+                if result is not None:
+                    return result
+            
+            if deadline is not None:
+                deadline.check("number_parsing")
+            with timed_stage("number_parsing"):
+                preprocessed_text = self.number_parser.convert_text_numbers_to_digits(text)
             print(f"After number preprocessing: {preprocessed_text}")
             
-            ner_results = self.ner_service.extract_entities(preprocessed_text)
+            with timed_stage("ner"):
+                ner_results = self.ner_service.extract_entities(preprocessed_text, deadline=deadline)
             print(f"NER results: {ner_results}")
             
             well_name_tokens = [t for t in ner_results if "WELL_NAME" in t["tag"]]
             if well_name_tokens:
                 print(f"WELL_NAME tokens found: {well_name_tokens}")
             
-            result = processor.process_command(text, ner_results)
+            if deadline is not None:
+                deadline.check("command_processing")
+            with timed_stage("command_processing"):
+                result = processor.process_command(text, ner_results, debug=debug, context=context)
+            PROCESSING_PATH.inc(path="ner_model" if self.ner_service.is_model_loaded() else "no_model")
             
             if result.get("parameters") and result["parameters"].get("wellName") == "года":
                 print("WARNING: wellName is 'года' - likely incorrect!")
             
             return result
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Error in NLU processing: {e}")
-            result = processor.rule_based_processor(text)
+            with timed_stage("rule_based"):
+                result = processor.rule_based_processor(text, debug=debug, context=context)
+            PROCESSING_PATH.inc(path="rule_based")
             return result
     
+    def process_batch(self, texts: List[str], processor: CommandProcessor,
+                      debug: bool = False) -> List[Dict[str, Any]]:
+        """
+        Обработка нескольких текстов с одним прямым проходом NER модели.
+
+        Результат для каждого текста такой же, как у `process_text`; при ошибке
+        батча модели или отдельного текста (в том числе разбора чисел)
+        используется rule_based_processor. Текст, на котором упал разбор
+        чисел, в прямой проход модели не попадает.
+        """
+        preprocessed_texts: List[str | None] = []
+        with timed_stage("number_parsing"):
+            for text in texts:
+                try:
+                    preprocessed_texts.append(self.number_parser.convert_text_numbers_to_digits(text))
+                except Exception as e:
+                    print(f"Error in number preprocessing: {e}")
+                    preprocessed_texts.append(None)
+        
+        valid_texts = [text for text in preprocessed_texts if text is not None]
+        try:
+            with timed_stage("ner"):
+                valid_results = iter(self.ner_service.extract_entities_batch(valid_texts) if valid_texts else [])
+            batch_ner_results = [None if text is None else next(valid_results) for text in preprocessed_texts]
+        except Exception as e:
+            print(f"Error in batch NER processing: {e}")
+            batch_ner_results = [None] * len(texts)
+        
+        path = "ner_model" if self.ner_service.is_model_loaded() else "no_model"
+        results = []
+        for text, ner_results in zip(texts, batch_ner_results):
+            try:
+                if ner_results is None:
+                    raise RuntimeError("Number preprocessing or NER batch failed")
+                with timed_stage("command_processing"):
+                    result = processor.process_command(text, ner_results, debug=debug)
+                PROCESSING_PATH.inc(path=path)
+            except Exception as e:
+                print(f"Error in NLU processing: {e}")
+                with timed_stage("rule_based"):
+                    result = processor.rule_based_processor(text, debug=debug)
+                PROCESSING_PATH.inc(path="rule_based")
+            results.append(result)
+        return results
+    
     def extract_tokens(self, text: str) -> Dict[str, Any]:
         preprocessed_text = self.number_parser.convert_text_numbers_to_digits(text)
         ner_results = self.ner_service.extract_entities(preprocessed_text)
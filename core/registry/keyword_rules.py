@@ -0,0 +1,124 @@
+"""
+Определение модуля по ключевым словам, когда синонимы реестра не нашлись.
+
+Правила задаются в конфигурации (ModelConfig.MODULE_KEYWORDS_PATH,
+по умолчанию data/module_keywords.json) отдельными наборами для путей
+обработки: "fallback" — запасной путь после NER и синонимов, "rule_based" —
+обработка без модели. Набор — список правил в порядке приоритета:
+
+    {"module": "forms_input_engine", "keywords": ["форму", "ввод"],
+     "words": ["форму", "форма", "форме"]}
+
+- keywords — подстроки текста в нижнем регистре;
+- words — необязательно: модуль выбирается, только если в тексте есть одно
+  из этих слов целиком, иначе результат — модуль не определен;
+- module: null — исключение: текст с такими словами не относится ни к
+  какому модулю (например, «формула»).
+
+Побеждает правило с наивысшим приоритетом среди сработавших, как в цепочке
+if/elif. Все ключевые слова набора собраны в одно регулярное выражение
+(альтернатива в опережающей проверке, по приоритету), поэтому текст
+проходится один раз, включая перекрывающиеся вхождения.
+"""
+import json
+import re
+from typing import Any, NamedTuple, Optional
+
+
+class KeywordRule(NamedTuple):
+    """
+    Правило определения модуля.
+
+    Attributes:
+        module (str | None): Модуль или None для исключения.
+        keywords (tuple[str, ...]): Подстроки, при которых правило срабатывает.
+        words (frozenset[str]): Слова, одно из которых должно быть в тексте
+            целиком; пусто — не проверяется.
+    """
+    module: Optional[str]
+    keywords: tuple[str, ...]
+    words: frozenset[str]
+
+
+class KeywordMatcher:
+    """
+    Набор правил, скомпилированный в один многошаблонный поиск.
+
+    Args:
+        rules: Правила в порядке приоритета (формат конфигурации).
+    """
+
+    def __init__(self, rules: list[dict[str, Any]]):
+        self.rules = [
+            KeywordRule(
+                rule.get("module"),
+                tuple(keyword.lower() for keyword in rule["keywords"]),
+                frozenset(word.lower() for word in rule.get("words", ()))
+            )
+            for rule in rules
+        ]
+        self._priorities: dict[str, int] = {}
+        for priority, rule in enumerate(self.rules):
+            for keyword in rule.keywords:
+                self._priorities.setdefault(keyword, priority)
+        # В одной позиции текста выигрывает первая альтернатива, поэтому они упорядочены по приоритету
+        keywords = sorted(self._priorities, key=self._priorities.get)
+        self._pattern = re.compile(f"(?=({'|'.join(map(re.escape, keywords))}))") if keywords else None
+
+    def match(self, text_lower: str) -> Optional[tuple[KeywordRule, str]]:
+        """
+        Сработавшее правило с наивысшим приоритетом.
+
+        Returns:
+            tuple | None: Правило и найденное ключевое слово.
+        """
+        if self._pattern is None:
+            return None
+        best_priority = len(self.rules)
+        best_keyword = None
+        for found in self._pattern.finditer(text_lower):
+            keyword = found.group(1)
+            priority = self._priorities[keyword]
+            if priority < best_priority:
+                best_priority, best_keyword = priority, keyword
+                if priority == 0:
+                    break
+        if best_keyword is None:
+            return None
+        return self.rules[best_priority], best_keyword
+
+    def detect(self, text_lower: str) -> Optional[str]:
+        """
+        Модуль по ключевым словам.
+
+        Args:
+            text_lower: Текст в нижнем регистре.
+
+        Returns:
+            str | None: Идентификатор модуля или None.
+        """
+        matched = self.match(text_lower)
+        if matched is None:
+            return None
+        rule, keyword = matched
+        if rule.module is None:
+            print(f"Found exception keyword: '{keyword}', returning UNKNOWN")
+            return None
+        if rule.words and rule.words.isdisjoint(text_lower.split()):
+            return None
+        return rule.module
+
+
+def load_keyword_rules(path: str) -> dict[str, KeywordMatcher]:
+    """
+    Загружает наборы правил из JSON-файла.
+
+    Args:
+        path: Путь к файлу {"<набор>": [правила, ...]}.
+
+    Returns:
+        dict[str, KeywordMatcher]: Имя набора -> скомпилированные правила.
+    """
+    with open(path, encoding="utf-8") as f:
+        rule_sets = json.load(f)
+    return {name: KeywordMatcher(rules) for name, rules in rule_sets.items()}
@@ -3,23 +3,35 @@ import os
 from typing import Any
 from pathlib import Path
 
+from .slots import SlotValidator, compile_slot_validators
+from .synonyms import build_synonym_index
 from ...config.model_config import ModelConfig
 
 
 class KnowledgeBase:
-    def __init__(self):
+    def __init__(self, use_snapshot: bool = True):
         self.registry = {}
         self.target_synonyms = {}
+        self.slot_validators = {}
+        self.use_snapshot = use_snapshot and ModelConfig.SNAPSHOT_ENABLED
         self.load_registry()
 
     def load_registry(self) -> None:
-        registry_path = ModelConfig.REGISTRY_PATH
-        if os.path.exists(registry_path):
-            with open(registry_path, 'r', encoding='utf-8') as f:
-                self.registry = json.load(f)
+        if self.use_snapshot:
+            # Снимок сам собирается через KnowledgeBase(use_snapshot=False)
+            from .snapshot import get_snapshot
+            snapshot = get_snapshot()
+            self.registry = snapshot["registry"]
+            self.target_synonyms = snapshot["synonyms"]
         else:
-            self.registry = self.get_default_registry()
-        self.target_synonyms = self.extract_synonyms_from_registry()
+            registry_path = ModelConfig.REGISTRY_PATH
+            if os.path.exists(registry_path):
+                with open(registry_path, 'r', encoding='utf-8') as f:
+                    self.registry = json.load(f)
+            else:
+                self.registry = self.get_default_registry()
+            self.target_synonyms = self.extract_synonyms_from_registry()
+        self.slot_validators = compile_slot_validators(self.registry)
 
     def get_default_registry(self) -> dict[str, Any]:
         registry_path = Path("../data/registry.json")
@@ -29,56 +41,15 @@ class KnowledgeBase:
             return json.load(f)
 
     def extract_synonyms_from_registry(self) -> dict[str, list]:
-        synonyms = {
-        "Ois.Modules.chessy.ChessyModule": ["шахматка", "шахматку"],
-        "10054": ["редактор слушателей очередей"],
-        "10037": ["аудит-данные", "аудит - данные", "аудит данные", "аудит данных"],
-        "10038": ["аудит - лог приложения", "аудит лог приложения", "аудит логи приложения", "аудит лог", "аудит логи"],
-        "10039": ["аудит - лог расчетов", "аудит лог расчетов", "аудит логи расчетов", "лог расчетов аудита", "логи расчетов аудита"],
-        "10040": ["аудит структура вд", "аудит структуру вд"],
-        "10041": ["аудит - события", "аудит события", "аудит событий"],
-        "10031": ["информация о системе", "информацию о системе"],
-        "10042": ["брокеры очередей"],
-        "10043": ["потоковая загрузка", "потоковую загрузку"],
-        "10044": ["репликация данных", "репликацию данных"],
-        "10045": ["параметры контекста"],
-        "10046": ["службы"],
-        "10048": ["экспорт"],
-        "10050": ["редактор форматов отчетов"],
-        "10052": ["редактор меню"],
-        "10056": ["редактор процессов"],
-        "10058": ["редактор типов данных"],
-        "10060": ["редактор вд"],
-        "10062": ["настройка уведомлений", "настройки уведомлений"],
-        "10064": ["формы"],
-        "forms_input_engine": ["движок форм", "формы ввода", "движок форм ввода"],
-        "reporting_engine": ["движок отчетности", "отчетность"],
-        "wells_registry": ["реестр скважин", "реестр объектов", "реестр"],
-        "nsi": ["нси", "нс и"],
-        "fund_maintenance": ["ведение фонда", "фонд"],
-        "run_or_stop": ["запуски-остановки", "запуски", "остановки"],
-        "mode_output": ["вывод на режим", "режим"],
-        "volume_balance": ["баланс объемов", "баланс"],
-        "standalone_report": ["отчет", "отчёты", "сводка", "доклад", "аудит"],
-        "well_construction": [
-            "конструкция",
-            "конструкцию",
-            "конструкция скважины",
-            "конструкцию скважины",
-            "данные по конструкции",
-            "схема конструкции",
-            "схему конструкции"
-        ],
-        "annual_planning": ["годовое планирование", "планирование"],
-        "wellhead_survey": ["обследование устьев", "устья скважин"],
-        "technological_mode": ["технологический режим", "тех режим"],
-        "measurements_verification": ["верификация замеров", "верификация"],
-        }
-        return synonyms
+        """Синонимы модулей из поля "synonyms" реестра с падежными и орфографическими вариантами."""
+        return build_synonym_index(self.registry)
 
     def get_module_info(self, module_id: str) -> dict[str, Any]:
         return self.registry.get(module_id, {})
 
+    def get_slot_validator(self, module_id: str) -> SlotValidator | None:
+        return self.slot_validators.get(module_id)
+
     def find_module_by_synonym(self, target_text: str) -> str | None:
         target_text = target_text.lower()
         for module_id, synonyms in self.target_synonyms.items():
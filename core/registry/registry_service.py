@@ -1,6 +1,7 @@
 from typing import Any
 
 from .knowledge_base import KnowledgeBase
+from .slots import SlotValidator
 
 
 class RegistryService:
@@ -16,6 +17,9 @@ class RegistryService:
     def get_module_registry(self, module_id: str) -> dict[str, Any]:
         return self.knowledge_base.get_module_info(module_id)
 
+    def get_slot_validator(self, module_id: str) -> SlotValidator | None:
+        return self.knowledge_base.get_slot_validator(module_id)
+
     def get_command_template(self, module_id: str) -> dict[str, Any]:
         module_info = self.get_module_registry(module_id)
         if module_info:
@@ -0,0 +1,110 @@
+"""
+Проверка слотов модулей реестра.
+
+Спецификации слотов модулей («slots» в реестре) компилируются при загрузке
+реестра в `SlotValidator`: битовая маска обязательных слотов и отображение
+слотов на параметры команды. NER и rule-based пути обработки проверяют
+команду одним сравнением масок: маска заполненных параметров команды
+считается один раз и сравнивается с маской модуля.
+
+Новый тип слота добавляется в `SLOT_TYPES`: имя слота в реестре, параметр
+команды, значение по умолчанию и проверка заполненности. Слоты реестра без
+типа (например, REPORT_NAME) не проверяются.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+@dataclass(frozen=True)
+class SlotType:
+    """
+    Тип слота.
+
+    Attributes:
+        name (str): Имя слота в реестре.
+        parameter (str): Параметр команды.
+        default (Callable[[], Any]): Значение параметра по умолчанию.
+        is_filled (Callable[[Any], bool]): Заполнен ли параметр.
+    """
+    name: str
+    parameter: str
+    default: Callable[[], Any]
+    is_filled: Callable[[Any], bool]
+
+
+SLOT_TYPES = (
+    SlotType("WELL_FIELD", "wellField", str, bool),
+    SlotType("WELL_NAME", "wellName", str, bool),
+    SlotType("PERIOD", "period", lambda: {"start": "", "end": ""},
+             lambda period: bool(period.get("start") and period.get("end"))),
+)
+SLOT_BITS = {slot_type.name: 1 << bit for bit, slot_type in enumerate(SLOT_TYPES)}
+_SLOT_CHECKS = tuple((1 << bit, slot_type.parameter, slot_type.is_filled)
+                     for bit, slot_type in enumerate(SLOT_TYPES))
+_MISSING = object()
+_SLOT_DEFAULTS = tuple((slot_type.parameter, slot_type.default) for slot_type in SLOT_TYPES)
+
+
+def filled_mask(parameters: dict[str, Any], checks=_SLOT_CHECKS) -> int:
+    """Битовая маска заполненных параметров команды (по умолчанию — всех типов слотов)."""
+    mask = 0
+    for bit, parameter, is_filled in checks:
+        value = parameters.get(parameter)
+        if value and is_filled(value):
+            mask |= bit
+    return mask
+
+
+class SlotValidator:
+    """
+    Слоты модуля, скомпилированные из реестра.
+
+    Attributes:
+        module_id (str): Идентификатор модуля.
+        has_slots (bool): У модуля есть слоты (команда получает параметры).
+        required_mask (int): Маска обязательных слотов известных типов.
+    """
+    __slots__ = ("module_id", "has_slots", "required_mask", "_required_checks")
+
+    def __init__(self, module_id: str, slots: dict[str, Any]):
+        self.module_id = module_id
+        self.has_slots = bool(slots)
+        self.required_mask = 0
+        for name, spec in slots.items():
+            if spec.get("required", False) and name in SLOT_BITS:
+                self.required_mask |= SLOT_BITS[name]
+        # Заполненность проверяется только у обязательных типов
+        self._required_checks = tuple(check for check in _SLOT_CHECKS if check[0] & self.required_mask)
+
+    @staticmethod
+    def build_parameters(parameters: dict[str, Any]) -> dict[str, Any]:
+        """Параметры всех типов слотов из найденных; недостающие — по умолчанию."""
+        built = {}
+        for parameter, default in _SLOT_DEFAULTS:
+            value = parameters.get(parameter, _MISSING)
+            built[parameter] = default() if value is _MISSING else value
+        return built
+
+    def is_complete(self, parameters: dict[str, Any]) -> bool:
+        """Заполнены ли все обязательные слоты."""
+        return filled_mask(parameters, self._required_checks) == self.required_mask
+
+
+def compile_slot_validators(registry: dict[str, Any]) -> dict[str, SlotValidator]:
+    """
+    Валидаторы слотов всех модулей реестра.
+
+    Args:
+        registry: Реестр модулей.
+
+    Returns:
+        dict[str, SlotValidator]: Идентификатор модуля -> валидатор.
+    """
+    validators = {}
+    for module_id, module in registry.items():
+        slots = module.get("slots") or {}
+        unknown = [name for name in slots if name not in SLOT_BITS]
+        if unknown:
+            print(f"Slots without a type are not validated in {module_id}: {', '.join(unknown)}")
+        validators[module_id] = SlotValidator(module_id, slots)
+    return validators
@@ -0,0 +1,325 @@
+"""
+Снимок индексов реестра и газеттиров для быстрого старта.
+
+При старте без снимка каждый воркер заново читает реестр, строит синонимы
+модулей и индексы месторождений `EntityParser` (префиксы, части названий,
+словоформы, многословные названия, варианты удаления нечеткого поиска).
+Снимок собирает все это один раз в бинарный файл:
+
+    заголовок | оглавление (JSON) | секции
+
+Секции выровнены по 8 байт. Реестр, синонимы, префиксы, словоформы и
+многословные названия хранятся в одной pickle-секции: по ним идет поиск на
+каждом запросе, поэтому они загружаются в обычные словари. Самая большая
+таблица — варианты удаления нечеткого индекса (десятки тысяч строк, нужна
+только на промахах точного поиска) — хранится как хеш-таблица с открытой
+адресацией и читается прямо из отображенного в память файла
+(`MappedTable`), без десериализации; в pre-fork режиме ее страницы
+разделяются между воркерами.
+
+В оглавлении записан sha256 исходников: реестра, `config/command_config.py`
+и модулей, которые строят индексы. Если исходники изменились, снимок
+пересобирается при первом обращении и атомарно заменяется.
+
+Сборка вручную:
+    python -m app.core.registry.snapshot [--check]
+"""
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+import zlib
+from array import array
+from functools import lru_cache
+from typing import Any, Iterator, Mapping, Sequence
+
+from ...config import command_config
+from ...config.model_config import ModelConfig
+
+SNAPSHOT_VERSION = 1
+MAGIC = b"NLUSNAP\0"
+# MAGIC, версия, длина оглавления
+HEADER = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _hash(data: bytes) -> int:
+    return zlib.crc32(data)
+
+
+def build_table(items: Mapping[str, Sequence[int]]) -> bytes:
+    """
+    Сериализует «строка -> номера» в хеш-таблицу для `MappedTable`.
+
+    Формат (uint32, little-endian): число слотов, записей и номеров, слоты
+    (номер записи + 1, 0 — пусто), записи (смещение и длина ключа, смещение
+    и длина номеров), номера; затем UTF-8 ключи подряд.
+    """
+    entries = list(items.items())
+    slot_count = 1
+    while slot_count < len(entries) * 2:
+        slot_count *= 2
+    mask = slot_count - 1
+    slots = array("I", [0]) * slot_count
+    records = array("I")
+    postings = array("I")
+    keys = bytearray()
+    for number, (key, values) in enumerate(entries):
+        encoded = key.encode("utf-8")
+        records.extend((len(keys), len(encoded), len(postings), len(values)))
+        keys += encoded
+        postings.extend(values)
+        slot = _hash(encoded) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = number + 1
+    header = array("I", (slot_count, len(entries), len(postings)))
+    for part in (header, slots, records, postings):
+        if sys.byteorder != "little":
+            part.byteswap()
+    return header.tobytes() + slots.tobytes() + records.tobytes() + postings.tobytes() + bytes(keys)
+
+
+class MappedTable(Mapping[str, tuple[int, ...]]):
+    """
+    Таблица «строка -> номера» поверх буфера (обычно отображенного файла).
+
+    Поиск — crc32 ключа и линейное пробирование; буфер не копируется.
+    """
+
+    def __init__(self, buffer: memoryview):
+        slot_count, entry_count, posting_count = struct.unpack_from("<III", buffer, 0)
+        offset = 12
+        self._mask = slot_count - 1
+        self._slots = buffer[offset:offset + slot_count * 4].cast("I")
+        offset += slot_count * 4
+        self._records = buffer[offset:offset + entry_count * 16].cast("I")
+        offset += entry_count * 16
+        self._postings = buffer[offset:offset + posting_count * 4].cast("I")
+        self._keys = buffer[offset + posting_count * 4:]
+        self._count = entry_count
+
+    def _find(self, key: str) -> int:
+        encoded = key.encode("utf-8")
+        slot = _hash(encoded) & self._mask
+        while True:
+            number = self._slots[slot]
+            if not number:
+                return -1
+            record = (number - 1) * 4
+            key_offset = self._records[record]
+            key_length = self._records[record + 1]
+            if key_length == len(encoded) and self._keys[key_offset:key_offset + key_length] == encoded:
+                return record
+            slot = (slot + 1) & self._mask
+
+    def get(self, key: str, default: Any = None) -> Any:
+        record = self._find(key)
+        if record < 0:
+            return default
+        start = self._records[record + 2]
+        return tuple(self._postings[start:start + self._records[record + 3]])
+
+    def __getitem__(self, key: str) -> tuple[int, ...]:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for number in range(self._count):
+            offset, length = self._records[number * 4], self._records[number * 4 + 1]
+            yield bytes(self._keys[offset:offset + length]).decode("utf-8")
+
+
+def source_files() -> list[str]:
+    """Файлы, от которых зависит содержимое снимка."""
+    from ..nlu.parsers import entity_parser, fuzzy_gazetteer, well_field_normalizer
+    from . import knowledge_base, synonyms
+    return [
+        ModelConfig.REGISTRY_PATH,
+        command_config.__file__,
+        knowledge_base.__file__,
+        synonyms.__file__,
+        entity_parser.__file__,
+        fuzzy_gazetteer.__file__,
+        well_field_normalizer.__file__,
+        __file__,
+    ]
+
+
+def source_hash() -> str:
+    digest = hashlib.sha256(f"{SNAPSHOT_VERSION}:{sys.version_info[:2]}".encode())
+    for path in source_files():
+        digest.update(os.path.basename(path).encode())
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"\0missing")
+    return digest.hexdigest()
+
+
+def build_snapshot() -> dict[str, Any]:
+    """
+    Строит все индексы из исходников.
+
+    Returns:
+        dict: registry, synonyms (KnowledgeBase) и well_fields — состояние
+        индексов EntityParser для WELL_FIELDS.
+    """
+    from ..nlu.parsers.entity_parser import EntityParser
+    from .knowledge_base import KnowledgeBase
+
+    knowledge_base = KnowledgeBase(use_snapshot=False)
+    entity_parser = EntityParser(well_fields=list(command_config.WELL_FIELDS))
+    return {
+        "registry": knowledge_base.registry,
+        "synonyms": knowledge_base.target_synonyms,
+        "well_fields": entity_parser.get_search_state(),
+    }
+
+
+def write_snapshot(path: str, data: dict[str, Any], digest: str) -> int:
+    """
+    Записывает снимок атомарно (временный файл и os.replace).
+
+    Returns:
+        int: Размер файла в байтах.
+    """
+    well_fields = data["well_fields"]
+    sections = {
+        "objects": pickle.dumps({
+            "registry": data["registry"],
+            "synonyms": data["synonyms"],
+            "well_fields": {key: value for key, value in well_fields.items() if key != "fuzzy_deletes"},
+        }, protocol=pickle.HIGHEST_PROTOCOL),
+        "fuzzy_deletes": build_table(well_fields["fuzzy_deletes"]),
+    }
+
+    toc: dict[str, Any] = {"version": SNAPSHOT_VERSION, "source_hash": digest, "sections": {}}
+    # Оглавление зависит от смещений, смещения — от длины оглавления: резервируем место
+    toc_size = 1024
+    offset = _align(HEADER.size + toc_size)
+    for name, payload in sections.items():
+        toc["sections"][name] = [offset, len(payload)]
+        offset = _align(offset + len(payload))
+    toc_bytes = json.dumps(toc).encode("utf-8")
+    if len(toc_bytes) > toc_size:
+        raise ValueError("Snapshot table of contents is too large")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(toc_bytes)))
+        f.write(toc_bytes)
+        for name, payload in sections.items():
+            f.write(b"\0" * (toc["sections"][name][0] - f.tell()))
+            f.write(payload)
+        size = f.tell()
+    os.replace(temporary, path)
+    return size
+
+
+def read_snapshot(path: str, digest: str | None = None) -> dict[str, Any] | None:
+    """
+    Открывает снимок через mmap.
+
+    Args:
+        path: Путь к снимку.
+        digest: Ожидаемый хеш исходников; None — не проверять.
+
+    Returns:
+        dict | None: Данные в формате `build_snapshot` (варианты удаления —
+        MappedTable) или None, если снимка нет, он другой
+        версии, устарел или не читается.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    buffer = memoryview(mapped)
+    try:
+        magic, version, toc_length = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        toc = json.loads(bytes(buffer[HEADER.size:HEADER.size + toc_length]))
+        if digest is not None and toc["source_hash"] != digest:
+            return None
+
+        def section(name: str) -> memoryview:
+            offset, length = toc["sections"][name]
+            return buffer[offset:offset + length]
+
+        objects = pickle.load(io.BytesIO(section("objects")))
+        well_fields = objects["well_fields"]
+        well_fields["fuzzy_deletes"] = MappedTable(section("fuzzy_deletes"))
+        return {"registry": objects["registry"], "synonyms": objects["synonyms"], "well_fields": well_fields}
+    except Exception as e:  # pylint: disable=broad-except
+        # Поврежденный pickle может упасть чем угодно; снимок тогда пересобирается
+        print(f"Snapshot {path} is unreadable: {type(e).__name__}: {e}")
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_snapshot() -> dict[str, Any]:
+    """
+    Индексы для текущего процесса: из снимка, если он актуален, иначе
+    построенные заново (и записанные в снимок).
+    """
+    started = time.perf_counter()
+    digest = source_hash()
+    path = ModelConfig.SNAPSHOT_PATH
+    data = read_snapshot(path, digest)
+    if data is not None:
+        print(f"Index snapshot loaded from {path} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return data
+
+    data = build_snapshot()
+    try:
+        size = write_snapshot(path, data, digest)
+    except OSError as e:
+        print(f"Index snapshot not written to {path}: {e}")
+        return data
+    mapped = read_snapshot(path, digest)
+    print(f"Index snapshot rebuilt: {path}, {size / 1024:.0f} KB "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return mapped if mapped is not None else data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the registry and gazetteer index snapshot")
+    parser.add_argument("--output", default=ModelConfig.SNAPSHOT_PATH)
+    parser.add_argument("--check", action="store_true", help="Only check that the snapshot is up to date")
+    args = parser.parse_args()
+
+    digest = source_hash()
+    if args.check:
+        up_to_date = read_snapshot(args.output, digest) is not None
+        print(f"{args.output}: {'up to date' if up_to_date else 'missing or stale'}")
+        raise SystemExit(0 if up_to_date else 1)
+
+    started = time.perf_counter()
+    size = write_snapshot(args.output, build_snapshot(), digest)
+    print(f"Snapshot written to {args.output}: {size / 1024:.0f} KB in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
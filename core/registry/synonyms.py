@@ -0,0 +1,166 @@
+"""
+Синонимы модулей из реестра.
+
+Синонимы задаются в реестре полем "synonyms" модуля — в начальной форме
+(«шахматка», «репликация данных») и при необходимости устойчивыми
+вариантами («тех режим»). При загрузке реестра для каждого синонима
+порождаются варианты:
+
+- падежные формы единственного числа вершины словосочетания и
+  согласованных с ней прилагательных перед ней («годовое планирование» ->
+  «годовым планированием»; «репликация данных» -> «репликацию данных»);
+  слова после вершины не меняются;
+- написания через дефис, дефис с пробелами и пробел («аудит-данные»,
+  «аудит - данные», «аудит данные»);
+- написание с е вместо ё.
+
+Склоняются существительные на -а, -я, -ия, -ие, -о и на согласный
+(с беглой о в -ок);
+множественное число, аббревиатуры и слова на -ь остаются как есть — их
+формы при необходимости перечисляются в реестре явно.
+
+Изменение синонимов — правка реестра и пересборка индекса (снимок
+`core/registry/snapshot.py` пересобирается сам), а не новая сборка образа.
+"""
+import re
+from typing import Any
+
+# Падежи единственного числа: именительный, родительный, дательный,
+# винительный, творительный, предложный
+CASES = 6
+ADJECTIVE_ENDINGS = {
+    "masculine": ("ый", "ого", "ому", "ый", "ым", "ом"),
+    "feminine": ("ая", "ой", "ой", "ую", "ой", "ой"),
+    "neuter": ("ое", "ого", "ому", "ое", "ым", "ом"),
+}
+SOFT_ADJECTIVE_ENDINGS = {
+    "masculine": ("ий", "его", "ему", "ий", "им", "ем"),
+    "feminine": ("яя", "ей", "ей", "юю", "ей", "ей"),
+    "neuter": ("ее", "его", "ему", "ее", "им", "ем"),
+}
+ADJECTIVE_GENDERS = {
+    "ый": "masculine", "ой": "masculine", "ий": "masculine",
+    "ая": "feminine", "яя": "feminine",
+    "ое": "neuter", "ее": "neuter",
+}
+# Окончание начальной формы -> род и падежные окончания
+NOUN_ENDINGS = (
+    ("ия", "feminine", ("ия", "ии", "ии", "ию", "ией", "ии")),
+    ("ие", "neuter", ("ие", "ия", "ию", "ие", "ием", "ии")),
+    ("а", "feminine", ("а", "ы", "е", "у", "ой", "е")),
+    ("я", "feminine", ("я", "и", "е", "ю", "ей", "е")),
+    ("о", "neuter", ("о", "а", "у", "о", "ом", "е")),
+)
+CONSONANT_ENDINGS = ("", "а", "у", "", "ом", "е")
+# После г, к, х, ж, ш, ч, щ пишется и, а не ы
+VELARS_AND_SIBILANTS = "гкхжшчщ"
+VOWELS = "аеёиоуыэюя"
+MIN_DECLINED_LENGTH = 4
+
+
+def _fix_spelling(stem: str, ending: str) -> str:
+    if ending.startswith("ы") and stem[-1:] in VELARS_AND_SIBILANTS:
+        ending = "и" + ending[1:]
+    return stem + ending
+
+
+def _adjective_cases(word: str) -> tuple[str, tuple[str, ...]] | None:
+    """Род и падежные формы прилагательного или None, если это не прилагательное."""
+    gender = ADJECTIVE_GENDERS.get(word[-2:])
+    if gender is None or len(word) < MIN_DECLINED_LENGTH:
+        return None
+    stem = word[:-2]
+    soft = word[-2:] in ("яя", "ее") or (word.endswith("ий") and stem[-1] not in VELARS_AND_SIBILANTS)
+    endings = (SOFT_ADJECTIVE_ENDINGS if soft else ADJECTIVE_ENDINGS)[gender]
+    return gender, tuple(_fix_spelling(stem, ending) for ending in endings)
+
+
+def _noun_cases(word: str) -> tuple[str, tuple[str, ...]] | None:
+    """Род и падежные формы существительного или None, если оно не склоняется."""
+    if len(word) < MIN_DECLINED_LENGTH or not word.isalpha() or not set(word) & set(VOWELS):
+        return None
+    for suffix, gender, endings in NOUN_ENDINGS:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            return gender, tuple(_fix_spelling(stem, ending) for ending in endings)
+    if word[-1] not in VOWELS + "ьй":
+        # Беглая гласная: движок -> движка
+        stem = word[:-2] + word[-1] if word.endswith("ок") and word[-3] not in VOWELS else word
+        return "masculine", tuple((word if not ending else stem) + ending for ending in CONSONANT_ENDINGS)
+    return None
+
+
+def case_forms(synonym: str) -> list[str]:
+    """
+    Падежные формы синонима: вершина — первое слово, не похожее на
+    прилагательное; прилагательные перед ней согласуются с ней по роду.
+    """
+    words = synonym.split()
+    head = 0
+    while head < len(words) - 1 and _adjective_cases(words[head]) is not None:
+        head += 1
+    noun = _noun_cases(words[head])
+    if noun is None:
+        return [synonym]
+    gender, noun_forms = noun
+
+    adjective_forms = []
+    for word in words[:head]:
+        stem_gender, forms = _adjective_cases(word)
+        if stem_gender != gender:
+            return [synonym]
+        adjective_forms.append(forms)
+
+    variants = [synonym]
+    for case in range(CASES):
+        phrase = [forms[case] for forms in adjective_forms] + [noun_forms[case]] + words[head + 1:]
+        variants.append(" ".join(phrase))
+    return list(dict.fromkeys(variants))
+
+
+def spelling_variants(synonym: str) -> list[str]:
+    """Написания с дефисом, дефисом с пробелами и пробелом; е вместо ё."""
+    parts = re.split(r"\s*-\s*", synonym)
+    variants = [synonym]
+    if len(parts) > 1:
+        variants.extend(separator.join(parts) for separator in ("-", " - ", " "))
+    variants.extend([variant.replace("ё", "е") for variant in variants])
+    return list(dict.fromkeys(variants))
+
+
+def synonym_variants(synonym: str) -> list[str]:
+    """
+    Все варианты синонима в нижнем регистре, начиная с него самого.
+    """
+    synonym = " ".join(synonym.lower().split())
+    variants = []
+    for spelling in spelling_variants(synonym):
+        # Составные через дефис («запуски-остановки») не склоняются
+        variants.extend([spelling] if "-" in spelling else case_forms(spelling))
+    return list(dict.fromkeys(variants))
+
+
+def build_synonym_index(registry: dict[str, Any]) -> dict[str, list[str]]:
+    """
+    Синонимы модулей с вариантами в порядке модулей реестра.
+
+    Вариант, совпавший у нескольких модулей, остается у первого из них.
+
+    Args:
+        registry: Реестр модулей; синонимы — поле "synonyms" модуля.
+
+    Returns:
+        dict[str, list[str]]: Идентификатор модуля -> варианты синонимов.
+    """
+    index = {}
+    seen = set()
+    for module_id, module in registry.items():
+        variants = []
+        for synonym in module.get("synonyms", []):
+            for variant in synonym_variants(synonym):
+                if variant not in seen:
+                    seen.add(variant)
+                    variants.append(variant)
+        if variants:
+            index[module_id] = variants
+    return index
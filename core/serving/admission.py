@@ -0,0 +1,185 @@
+"""
+Контроль допуска запросов к NER модели и сброс нагрузки.
+
+Обработка запросов с моделью выполняется в отдельном пуле потоков не более
+чем `concurrency` одновременно, остальные ждут в очереди. Перед постановкой
+в очередь запрос проходит контроль допуска: если очередь заполнена или
+оценка ожидания (длина очереди * среднее время обработки / concurrency)
+превышает бюджет задержки, запрос обслуживается правилами
+(`CommandProcessor.rule_based_processor`) без модели и помечается как
+деградированный. Так при всплесках нагрузки очередь не растет без предела
+и запросы не истекают все разом.
+
+Среднее время обработки — экспоненциальное скользящее среднее по
+завершенным запросам. Через ту же очередь идут батчи пакетной обработки
+(core/serving/bulk.py): батч весит как `cost` запросов, поэтому предел
+concurrency общий, а оценка ожидания учитывает пакетную нагрузку.
+
+Ожидание в очереди записывается стадией "queue_wait" (гистограмма стадий
+в /metrics и Server-Timing), в том числе когда дедлайн истек в очереди.
+
+Если у запроса есть дедлайн, бюджетом служит оставшееся до него время, а
+ожидание в очереди ограничено дедлайном. Отмена ожидающего запроса (клиент
+отключился) убирает его из очереди.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from ...config.model_config import ModelConfig
+from ..monitoring.metrics import (ADMISSION_ESTIMATED_WAIT, ADMISSION_QUEUE_DEPTH,
+                                  DEADLINE_EXCEEDED, LOAD_SHED, record_stage)
+from ..utils.deadline import Deadline, DeadlineExceeded
+
+# Вес нового замера в скользящем среднем времени обработки
+EWMA_ALPHA = 0.2
+
+
+class AdmissionController:
+    """
+    Очередь запросов к модели с контролем допуска.
+
+    Args:
+        concurrency: Одновременно обрабатываемых запросов.
+        max_queue_depth: Максимум запросов в очереди (без обрабатываемых).
+        latency_budget: Бюджет ожидания в очереди, секунды.
+    """
+
+    def __init__(self, concurrency: int, max_queue_depth: int, latency_budget: float):
+        self.concurrency = max(1, concurrency)
+        self.max_queue_depth = max_queue_depth
+        self.latency_budget = latency_budget
+        self.waiting = 0
+        self.running = 0
+        # Работа в очереди и в обработке в запросах (батч весит как cost запросов)
+        self.backlog = 0
+        self.service_time: float | None = None
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Создается лениво, чтобы в pre-fork режиме потоки появлялись в воркере
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="inference")
+        return self._executor
+
+    def estimated_wait(self) -> float:
+        """Оценка ожидания нового запроса в очереди, секунды."""
+        if self.service_time is None:
+            return 0.0
+        return self.backlog * self.service_time / self.concurrency
+
+    def admit(self, deadline: Deadline | None = None) -> str | None:
+        """
+        Решение о допуске нового запроса.
+
+        Args:
+            deadline: Дедлайн запроса; оставшееся до него время ограничивает
+                общий бюджет ожидания.
+
+        Returns:
+            str | None: None, если запрос допущен, иначе причина отказа:
+            "queue_full" или "latency_budget".
+        """
+        budget = self.latency_budget if deadline is None else min(self.latency_budget, deadline.remaining())
+        if self.waiting >= self.max_queue_depth:
+            reason = "queue_full"
+        elif self.estimated_wait() > budget:
+            reason = "latency_budget"
+        else:
+            return None
+        LOAD_SHED.inc(reason=reason)
+        return reason
+
+    def _observe(self, duration: float) -> None:
+        with self._lock:
+            if self.service_time is None:
+                self.service_time = duration
+            else:
+                self.service_time += EWMA_ALPHA * (duration - self.service_time)
+
+    async def run(self, func: Callable[..., Any], *args: Any,
+                  deadline: Deadline | None = None, cost: int = 1, **kwargs: Any) -> Any:
+        """
+        Выполняет функцию в пуле потоков модели в порядке очереди.
+
+        Контекст (тайминги стадий для Server-Timing) передается в поток,
+        дедлайн — в функцию аргументом deadline. cost — сколько запросов
+        обрабатывает функция (размер батча): столько же весит она в оценке
+        ожидания, а время обработки делится на cost в скользящем среднем.
+        Если ожидающий запрос отменен, он уходит из очереди; уже начатая
+        обработка останавливается на ближайшей проверке дедлайна (см.
+        `Deadline.cancel`), и место в пуле освобождается после ее завершения.
+
+        Raises:
+            DeadlineExceeded: Если дедлайн истек в очереди (стадия "queue").
+        """
+        self.waiting += 1
+        self.backlog += cost
+        acquired = False
+        started_wait = time.perf_counter()
+        try:
+            if deadline is None:
+                await self._semaphore.acquire()
+            else:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=deadline.remaining())
+            acquired = True
+        except asyncio.TimeoutError:
+            DEADLINE_EXCEEDED.inc(stage="queue", reason="deadline")
+            raise DeadlineExceeded("queue") from None
+        except asyncio.CancelledError:
+            DEADLINE_EXCEEDED.inc(stage="queue", reason="cancelled")
+            raise
+        finally:
+            self.waiting -= 1
+            record_stage("queue_wait", time.perf_counter() - started_wait)
+            if not acquired:
+                self.backlog -= cost
+        if deadline is not None:
+            kwargs["deadline"] = deadline
+
+        self.running += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        def release(_future: asyncio.Future) -> None:
+            self.running -= 1
+            self.backlog -= cost
+            self._observe((time.perf_counter() - started) / cost)
+            self._semaphore.release()
+
+        try:
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(self._get_executor(), context.run, partial(func, *args, **kwargs))
+        except BaseException:
+            self.running -= 1
+            self.backlog -= cost
+            self._semaphore.release()
+            raise
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+
+def create_admission_controller() -> AdmissionController | None:
+    """
+    Создает контроллер допуска по настройкам ModelConfig.
+
+    Returns:
+        AdmissionController | None: Контроллер или None, если контроль
+        допуска выключен (ADMISSION_ENABLED=false).
+    """
+    if not ModelConfig.ADMISSION_ENABLED:
+        return None
+    controller = AdmissionController(
+        concurrency=ModelConfig.INFERENCE_CONCURRENCY,
+        max_queue_depth=ModelConfig.ADMISSION_MAX_QUEUE,
+        latency_budget=ModelConfig.ADMISSION_LATENCY_BUDGET_MS / 1000
+    )
+    ADMISSION_QUEUE_DEPTH.set_function(lambda: controller.waiting)
+    ADMISSION_ESTIMATED_WAIT.set_function(controller.estimated_wait)
+    return controller
@@ -0,0 +1,188 @@
+"""
+Потоковая пакетная обработка сообщений в формате NDJSON.
+
+Тело запроса читается по частям и режется на строки, строки собираются
+в батчи по `batch_size` и отправляются в `NLUService.process_batch` через
+очередь контроля допуска (core/serving/admission.py) — общую с одиночными
+запросами, так что предел INFERENCE_CONCURRENCY и оценка ожидания учитывают
+пакетную нагрузку. Без контроля допуска батчи идут в собственный пул из
+одного потока. Одновременно обрабатывается не больше `max_in_flight`
+батчей: пока самый старый батч не готов, чтение тела приостанавливается.
+Результаты отдаются строго в порядке входа, поэтому память ограничена
+`batch_size * max_in_flight` сообщениями независимо от размера входа.
+
+Строка входа — JSON объект `{"message": "...", "id": ...}` или JSON строка.
+Строка результата:
+    {"line": 3, "id": ..., "success": true, "result": {...}, "error": ""}
+"""
+import asyncio
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator
+
+from .admission import AdmissionController
+
+_executor: ThreadPoolExecutor | None = None
+BULK_WORKERS = 1
+# Батчей отправлено в пул и не завершено (меняется только в потоке event loop)
+_in_flight = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Создается лениво, чтобы в pre-fork режиме поток появлялся в воркере, а не в мастере.
+    # Один поток: модель и так использует все выделенные ядра, параллельные
+    # прямые проходы только мешали бы друг другу
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BULK_WORKERS, thread_name_prefix="bulk")
+    return _executor
+
+
+def executor_stats() -> tuple[int, int, int]:
+    """Пул пакетной обработки: занятые потоки, батчи в очереди, предел потоков."""
+    active = min(_in_flight, BULK_WORKERS)
+    return active, _in_flight - active, BULK_WORKERS
+
+
+def _batch_done(_future: asyncio.Future) -> None:
+    global _in_flight  # pylint: disable=global-statement
+    _in_flight -= 1
+
+
+class LineTooLong(ValueError):
+    """Строка входа длиннее допустимого размера."""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes | LineTooLong]:
+    """
+    Режет поток байтов на строки.
+
+    Слишком длинная строка не накапливается в памяти: ее остаток пропускается
+    до следующего перевода строки, а вместо нее возвращается LineTooLong.
+    """
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not skipping:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        skipping = True
+                break
+            if skipping:
+                skipping = False
+                yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+                else:
+                    yield bytes(buffer)
+                buffer.clear()
+            start = end + 1
+    if skipping:
+        yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+    elif buffer:
+        yield bytes(buffer)
+
+
+def parse_line(line: bytes) -> tuple[Any, str]:
+    """
+    Разбирает строку входа.
+
+    Returns:
+        tuple: Идентификатор сообщения (или None) и текст.
+
+    Raises:
+        ValueError: Если строка не JSON или в ней нет текста сообщения.
+    """
+    item = json.loads(line)
+    if isinstance(item, str):
+        return None, item
+    if isinstance(item, dict) and isinstance(item.get("message"), str):
+        return item.get("id"), item["message"]
+    raise ValueError('Expected a JSON string or an object with a "message" field')
+
+
+def _process(nlu_service, processor, batch: list[dict], debug: bool) -> list[dict]:
+    texts = [item["message"] for item in batch if "error" not in item]
+    results = iter(nlu_service.process_batch(texts, processor, debug=debug) if texts else [])
+    for item in batch:
+        if "error" not in item:
+            item["result"] = next(results)
+    return batch
+
+
+async def process_stream(chunks: AsyncIterator[bytes], nlu_service, processor, batch_size: int,
+                         max_in_flight: int, max_line_bytes: int, debug: bool = False,
+                         admission: AdmissionController | None = None) -> AsyncIterator[dict]:
+    """
+    Обрабатывает поток NDJSON и выдает результаты в порядке входа.
+
+    Args:
+        chunks: Части тела запроса.
+        nlu_service: NLU сервис.
+        processor: Процессор команд.
+        batch_size: Сообщений в одном прямом проходе модели.
+        max_in_flight: Максимум батчей в обработке одновременно.
+        max_line_bytes: Максимальный размер строки входа.
+        debug: Собирать отладочную информацию.
+        admission: Контроль допуска; батчи встают в общую очередь модели
+            и не сбрасываются.
+
+    Yields:
+        dict: Элемент входа с ключами line, id и result или error.
+    """
+    loop = asyncio.get_running_loop()
+    pending: deque[asyncio.Future] = deque()
+    batch: list[dict] = []
+    line_number = 0
+
+    def submit() -> None:
+        global _in_flight  # pylint: disable=global-statement
+        if admission is not None:
+            future = asyncio.ensure_future(
+                admission.run(_process, nlu_service, processor, batch, debug, cost=len(batch))
+            )
+        else:
+            future = loop.run_in_executor(_get_executor(), _process, nlu_service, processor, batch, debug)
+            _in_flight += 1
+            future.add_done_callback(_batch_done)
+        pending.append(future)
+
+    try:
+        async for line in iter_lines(chunks, max_line_bytes):
+            line_number += 1
+            if isinstance(line, LineTooLong):
+                batch.append({"line": line_number, "id": None, "error": str(line)})
+            elif not line.strip():
+                continue
+            else:
+                try:
+                    item_id, message = parse_line(line)
+                    batch.append({"line": line_number, "id": item_id, "message": message})
+                except ValueError as e:
+                    batch.append({"line": line_number, "id": None, "error": f"Invalid line: {e}"})
+
+            if len(batch) >= batch_size:
+                submit()
+                batch = []
+                # Отдаем готовые батчи сразу, а при заполненной очереди ждем самый старый
+                while pending and (pending[0].done() or len(pending) >= max_in_flight):
+                    for item in await pending.popleft():
+                        yield item
+
+        if batch:
+            submit()
+        while pending:
+            for item in await pending.popleft():
+                yield item
+    finally:
+        # Клиент отключился: батчи в очереди отменяются, текущий дорабатывает
+        for future in pending:
+            future.cancel()
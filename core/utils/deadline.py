@@ -0,0 +1,75 @@
+"""
+Дедлайн запроса.
+
+Клиент передает бюджет задержки (заголовок X-Request-Timeout-Ms или поле
+timeout_ms запроса), и он превращается в абсолютный дедлайн, который
+передается по конвейеру: очередь модели, NLUService.process_text,
+NERModel.predict. Перед каждой стадией вызывается `check(stage)`: работа,
+дедлайн которой уже прошел, не выполняется, а в ошибке указывается стадия.
+
+Дедлайн служит и токеном отмены: при отключении клиента вызывается
+`cancel()`, и обработка останавливается на ближайшей проверке.
+"""
+import time
+
+from ..monitoring.metrics import DEADLINE_EXCEEDED
+
+
+class DeadlineExceeded(Exception):
+    """
+    Дедлайн запроса истек или запрос отменен.
+
+    Attributes:
+        stage (str): Стадия, перед которой обработка остановлена.
+        reason (str): "deadline" или "cancelled".
+    """
+
+    def __init__(self, stage: str, reason: str = "deadline"):
+        super().__init__(f"Request {'cancelled' if reason == 'cancelled' else 'deadline exceeded'} "
+                         f"before stage: {stage}")
+        self.stage = stage
+        self.reason = reason
+
+
+class Deadline:
+    """
+    Абсолютный дедлайн запроса по монотонным часам.
+
+    Args:
+        timeout: Бюджет задержки в секундах от текущего момента.
+    """
+
+    def __init__(self, timeout: float):
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = False
+
+    @classmethod
+    def from_timeout_ms(cls, timeout_ms: float | None) -> 'Deadline | None':
+        if timeout_ms is None or timeout_ms <= 0:
+            return None
+        return cls(timeout_ms / 1000)
+
+    def remaining(self) -> float:
+        """Оставшееся время в секундах, не меньше 0."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or time.monotonic() >= self.expires_at
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def check(self, stage: str) -> None:
+        """
+        Проверяет дедлайн перед стадией.
+
+        Raises:
+            DeadlineExceeded: Если дедлайн истек или запрос отменен.
+        """
+        if self.cancelled:
+            DEADLINE_EXCEEDED.inc(stage=stage, reason="cancelled")
+            raise DeadlineExceeded(stage, reason="cancelled")
+        if time.monotonic() >= self.expires_at:
+            DEADLINE_EXCEEDED.inc(stage=stage, reason="deadline")
+            raise DeadlineExceeded(stage)
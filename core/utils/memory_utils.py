@@ -0,0 +1,59 @@
+import os
+import resource
+
+
+def read_process_memory(pid: int | None = None) -> dict[str, int]:
+    """
+    Читает RSS/PSS процесса из /proc/<pid>/smaps_rollup (Linux).
+
+    PSS делит разделяемые страницы между всеми процессами, которые их
+    используют, поэтому сумма PSS воркеров показывает реальный расход памяти.
+
+    Args:
+        pid: Идентификатор процесса. По умолчанию текущий процесс.
+
+    Returns:
+        dict[str, int]: rss, pss, shared и private в байтах. Пустой словарь,
+        если /proc недоступен.
+    """
+    pid = pid or os.getpid()
+    fields = {
+        "Rss": "rss",
+        "Pss": "pss",
+        "Shared_Clean": "shared",
+        "Shared_Dirty": "shared",
+        "Private_Clean": "private",
+        "Private_Dirty": "private",
+    }
+    result = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    result[fields[key]] += int(value.split()[0]) * 1024
+    except OSError:
+        return {}
+    return result
+
+
+def get_current_rss() -> int:
+    """
+    Текущий RSS процесса из /proc/self/statm (Linux), 0 если недоступен.
+
+    В отличие от smaps_rollup, чтение не зависит от числа отображений
+    памяти и занимает микросекунды, поэтому годится для каждого сбора метрик.
+    """
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def get_peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_bytes(value: int) -> str:
+    return f"{value / (1024 * 1024):.1f} MB"
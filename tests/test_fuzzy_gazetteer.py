@@ -0,0 +1,97 @@
+"""
+Нечеткий поиск по газеттиру совпадает с полным перебором: расстояние в
+полосе (`edit_distance`) — с полной матрицей Дамерау-Левенштейна, поиск по
+вариантам удаления — с перебором всех названий WELL_FIELDS.
+"""
+import random
+
+import pytest
+
+from app.config.command_config import WELL_FIELDS
+from app.core.nlu.parsers.fuzzy_gazetteer import (FuzzyGazetteer, allowed_distance, edit_distance,
+                                                  gazetteer_key)
+
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщыьэюя"
+
+
+def full_distance(a: str, b: str) -> int:
+    """Optimal string alignment полной матрицей."""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+def typo(word: str, rng: random.Random) -> str:
+    chars = list(word)
+    operation = rng.randrange(4)
+    i = rng.randrange(len(chars))
+    if operation == 0:
+        chars[i] = rng.choice(ALPHABET)
+    elif operation == 1 and len(chars) > 1:
+        del chars[i]
+    elif operation == 2:
+        chars.insert(i, rng.choice(ALPHABET))
+    elif i + 1 < len(chars):
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+@pytest.mark.parametrize("limit", [0, 1, 2, 3])
+def test_edit_distance_matches_full_matrix(limit):
+    rng = random.Random(limit)
+    for _ in range(3000):
+        a = "".join(rng.choice("абвг") for _ in range(rng.randint(0, 8)))
+        b = a
+        for _ in range(rng.randint(0, 4)):
+            b = typo(b, rng) if b else rng.choice("абвг")
+        expected = full_distance(a, b)
+        assert edit_distance(a, b, limit) == (expected if expected <= limit else limit + 1), (a, b)
+
+
+def test_transposition_is_one_edit():
+    assert edit_distance("ванкоркое", "ванкороке", 2) == 1
+    assert full_distance("ca", "abc") == 3
+
+
+@pytest.fixture(scope="module")
+def gazetteer() -> FuzzyGazetteer:
+    return FuzzyGazetteer(WELL_FIELDS)
+
+
+def test_lookup_matches_brute_force(gazetteer):
+    keys = list(dict.fromkeys(gazetteer_key(field) for field in WELL_FIELDS))
+    rng = random.Random(1)
+    for _ in range(500):
+        query = gazetteer_key(typo(typo(rng.choice(WELL_FIELDS), rng), rng) if rng.random() < 0.5
+                              else typo(rng.choice(WELL_FIELDS), rng))
+        if not query:
+            continue
+        limit = allowed_distance(query, gazetteer.max_distance)
+        # Перебор всех названий; edit_distance сверен с полной матрицей выше
+        distances = {key: edit_distance(query, key, limit) for key in keys}
+        allowed = {key: distance for key, distance in distances.items()
+                   if distance <= limit and distance <= allowed_distance(key, gazetteer.max_distance)}
+        match = gazetteer.lookup(query)
+        if not allowed:
+            assert match is None, query
+        else:
+            best = min(allowed.values())
+            assert match is not None and match.distance == best, query
+            assert allowed.get(gazetteer_key(match.field)) == best, query
+
+
+def test_lookup_exact_and_short(gazetteer):
+    assert gazetteer.lookup("Ванкорское").distance == 0
+    assert gazetteer.lookup("верхне колвинское").field == "Верхне-Колвинское"
+    assert gazetteer.lookup("Ванкоркое").field == "Ванкорское"
+    # Короткие слова без правок: «кот» не должен совпасть ни с чем
+    assert gazetteer.lookup("кот") is None
+    assert gazetteer.lookup("") is None
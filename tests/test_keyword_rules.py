@@ -0,0 +1,149 @@
+"""
+Правила data/module_keywords.json совпадают с цепочками if/elif, которые
+они заменили в CommandProcessor (`_fallback_module_detection` и
+`_detect_module_by_keywords`).
+
+Запуск из каталога над репозиторием:
+    python -m pytest app/tests
+"""
+import os
+import random
+
+import pytest
+
+from app.core.registry.keyword_rules import KeywordMatcher, load_keyword_rules
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "module_keywords.json")
+
+FORMULA_EXCEPTIONS = ["формул", "формулы", "формулу", "формула", "формуле", "формулой"]
+
+
+def _forms_input(text_lower: str) -> str | None:
+    words = text_lower.split()
+    if "форму" in words or "форма" in words or "форме" in words:
+        return "forms_input_engine"
+    if " форму " in f" {text_lower} " or text_lower.startswith("форму ") or text_lower.endswith(" форму"):
+        return "forms_input_engine"
+    return None
+
+
+def reference_fallback(text_lower: str) -> str | None:
+    if any(exception in text_lower for exception in FORMULA_EXCEPTIONS):
+        return None
+    if any(keyword in text_lower for keyword in ["шахмат", "шахматк"]):
+        return "Ois.Modules.chessy.ChessyModule"
+    elif any(keyword in text_lower for keyword in ["отчет", "сводк", "доклад"]):
+        return "standalone_report"
+    elif any(keyword in text_lower for keyword in ["форму", "ввод"]):
+        return _forms_input(text_lower)
+    elif any(keyword in text_lower for keyword in ["данные", "конструкц"]):
+        return "well_construction"
+    elif "режим" in text_lower:
+        return "mode_output"
+    elif "баланс" in text_lower:
+        return "volume_balance"
+    return None
+
+
+def reference_rule_based(text_lower: str) -> str | None:
+    if any(exception in text_lower for exception in FORMULA_EXCEPTIONS):
+        return None
+    if any(keyword in text_lower for keyword in ["шахмат", "шахматк"]):
+        return "Ois.Modules.chessy.ChessyModule"
+    elif any(keyword in text_lower for keyword in ["отчет", "сводк", "доклад"]):
+        return "standalone_report"
+    elif any(keyword in text_lower for keyword in ["данные", "конструкц"]):
+        return "well_construction"
+    elif any(keyword in text_lower for keyword in ["форму", "ввод"]):
+        return _forms_input(text_lower)
+    elif "режим" in text_lower:
+        return "mode_output"
+    elif "баланс" in text_lower:
+        return "volume_balance"
+    elif any(keyword in text_lower for keyword in ["отчетность", "движок отчет"]):
+        return "reporting_engine"
+    return None
+
+
+KEYWORDS = ["формул", "формулой", "шахмат", "шахматку", "отчет", "отчетность", "движок отчет", "сводк",
+            "доклад", "форму", "форма", "форме", "ввод", "ввода", "данные", "конструкц", "режим", "баланс",
+            "информ"]
+FILLER = ["открой", "покажи", "за", "октябрь", "2024", "по", "ванкорскому", "скважина", "215", "мне",
+          "пожалуйста"]
+
+
+def _generated_texts(count: int, seed: int = 0) -> list[str]:
+    # Случайные сочетания ключевых слов, в том числе склеенные без пробела
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(KEYWORDS + FILLER) for _ in range(rng.randint(1, 6))]
+        if rng.random() < 0.3 and len(words) > 1:
+            i = rng.randrange(len(words) - 1)
+            words[i:i + 2] = [words[i] + words[i + 1]]
+        texts.append(" ".join(words))
+    return texts
+
+
+TEXTS = [
+    "",
+    "открой шахматку по ванкорскому",
+    "покажи отчет по добыче",
+    "сводка за октябрь",
+    "открой форму ввода",
+    "форму",
+    "движок форм ввода",
+    "данные по конструкции скважины",
+    "вывод на режим",
+    "баланс объемов",
+    "движок отчетности",
+    "отчетность",
+    "формула расчета дебита",
+    "шахматка и отчет",
+    "режим и баланс",
+    "данные форма",
+] + _generated_texts(5000)
+
+
+@pytest.fixture(scope="module")
+def rules() -> dict[str, KeywordMatcher]:
+    return load_keyword_rules(RULES_PATH)
+
+
+def test_rule_sets(rules):
+    assert set(rules) == {"fallback", "rule_based"}
+
+
+@pytest.mark.parametrize("rule_set, reference", [
+    ("fallback", reference_fallback),
+    ("rule_based", reference_rule_based),
+])
+def test_matches_reference(rules, rule_set, reference):
+    matcher = rules[rule_set]
+    mismatches = [(text, matcher.detect(text), reference(text))
+                  for text in TEXTS if matcher.detect(text) != reference(text)]
+    assert not mismatches
+
+
+def test_priority_wins_over_position():
+    matcher = KeywordMatcher([
+        {"module": "first", "keywords": ["бв"]},
+        {"module": "second", "keywords": ["абв"]},
+    ])
+    # Ключевые слова перекрываются: «абв» начинается раньше, но приоритет у «бв»
+    assert matcher.detect("абв") == "first"
+    assert matcher.detect("аб") is None
+
+
+def test_exception_and_words():
+    matcher = KeywordMatcher([
+        {"module": None, "keywords": ["формул"]},
+        {"module": "forms", "keywords": ["форм"], "words": ["форма"]},
+    ])
+    assert matcher.detect("форма ввода") == "forms"
+    assert matcher.detect("формы ввода") is None
+    assert matcher.detect("форма и формула") is None
+
+
+def test_empty_rules():
+    assert KeywordMatcher([]).detect("шахматка") is None
@@ -0,0 +1,109 @@
+"""
+Снимок индексов: таблица `MappedTable` и запись/чтение файла снимка
+возвращают то же, что было записано.
+"""
+import json
+import random
+
+import pytest
+
+from app.core.nlu.parsers.entity_parser import EntityParser
+from app.core.nlu.parsers.fuzzy_gazetteer import FuzzyGazetteer
+from app.core.registry.snapshot import HEADER, MappedTable, build_table, read_snapshot, write_snapshot
+
+FIELDS = ["Ванкорское", "Верхне-Колвинское", "Озёрное", "Озерное", "Кечевский участок недр",
+          "Имени В.Н.Виноградова", "Самотлорское", "Мишаевское", "Щучье"]
+
+
+def _random_items(count: int, seed: int = 0) -> dict[str, list[int]]:
+    rng = random.Random(seed)
+    alphabet = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяabc- "
+    items = {}
+    while len(items) < count:
+        key = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        items[key] = [rng.randrange(2 ** 32) for _ in range(rng.randint(0, 5))]
+    return items
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 1000])
+def test_mapped_table_round_trip(count):
+    items = _random_items(count)
+    table = MappedTable(memoryview(build_table(items)))
+
+    assert len(table) == len(items)
+    assert list(table) == list(items)
+    for key, values in items.items():
+        assert key in table
+        assert table[key] == tuple(values)
+
+
+def test_mapped_table_misses():
+    items = _random_items(200)
+    table = MappedTable(memoryview(build_table(items)))
+
+    for key in ["", "отсутствует", "ванкорское", "x" * 40]:
+        if key not in items:
+            assert key not in table
+            assert table.get(key) is None
+            assert table.get(key, ()) == ()
+            with pytest.raises(KeyError):
+                table[key]  # pylint: disable=pointless-statement
+    assert 1 not in table
+
+
+def test_snapshot_round_trip(tmp_path):
+    parser = EntityParser(FIELDS)
+    data = {
+        "registry": {"10054": {"moduleTitle": "Редактор"}},
+        "synonyms": {"10054": ["редактор слушателей очередей"]},
+        "well_fields": parser.get_search_state(),
+    }
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, data, "digest")
+
+    loaded = read_snapshot(path, "digest")
+    assert loaded is not None
+    assert loaded["registry"] == data["registry"]
+    assert loaded["synonyms"] == data["synonyms"]
+    well_fields = loaded["well_fields"]
+    deletes = well_fields["fuzzy_deletes"]
+    assert isinstance(deletes, MappedTable)
+    assert {key: tuple(value) for key, value in parser.fuzzy_index.deletes.items()} == dict(deletes.items())
+    for name in ("prefix_map", "exact_map", "part_map", "field_phrases", "fuzzy", "inflection_index"):
+        assert well_fields[name] == data["well_fields"][name]
+
+    restored = FuzzyGazetteer.from_state(well_fields["fuzzy"], deletes)
+    for query in ["Ванкоркое", "верхнее колвинское", "Озерное", "Самотлорскае", "скважина"]:
+        assert restored.lookup(query) == parser.fuzzy_index.lookup(query)
+
+
+def test_snapshot_rejects_other_digest_and_garbage(tmp_path):
+    parser = EntityParser(FIELDS)
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {"registry": {}, "synonyms": {}, "well_fields": parser.get_search_state()}, "digest")
+
+    assert read_snapshot(path, "other") is None
+    assert read_snapshot(str(tmp_path / "missing.bin")) is None
+    garbage = tmp_path / "garbage.bin"
+    garbage.write_bytes(b"not a snapshot")
+    assert read_snapshot(str(garbage)) is None
+
+
+@pytest.mark.parametrize("payload", [
+    b"cbuiltins\nmissing_name\n.",    # AttributeError
+    b"cmissing_module\nname\n.",      # ImportError (ModuleNotFoundError)
+    b"]\x94.",                          # пустой список вместо словаря: TypeError
+    b"\x80\x04",                        # обрыв потока
+])
+def test_snapshot_corrupt_objects(tmp_path, payload):
+    parser = EntityParser(FIELDS)
+    path = tmp_path / "snapshot.bin"
+    write_snapshot(str(path), {"registry": {}, "synonyms": {}, "well_fields": parser.get_search_state()}, "digest")
+
+    data = bytearray(path.read_bytes())
+    _, _, toc_length = HEADER.unpack_from(data, 0)
+    offset, length = json.loads(bytes(data[HEADER.size:HEADER.size + toc_length]))["sections"]["objects"]
+    data[offset:offset + length] = payload.ljust(length, b"\0")
+    path.write_bytes(bytes(data))
+
+    assert read_snapshot(str(path), "digest") is None
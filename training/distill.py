@@ -0,0 +1,348 @@
+"""
+Дистилляция NER модели в компактную модель-ученика.
+
+Учитель — обученная модель из ModelConfig.MODEL_PATH. Обучающие данные —
+синтетические команды `benchmarks.corpus.generate_corpus` (словари
+`config/command_config.py`), которые учитель размечает псевдометками:
+логитами первого субтокена каждого слова. Ученик — та же архитектура с
+меньшим числом слоев (и, при желании, меньшим hidden_size), тот же
+токенизатор и те же метки NER_LABELS/id2ner. При совпадающем hidden_size
+эмбеддинги, слои (равномерно выбранные) и классификатор ученика
+инициализируются весами учителя.
+
+Функция потерь: alpha * KL(ученик || учитель) с температурой
++ (1 - alpha) * кросс-энтропия по тегам генератора (или по argmax учителя
+с --hard-labels teacher). Обучение на CPU.
+
+После обучения ученик сохраняется в safetensors, и учитель и ученик
+оцениваются через `NERModel` на отложенном корпусе: F1 по тегам слов и
+задержка `predict` на одну команду. Отчет сохраняется в
+`<output>/distillation_report.json`.
+
+Ученик подключается без изменений кода:
+    NER_MODEL=student  (путь ModelConfig.STUDENT_MODEL_PATH)
+
+Пример:
+    python -m app.training.distill --layers 4 --train-size 20000 --epochs 3 \
+        --output app/data/student_model
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import math
+import os
+import random
+import time
+
+import torch
+import torch.nn.functional as F
+from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+from ..benchmarks.corpus import CommandSample, generate_corpus
+from ..benchmarks.report import environment_info, summarize_latencies
+from ..config.command_config import NER_LABELS, id2ner, ner2id
+from ..config.model_config import ModelConfig
+from ..core.nlu.models.ner_model import NERModel
+
+IGNORE_INDEX = -100
+
+
+def _encode(tokenizer, batch: list[list[str]], max_length: int):
+    return tokenizer(
+        batch,
+        is_split_into_words=True,
+        return_tensors="pt",
+        padding=True,
+        truncation=True,
+        max_length=max_length
+    )
+
+
+def _first_subtoken_positions(encoding, row: int) -> list[int]:
+    # Позиции первых субтокенов слов: по ним NERModel.predict берет тег слова
+    positions = []
+    previous = None
+    for position, word_id in enumerate(encoding.word_ids(row)):
+        if word_id is not None and word_id != previous:
+            positions.append(position)
+        previous = word_id
+    return positions
+
+
+def pseudo_label(teacher, tokenizer, samples: list[CommandSample], batch_size: int,
+                 max_length: int) -> list[torch.Tensor]:
+    """
+    Логиты учителя для каждого слова каждой команды.
+
+    Returns:
+        list[torch.Tensor]: Тензоры (число слов, число меток) в float16.
+    """
+    teacher.eval()
+    soft_labels = []
+    with torch.no_grad():
+        for start in range(0, len(samples), batch_size):
+            batch = [sample.text.split() for sample in samples[start:start + batch_size]]
+            encoding = _encode(tokenizer, batch, max_length)
+            logits = teacher(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"]).logits
+            for row in range(len(batch)):
+                positions = _first_subtoken_positions(encoding, row)
+                soft_labels.append(logits[row, positions].to(torch.float16))
+    return soft_labels
+
+
+def build_student(teacher, layers: int, hidden_size: int | None, intermediate_size: int | None,
+                  heads: int | None):
+    """
+    Создает модель-ученика по конфигурации учителя.
+
+    При совпадающем hidden_size веса эмбеддингов, равномерно выбранных слоев
+    энкодера и классификатора копируются из учителя.
+    """
+    config = copy.deepcopy(teacher.config)
+    teacher_layers = teacher.config.num_hidden_layers
+    config.num_hidden_layers = layers
+    if hidden_size:
+        config.hidden_size = hidden_size
+    if intermediate_size:
+        config.intermediate_size = intermediate_size
+    if heads:
+        config.num_attention_heads = heads
+    config.num_labels = len(NER_LABELS)
+    config.id2label = dict(id2ner)
+    config.label2id = dict(ner2id)
+    student = AutoModelForTokenClassification.from_config(config)
+
+    if config.hidden_size == teacher.config.hidden_size and config.intermediate_size == teacher.config.intermediate_size \
+            and config.num_attention_heads == teacher.config.num_attention_heads:
+        teacher_base = getattr(teacher, teacher.base_model_prefix)
+        student_base = getattr(student, student.base_model_prefix)
+        student_base.embeddings.load_state_dict(teacher_base.embeddings.state_dict())
+        if layers == 1:
+            indices = [teacher_layers - 1]
+        else:
+            indices = [round(i * (teacher_layers - 1) / (layers - 1)) for i in range(layers)]
+        for student_layer, index in zip(student_base.encoder.layer, indices):
+            student_layer.load_state_dict(teacher_base.encoder.layer[index].state_dict())
+        student.classifier.load_state_dict(teacher.classifier.state_dict())
+        print(f"Student initialized from teacher layers {indices}")
+    return student
+
+
+def train_student(student, tokenizer, samples: list[CommandSample], soft_labels: list[torch.Tensor],
+                  args: argparse.Namespace) -> list[float]:
+    """
+    Обучает ученика на псевдометках учителя.
+
+    Returns:
+        list[float]: Средняя потеря по эпохам.
+    """
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.learning_rate, weight_decay=0.01)
+    steps_per_epoch = math.ceil(len(samples) / args.batch_size)
+    total_steps = steps_per_epoch * args.epochs
+    scheduler = torch.optim.lr_scheduler.LambdaLR(
+        optimizer, lambda step: max(0.0, 1 - step / total_steps) if total_steps else 1.0
+    )
+    rng = random.Random(args.seed)
+    order = list(range(len(samples)))
+    temperature = args.temperature
+    history = []
+
+    student.train()
+    for epoch in range(args.epochs):
+        rng.shuffle(order)
+        epoch_loss = 0.0
+        started = time.perf_counter()
+        for start in range(0, len(order), args.batch_size):
+            indices = order[start:start + args.batch_size]
+            batch = [samples[i].text.split() for i in indices]
+            encoding = _encode(tokenizer, batch, args.max_length)
+            logits = student(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"]).logits
+
+            student_logits = []
+            teacher_logits = []
+            labels = []
+            for row, index in enumerate(indices):
+                positions = _first_subtoken_positions(encoding, row)
+                student_logits.append(logits[row, positions])
+                teacher_row = soft_labels[index][:len(positions)].float()
+                teacher_logits.append(teacher_row)
+                if args.hard_labels == "teacher":
+                    labels.append(teacher_row.argmax(dim=-1))
+                else:
+                    labels.append(torch.tensor([ner2id[tag] for tag in samples[index].tags[:len(positions)]]))
+            student_logits = torch.cat(student_logits)
+            teacher_logits = torch.cat(teacher_logits)
+            labels = torch.cat(labels)
+
+            distill_loss = F.kl_div(
+                F.log_softmax(student_logits / temperature, dim=-1),
+                F.softmax(teacher_logits / temperature, dim=-1),
+                reduction="batchmean"
+            ) * temperature ** 2
+            label_loss = F.cross_entropy(student_logits, labels)
+            loss = args.alpha * distill_loss + (1 - args.alpha) * label_loss
+
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            epoch_loss += loss.item() * len(indices)
+
+        history.append(epoch_loss / len(samples))
+        print(f"Epoch {epoch + 1}/{args.epochs}: loss {history[-1]:.4f}, "
+              f"{time.perf_counter() - started:.1f}s")
+    student.eval()
+    return history
+
+
+def tag_f1(gold: list[list[str]], predicted: list[list[str]]) -> dict:
+    """
+    F1 по тегам слов: по каждому тегу и микро-среднее по тегам кроме O.
+
+    Args:
+        gold: Эталонные теги слов.
+        predicted: Предсказанные теги слов.
+
+    Returns:
+        dict: {"micro_f1", "per_tag": {тег: {"precision", "recall", "f1", "support"}}}
+    """
+    counts = {label: {"tp": 0, "fp": 0, "fn": 0} for label in NER_LABELS}
+    for gold_tags, predicted_tags in zip(gold, predicted):
+        predicted_tags = predicted_tags + ["O"] * (len(gold_tags) - len(predicted_tags))
+        for gold_tag, predicted_tag in zip(gold_tags, predicted_tags):
+            if gold_tag == predicted_tag:
+                counts[gold_tag]["tp"] += 1
+            else:
+                counts[gold_tag]["fn"] += 1
+                counts[predicted_tag]["fp"] += 1
+
+    def f1(tp: int, fp: int, fn: int) -> tuple[float, float, float]:
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        score = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return precision, recall, score
+
+    per_tag = {}
+    for label, count in counts.items():
+        precision, recall, score = f1(count["tp"], count["fp"], count["fn"])
+        per_tag[label] = {
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(score, 4),
+            "support": count["tp"] + count["fn"]
+        }
+    entity = [count for label, count in counts.items() if label != "O"]
+    _, _, micro = f1(sum(c["tp"] for c in entity), sum(c["fp"] for c in entity), sum(c["fn"] for c in entity))
+    return {"micro_f1": round(micro, 4), "per_tag": per_tag}
+
+
+def evaluate(model_path: str, samples: list[CommandSample], latency_samples: int) -> dict:
+    """
+    Оценивает модель так же, как она работает в сервисе: через NERModel.predict.
+
+    Returns:
+        dict: F1 по тегам, задержка predict на одну команду и размер модели.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        ner_model = NERModel(model_path)
+    predicted = [[item["tag"] for item in ner_model.predict(sample.text)] for sample in samples]
+    report = tag_f1([sample.tags for sample in samples], predicted)
+
+    latencies = []
+    for sample in samples[:latency_samples]:
+        started = time.perf_counter()
+        ner_model.predict(sample.text)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "model_path": model_path,
+        "layers": ner_model.model.config.num_hidden_layers,
+        "hidden_size": ner_model.model.config.hidden_size,
+        "parameters": sum(parameter.numel() for parameter in ner_model.model.parameters()),
+        "micro_f1": report["micro_f1"],
+        "latency_ms": summarize_latencies(latencies),
+        "per_tag": report["per_tag"]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distill the NER model into a compact student")
+    parser.add_argument("--teacher", default=ModelConfig.MODEL_PATH)
+    parser.add_argument("--output", default=ModelConfig.STUDENT_MODEL_PATH)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden-size", type=int, help="Student hidden size, by default the teacher's")
+    parser.add_argument("--intermediate-size", type=int)
+    parser.add_argument("--heads", type=int)
+    parser.add_argument("--train-size", type=int, default=20000)
+    parser.add_argument("--eval-size", type=int, default=1000)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=5e-5)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.5, help="Weight of the distillation loss")
+    parser.add_argument("--hard-labels", choices=["corpus", "teacher"], default="corpus",
+                        help="Hard labels for the cross-entropy term")
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--latency-samples", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads, 0 = default")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher)
+    teacher = AutoModelForTokenClassification.from_pretrained(args.teacher, num_labels=len(id2ner))
+
+    train_samples = generate_corpus(args.train_size, seed=args.seed)
+    eval_samples = generate_corpus(args.eval_size, seed=args.seed + 1)
+
+    started = time.perf_counter()
+    soft_labels = pseudo_label(teacher, tokenizer, train_samples, args.batch_size, args.max_length)
+    print(f"Pseudo-labelled {len(train_samples)} commands in {time.perf_counter() - started:.1f}s")
+
+    student = build_student(teacher, args.layers, args.hidden_size, args.intermediate_size, args.heads)
+    del teacher
+    started = time.perf_counter()
+    history = train_student(student, tokenizer, train_samples, soft_labels, args)
+    train_time = time.perf_counter() - started
+
+    os.makedirs(args.output, exist_ok=True)
+    student.save_pretrained(args.output, safe_serialization=True)
+    tokenizer.save_pretrained(args.output)
+    print(f"Student saved to {args.output}")
+
+    teacher_report = evaluate(args.teacher, eval_samples, args.latency_samples)
+    student_report = evaluate(args.output, eval_samples, args.latency_samples)
+    report = {
+        "teacher": teacher_report,
+        "student": student_report,
+        "speedup_p50": round(teacher_report["latency_ms"]["p50"] / student_report["latency_ms"]["p50"], 2)
+        if student_report["latency_ms"]["p50"] else None,
+        "training": {
+            "train_size": args.train_size,
+            "eval_size": args.eval_size,
+            "epochs": args.epochs,
+            "loss_history": [round(loss, 4) for loss in history],
+            "train_time_s": round(train_time, 1),
+            "temperature": args.temperature,
+            "alpha": args.alpha,
+            "hard_labels": args.hard_labels
+        },
+        "environment": environment_info()
+    }
+    with open(os.path.join(args.output, "distillation_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'model':10} {'layers':>6} {'params':>12} {'tag F1':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, item in (("teacher", teacher_report), ("student", student_report)):
+        print(f"{name:10} {item['layers']:>6} {item['parameters']:>12} {item['micro_f1']:>8.4f} "
+              f"{item['latency_ms']['p50']:>8.2f} {item['latency_ms']['p95']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Сокращение словаря токенизатора и матрицы эмбеддингов под предметную область.
+
+Словарь rubert-base-cased содержит около 120 тысяч субтокенов, а команды
+используют небольшой словарь нефтегазовой предметной области. Инструмент
+собирает субтокены, которые реально встречаются в эталонном корпусе
+(синтетические команды `benchmarks.corpus` и, при желании, файл сообщений)
+и в газеттирах конфигурации (месторождения, скважины, периоды, формы,
+названия и синонимы модулей реестра), и оставляет в словаре и в матрице эмбеддингов
+только их. Тексты берутся и в исходном виде, и после `NumberParser`, как их
+видит модель.
+
+Дополнительно сохраняются служебные токены и все односимвольные субтокены
+(«а», «##а», ...), а с --keep-digits — все числовые субтокены: незнакомое
+слово разбивается на символы, а не превращается в [UNK].
+
+Остальные веса не меняются, порядок оставшихся субтокенов сохраняется. На
+текстах, покрытых словарем, сокращенная модель выдает те же предсказания:
+WordPiece на подмножестве словаря выбирает те же субтокены. Это
+проверяется на корпусе (теги и логиты), и в отчете приводятся
+сокращение RSS и времени загрузки `NERModel`.
+
+Сокращенная модель загружается как обычная, например через
+STUDENT_MODEL_PATH/NER_MODEL=student или MODEL_PATH.
+
+Пример:
+    python -m app.training.prune_vocab --output app/data/pruned_model \
+        --corpus-size 20000 --corpus messages.jsonl
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import torch
+from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+from ..batch import read_messages
+from ..benchmarks.corpus import generate_corpus
+from ..benchmarks.report import environment_info
+from ..config import command_config
+from ..config.command_config import id2ner
+from ..config.model_config import ModelConfig
+from ..core.nlu.models.ner_model import NERModel
+from ..core.nlu.parsers.number_parser import NumberParser
+from ..core.registry.synonyms import synonym_variants
+from ..core.utils.memory_utils import format_bytes, read_process_memory
+
+# Параметры токенизатора, которые переносятся в сокращенный токенизатор
+TOKENIZER_KWARGS = (
+    "do_lower_case", "unk_token", "sep_token", "pad_token", "cls_token", "mask_token",
+    "tokenize_chinese_chars", "strip_accents", "model_max_length"
+)
+
+
+def gazetteer_texts(registry_path: str) -> list[str]:
+    """
+    Значения газеттиров конфигурации, названия и синонимы модулей реестра.
+    """
+    texts = []
+    for name in ("WELL_FIELDS", "WELL_FIELDS_LOWER", "WELL_NAMES", "PERIODS", "SPECIAL_PERIODS",
+                 "FORM_TYPES", "REPORT_NAME", "DATES", "YEARS"):
+        texts.extend(str(value) for value in getattr(command_config, name, []))
+    with open(registry_path, encoding="utf-8") as f:
+        registry = json.load(f)
+    for module in registry.values():
+        if module.get("moduleTitle"):
+            texts.append(module["moduleTitle"])
+        for synonym in module.get("synonyms", []):
+            texts.extend(synonym_variants(synonym))
+    return texts
+
+
+def reference_texts(args: argparse.Namespace) -> list[str]:
+    """
+    Тексты эталонного корпуса в том виде, в каком они приходят в модель.
+    """
+    texts = [sample.text for sample in generate_corpus(args.corpus_size, seed=args.seed)]
+    for path in args.corpus:
+        texts.extend(text for _, text, error in read_messages(path) if text and not error)
+    number_parser = NumberParser()
+    with contextlib.redirect_stdout(io.StringIO()):
+        preprocessed = [number_parser.convert_text_numbers_to_digits(text) for text in texts]
+    return texts + preprocessed
+
+
+def collect_token_ids(tokenizer, texts: list[str], keep_digits: bool) -> list[int]:
+    """
+    Идентификаторы субтокенов, которые нужно сохранить, в исходном порядке.
+    """
+    keep = set(tokenizer.all_special_ids)
+    for start in range(0, len(texts), 1000):
+        batch = [text.split() for text in texts[start:start + 1000]]
+        for ids in tokenizer(batch, is_split_into_words=True, add_special_tokens=False)["input_ids"]:
+            keep.update(ids)
+    for token, token_id in tokenizer.get_vocab().items():
+        piece = token[2:] if token.startswith("##") else token
+        if len(piece) == 1 or (keep_digits and piece.isdigit()):
+            keep.add(token_id)
+    return sorted(keep)
+
+
+def prune(model_path: str, output_path: str, texts: list[str], keep_digits: bool) -> dict:
+    """
+    Сохраняет модель с сокращенным словарем.
+
+    Returns:
+        dict: Размеры словаря и число параметров до и после.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForTokenClassification.from_pretrained(model_path, num_labels=len(id2ner))
+    keep = collect_token_ids(tokenizer, texts, keep_digits)
+
+    id2token = {token_id: token for token, token_id in tokenizer.get_vocab().items()}
+    vocab = {id2token[token_id]: index for index, token_id in enumerate(keep)}
+    kwargs = {key: tokenizer.init_kwargs[key] for key in TOKENIZER_KWARGS if key in tokenizer.init_kwargs}
+    # Словарь передается файлом vocab.txt в порядке номеров: аргументы
+    # конструктора (vocab= или vocab_file=) различаются между версиями
+    # transformers, а загрузка каталога с vocab.txt работает в каждой
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "vocab.txt"), "w", encoding="utf-8") as f:
+            f.writelines(id2token[token_id] + "\n" for token_id in keep)
+        pruned_tokenizer = type(tokenizer).from_pretrained(directory, **kwargs)
+    if len(pruned_tokenizer) != len(keep):
+        raise RuntimeError(f"Pruned tokenizer has {len(pruned_tokenizer)} tokens, expected {len(keep)}")
+
+    parameters = sum(parameter.numel() for parameter in model.parameters())
+    embeddings = model.get_input_embeddings()
+    pruned_embeddings = torch.nn.Embedding(len(keep), embeddings.embedding_dim,
+                                           padding_idx=vocab.get(pruned_tokenizer.pad_token))
+    with torch.no_grad():
+        pruned_embeddings.weight.copy_(embeddings.weight[keep])
+    model.set_input_embeddings(pruned_embeddings)
+    model.config.vocab_size = len(keep)
+    model.config.pad_token_id = pruned_tokenizer.pad_token_id
+
+    os.makedirs(output_path, exist_ok=True)
+    model.save_pretrained(output_path, safe_serialization=True)
+    pruned_tokenizer.save_pretrained(output_path)
+    return {
+        "vocab_size": {"before": len(id2token), "after": len(keep)},
+        "parameters": {"before": parameters, "after": sum(p.numel() for p in model.parameters())}
+    }
+
+
+def verify(model_path: str, output_path: str, texts: list[str], batch_size: int) -> dict:
+    """
+    Сравнивает предсказания исходной и сокращенной модели на корпусе.
+
+    Returns:
+        dict: Число текстов с разными тегами или токенами, число [UNK] и
+        максимальная разница логитов.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        original = NERModel(model_path)
+        pruned = NERModel(output_path)
+    unk_id = pruned.tokenizer.unk_token_id
+    tag_mismatches = 0
+    token_mismatches = 0
+    unknown_tokens = 0
+    max_logit_diff = 0.0
+    texts = [text for text in dict.fromkeys(texts) if text.split()]
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        for before, after in zip(original.predict_batch(batch), pruned.predict_batch(batch)):
+            if before != after:
+                tag_mismatches += 1
+        words = [text.split() for text in batch]
+        encoded = []
+        for ner_model in (original, pruned):
+            encoded.append(ner_model.tokenizer(words, is_split_into_words=True, return_tensors="pt",
+                                               padding=True, truncation=True, max_length=512))
+        for row in range(len(batch)):
+            before_tokens = original.tokenizer.convert_ids_to_tokens(encoded[0]["input_ids"][row])
+            after_tokens = pruned.tokenizer.convert_ids_to_tokens(encoded[1]["input_ids"][row])
+            if before_tokens != after_tokens:
+                token_mismatches += 1
+        unknown_tokens += int((encoded[1]["input_ids"] == unk_id).sum()) - int((encoded[0]["input_ids"] == unk_id).sum())
+        with torch.no_grad():
+            logits = [ner_model.model(input_ids=item["input_ids"], attention_mask=item["attention_mask"]).logits
+                      for ner_model, item in zip((original, pruned), encoded)]
+        mask = encoded[0]["attention_mask"].bool()
+        max_logit_diff = max(max_logit_diff, float((logits[0] - logits[1]).abs()[mask].max()))
+    return {
+        "texts": len(texts),
+        "tag_mismatches": tag_mismatches,
+        "token_mismatches": token_mismatches,
+        "extra_unknown_tokens": unknown_tokens,
+        "max_logit_diff": max_logit_diff
+    }
+
+
+def _measure_load(model_path: str) -> dict:
+    baseline = read_process_memory().get("rss", 0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ner_model = NERModel(model_path)
+    return {
+        "load_time_s": round(ner_model.load_time, 3),
+        "load_method": ner_model.load_method,
+        "rss_delta": read_process_memory().get("rss", 0) - baseline
+    }
+
+
+def measure_load(model_path: str) -> dict:
+    """
+    Время загрузки NERModel и прирост RSS в отдельном процессе.
+    """
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure_load, (model_path,))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prune the tokenizer vocabulary and embeddings to the domain")
+    parser.add_argument("--model", default=ModelConfig.MODEL_PATH)
+    parser.add_argument("--output", default="app/data/pruned_model")
+    parser.add_argument("--registry", default=ModelConfig.REGISTRY_PATH)
+    parser.add_argument("--corpus", action="append", default=[],
+                        help="JSONL/CSV file with messages, may be repeated")
+    parser.add_argument("--corpus-size", type=int, default=20000, help="Synthetic commands to generate")
+    parser.add_argument("--keep-digits", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--verify-size", type=int, default=0,
+                        help="Verify on the first N texts, 0 = whole corpus")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = reference_texts(args) + gazetteer_texts(args.registry)
+    started = time.perf_counter()
+    sizes = prune(args.model, args.output, texts, args.keep_digits)
+    print(f"Vocabulary {sizes['vocab_size']['before']} -> {sizes['vocab_size']['after']}, "
+          f"parameters {sizes['parameters']['before']} -> {sizes['parameters']['after']} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    verification = verify(args.model, args.output, texts[:args.verify_size] if args.verify_size else texts,
+                          args.batch_size)
+    print(f"Verified {verification['texts']} texts: {verification['tag_mismatches']} tag mismatches, "
+          f"{verification['token_mismatches']} token mismatches, "
+          f"max logit diff {verification['max_logit_diff']:.2e}")
+
+    load = {"before": measure_load(args.model), "after": measure_load(args.output)}
+    for name, item in load.items():
+        print(f"{name:7} load {item['load_time_s']:.3f}s ({item['load_method']}), "
+              f"RSS +{format_bytes(item['rss_delta'])}")
+
+    report = {
+        **sizes,
+        "verification": verification,
+        "load": load,
+        "environment": environment_info()
+    }
+    with open(os.path.join(args.output, "pruning_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if verification["tag_mismatches"]:
+        raise SystemExit("Pruned model predictions differ from the original")
+
+
+if __name__ == "__main__":
+    main()